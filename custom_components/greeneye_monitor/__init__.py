@@ -3,7 +3,6 @@ from __future__ import annotations
 
 import logging
 
-import greeneye
 import homeassistant.helpers.config_validation as cv
 import voluptuous as vol
 from homeassistant.config_entries import ConfigEntry
@@ -22,6 +21,8 @@ from homeassistant.helpers.issue_registry import IssueSeverity
 from homeassistant.helpers.typing import ConfigType
 
 from . import config_validation as gem_cv
+from .config_index import async_remove_config_index
+from .const import CONF_ADDITIONAL_PORTS
 from .const import CONF_CHANNELS
 from .const import CONF_COUNTED_QUANTITY
 from .const import CONF_COUNTED_QUANTITY_PER_PULSE
@@ -29,14 +30,33 @@ from .const import CONF_DEVICE_CLASS
 from .const import CONF_MONITORS
 from .const import CONF_NET_METERING
 from .const import CONF_NUMBER
+from .const import CONF_PACKET_DECODING
+from .const import CONF_PACKET_LOG
 from .const import CONF_PULSE_COUNTERS
 from .const import CONF_SEND_PACKET_DELAY
 from .const import CONF_SERIAL_NUMBER
 from .const import CONF_TEMPERATURE_SENSORS
 from .const import CONF_TIME_UNIT
 from .const import CONF_VOLTAGE_SENSORS
+from .const import DATA_YAML_CONFIG
+from .const import DEFAULT_PACKET_DECODING
 from .const import DOMAIN
+from .const import ISSUE_REMOVE_YAML
+from .const import PACKET_DECODING_EVENT_LOOP
 from .const import TEMPERATURE_UNIT_CELSIUS
+from .decoder import PacketDecoder
+from .ingress import create_gem_protocol
+from .ingress import IngressMonitors
+from .monitor_stats import async_remove_monitor_stats
+from .packet_log import PACKET_LOG_FILENAME
+from .packet_log import PacketLogWriter
+from .packet_log import recording
+from .registry_index import async_get_registry_index
+from .registry_index import async_remove_registry_index
+from .servers import MonitorServers
+from .services import async_setup_services
+from .snapshot import async_remove_snapshots
+from .snapshot import MonitorSnapshots
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -114,11 +134,14 @@ CONFIG_SCHEMA = vol.Schema({DOMAIN: COMPONENT_SCHEMA}, extra=vol.ALLOW_EXTRA)
 
 async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     """Copy the YAML configuration to the config entry."""
+    # Kept for diagnostics, which would otherwise have to load the YAML again
+    hass.data[DATA_YAML_CONFIG] = config.get(DOMAIN)
+    async_setup_services(hass)
     if server_config := config.get(DOMAIN):
         ir.async_create_issue(
             hass,
             DOMAIN,
-            "remove_yaml",
+            ISSUE_REMOVE_YAML,
             is_fixable=False,
             severity=IssueSeverity.WARNING,
             translation_key="remove_yaml",
@@ -136,13 +159,48 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
 async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> bool:
     """Setup the GreenEye Monitor component from a config entry."""
     send_packet_delay = config_entry.options[CONF_SEND_PACKET_DELAY]
-    monitors = greeneye.Monitors(send_packet_delay=send_packet_delay)
+    packet_log = (
+        PacketLogWriter(hass, hass.config.path(PACKET_LOG_FILENAME))
+        if config_entry.options.get(CONF_PACKET_LOG, False)
+        else None
+    )
+    packet_decoding = config_entry.options.get(
+        CONF_PACKET_DECODING, DEFAULT_PACKET_DECODING
+    )
+    decoder = (
+        PacketDecoder(packet_decoding)
+        if packet_decoding != PACKET_DECODING_EVENT_LOOP
+        else None
+    )
+
+    create_protocol = (
+        decoder.create_protocol if decoder is not None else create_gem_protocol
+    )
+    if packet_log is not None:
+        create_protocol = recording(create_protocol, packet_log)
+
+    def create_server() -> IngressMonitors:
+        return IngressMonitors(
+            send_packet_delay=send_packet_delay, create_protocol=create_protocol
+        )
+
+    monitors = MonitorServers(
+        create_server, packet_log, decoder, MonitorSnapshots(hass)
+    )
     hass.data[DOMAIN] = monitors
+    async_get_registry_index(hass, config_entry)
+    await monitors.async_restore(
+        [
+            monitor[CONF_SERIAL_NUMBER]
+            for monitor in config_entry.data.get(CONF_MONITORS, [])
+        ]
+    )
 
-    await monitors.start_server(config_entry.data[CONF_PORT])
+    await monitors.async_start_server(config_entry.data[CONF_PORT])
+    await monitors.async_set_ports(get_ports(config_entry))
 
     async def close_monitors(event: Event) -> None:
-        """Close the Monitors object."""
+        """Close the servers."""
         monitors = hass.data.pop(DOMAIN, None)
         if monitors:
             await monitors.close()
@@ -155,11 +213,36 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> b
         )
     )
 
-    config_entry.async_on_unload(config_entry.add_update_listener(reload_entry))
+    data = dict(config_entry.data)
+    options = dict(config_entry.options)
+
+    async def update_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> None:
+        """Start and stop servers in place if only the additional ports changed, otherwise reload."""
+        nonlocal options
+        if config_entry.data == data and {
+            **options,
+            CONF_ADDITIONAL_PORTS: None,
+        } == {**config_entry.options, CONF_ADDITIONAL_PORTS: None}:
+            options = dict(config_entry.options)
+            await monitors.async_set_ports(get_ports(config_entry))
+        else:
+            await reload_entry(hass, config_entry)
+
+    config_entry.async_on_unload(config_entry.add_update_listener(update_entry))
 
     return True
 
 
+def get_ports(config_entry: ConfigEntry) -> list[int]:
+    """Return every port the config entry listens on."""
+    return gem_cv.portList(
+        [
+            config_entry.data[CONF_PORT],
+            *gem_cv.portList(config_entry.options.get(CONF_ADDITIONAL_PORTS, "")),
+        ]
+    )
+
+
 async def reload_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> None:
     await hass.config_entries.async_reload(config_entry.entry_id)
 
@@ -172,4 +255,12 @@ async def async_unload_entry(hass: HomeAssistant, config_entry: ConfigEntry) ->
 
     monitors = hass.data.pop(DOMAIN)
     await monitors.close()
+    async_remove_config_index(hass, config_entry)
+    async_remove_monitor_stats(hass)
+    async_remove_registry_index(hass)
     return True
+
+
+async def async_remove_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> None:
+    """Delete the snapshots of the monitors along with the config entry."""
+    await async_remove_snapshots(hass)
@@ -25,26 +25,52 @@ from homeassistant.core import callback
 from homeassistant.helpers import entity_registry as er
 from homeassistant.helpers.typing import DiscoveryInfoType
 
+from . import config_validation as gem_cv
 from .const import AUX5_TYPE_CT
 from .const import AUX5_TYPE_PULSE_COUNTER
+from .const import CONF_ABSOLUTE
+from .const import CONF_ADAPTIVE_PACKET_INTERVAL
+from .const import CONF_ADDITIONAL_PORTS
 from .const import CONF_AUX5_TYPE
 from .const import CONF_CHANNELS
 from .const import CONF_COUNTED_QUANTITY
 from .const import CONF_COUNTED_QUANTITY_PER_PULSE
+from .const import CONF_CUMULATIVE_UPDATE_INTERVAL
 from .const import CONF_DEVICE_CLASS
+from .const import CONF_ENERGY_STATISTICS
+from .const import CONF_FLAT_DEVICES
 from .const import CONF_IS_AUX
+from .const import CONF_LAZY_ENTITIES
+from .const import CONF_MAX_PACKET_INTERVAL
+from .const import CONF_MAX_SILENCE
+from .const import CONF_MIN_PACKET_INTERVAL
 from .const import CONF_MONITORS
 from .const import CONF_NET_METERING
 from .const import CONF_NUMBER
+from .const import CONF_PACKET_DECODING
+from .const import CONF_PACKET_LOG
+from .const import CONF_POWER_WINDOW_INTERVAL
 from .const import CONF_PULSE_COUNTERS
+from .const import CONF_RELATIVE
 from .const import CONF_SEND_PACKET_DELAY
 from .const import CONF_SERIAL_NUMBER
+from .const import CONF_SIGNIFICANT_CHANGE
 from .const import CONF_TEMPERATURE_SENSORS
 from .const import CONF_TIME_UNIT
 from .const import CONFIG_ENTRY_TITLE
+from .const import CUMULATIVE_UPDATE_INTERVAL_OPTIONS
+from .const import DEFAULT_CUMULATIVE_UPDATE_INTERVAL
+from .const import DEFAULT_MAX_PACKET_INTERVAL
+from .const import DEFAULT_MIN_PACKET_INTERVAL
+from .const import DEFAULT_PACKET_DECODING
+from .const import DEFAULT_POWER_WINDOW_INTERVAL
 from .const import DOMAIN
 from .const import get_monitor_type_long_name
 from .const import get_monitor_type_short_name
+from .const import PACKET_DECODING_OPTIONS
+from .const import POWER_WINDOW_INTERVAL_OPTIONS
+from .const import SIGNIFICANT_CHANGE_SENSOR_TYPES
+from .servers import MonitorServers
 
 AUX5_TYPE_OPTIONS = [AUX5_TYPE_CT, AUX5_TYPE_PULSE_COUNTER]
 
@@ -199,19 +225,107 @@ MONITOR_OPTIONS_SCHEMA = vol.Schema(
 MONITORS_OPTIONS_SCHEMA = vol.All(cv.ensure_list, [MONITOR_OPTIONS_SCHEMA])
 
 
-def make_global_options_schema(send_packet_delay: bool = False):
+PACKET_INTERVAL_SCHEMA = vol.All(vol.Coerce(int), vol.Range(min=1, max=255))
+
+
+def make_global_options_schema(
+    send_packet_delay: bool = False,
+    cumulative_update_interval: int = DEFAULT_CUMULATIVE_UPDATE_INTERVAL,
+    packet_log: bool = False,
+    power_window_interval: int = DEFAULT_POWER_WINDOW_INTERVAL,
+    energy_statistics: bool = False,
+    additional_ports: str = "",
+    packet_decoding: str = DEFAULT_PACKET_DECODING,
+    lazy_entities: bool = False,
+    flat_devices: bool = False,
+    adaptive_packet_interval: bool = False,
+    min_packet_interval: int = DEFAULT_MIN_PACKET_INTERVAL,
+    max_packet_interval: int = DEFAULT_MAX_PACKET_INTERVAL,
+):
     return vol.Schema(
         {
             vol.Optional(CONF_SEND_PACKET_DELAY, default=send_packet_delay): bool,
+            vol.Optional(
+                CONF_CUMULATIVE_UPDATE_INTERVAL, default=cumulative_update_interval
+            ): vol.All(vol.Coerce(int), vol.In(CUMULATIVE_UPDATE_INTERVAL_OPTIONS)),
+            vol.Optional(CONF_PACKET_LOG, default=packet_log): bool,
+            vol.Optional(
+                CONF_POWER_WINDOW_INTERVAL, default=power_window_interval
+            ): vol.All(vol.Coerce(int), vol.In(POWER_WINDOW_INTERVAL_OPTIONS)),
+            vol.Optional(CONF_ENERGY_STATISTICS, default=energy_statistics): bool,
+            vol.Optional(CONF_ADDITIONAL_PORTS, default=additional_ports): str,
+            vol.Optional(
+                CONF_PACKET_DECODING, default=packet_decoding
+            ): selector.SelectSelector(
+                selector.SelectSelectorConfig(
+                    options=PACKET_DECODING_OPTIONS,
+                    translation_key=CONF_PACKET_DECODING,
+                )
+            ),
+            vol.Optional(CONF_LAZY_ENTITIES, default=lazy_entities): bool,
+            vol.Optional(CONF_FLAT_DEVICES, default=flat_devices): bool,
+            vol.Optional(
+                CONF_ADAPTIVE_PACKET_INTERVAL, default=adaptive_packet_interval
+            ): bool,
+            vol.Optional(
+                CONF_MIN_PACKET_INTERVAL, default=min_packet_interval
+            ): PACKET_INTERVAL_SCHEMA,
+            vol.Optional(
+                CONF_MAX_PACKET_INTERVAL, default=max_packet_interval
+            ): PACKET_INTERVAL_SCHEMA,
         }
     )
 
 
 GLOBAL_OPTIONS_SCHEMA = make_global_options_schema()
 
+THRESHOLD_SCHEMA = vol.All(vol.Coerce(float), vol.Range(min=0))
+
+SIGNIFICANT_CHANGE_THRESHOLDS_SCHEMA = vol.Schema(
+    {
+        vol.Optional(CONF_ABSOLUTE, default=0.0): THRESHOLD_SCHEMA,
+        vol.Optional(CONF_RELATIVE, default=0.0): THRESHOLD_SCHEMA,
+    }
+)
+
+SIGNIFICANT_CHANGE_SCHEMA = vol.Schema(
+    {
+        **{
+            vol.Optional(sensor_type, default={}): SIGNIFICANT_CHANGE_THRESHOLDS_SCHEMA
+            for sensor_type in SIGNIFICANT_CHANGE_SENSOR_TYPES
+        },
+        vol.Optional(CONF_MAX_SILENCE, default=0): vol.All(
+            vol.Coerce(int), vol.Range(min=0)
+        ),
+    }
+)
+
+
+def make_significant_change_options_schema(
+    significant_change: dict[str, Any]
+) -> vol.Schema:
+    significant_change = SIGNIFICANT_CHANGE_SCHEMA(significant_change)
+    return vol.Schema(
+        {
+            **{
+                vol.Optional(
+                    f"{sensor_type}_{threshold}",
+                    default=significant_change[sensor_type][threshold],
+                ): THRESHOLD_SCHEMA
+                for sensor_type in SIGNIFICANT_CHANGE_SENSOR_TYPES
+                for threshold in [CONF_ABSOLUTE, CONF_RELATIVE]
+            },
+            vol.Optional(
+                CONF_MAX_SILENCE, default=significant_change[CONF_MAX_SILENCE]
+            ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+        }
+    )
+
+
 CONFIG_ENTRY_OPTIONS_SCHEMA = GLOBAL_OPTIONS_SCHEMA.extend(
     {
         vol.Optional(CONF_MONITORS, default=[]): MONITORS_OPTIONS_SCHEMA,
+        vol.Optional(CONF_SIGNIFICANT_CHANGE, default={}): SIGNIFICANT_CHANGE_SCHEMA,
     }
 )
 
@@ -306,7 +420,7 @@ class GreeneyeMonitorConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             return await self.async_step_pulse_counter()
 
         serial_number = self.context["serial_number"]
-        monitors: greeneye.Monitors = self.hass.data[DOMAIN]
+        monitors: MonitorServers = self.hass.data[DOMAIN]
         self._monitor = monitors.monitors[serial_number]
         monitor_type_short_name = get_monitor_type_short_name(self._monitor)
         monitor_type_long_name = get_monitor_type_long_name(self._monitor)
@@ -476,21 +590,102 @@ class GreeneyeMonitorOptionsFlow(config_entries.OptionsFlow):
         """Manage the options."""
         return self.async_show_menu(
             step_id="options_menu",
-            menu_options=["global_options", "choose_monitor"],
+            menu_options=["global_options", "significant_change", "choose_monitor"],
         )
 
     async def async_step_global_options(
         self, user_input: dict[str, Any] | None = None
     ) -> data_entry_flow.FlowResult:
+        errors: dict[str, str] = {}
         if user_input is not None:
+            try:
+                additional_ports = gem_cv.portList(user_input[CONF_ADDITIONAL_PORTS])
+            except vol.Invalid:
+                errors[CONF_ADDITIONAL_PORTS] = "invalid_ports"
+            if (
+                user_input[CONF_MIN_PACKET_INTERVAL]
+                > user_input[CONF_MAX_PACKET_INTERVAL]
+            ):
+                errors[CONF_MAX_PACKET_INTERVAL] = "invalid_packet_interval_bounds"
+
+        if user_input is not None and not errors:
             options = deepcopy(dict(self.config_entry.options))
             options[CONF_SEND_PACKET_DELAY] = user_input[CONF_SEND_PACKET_DELAY]
+            options[CONF_CUMULATIVE_UPDATE_INTERVAL] = user_input[
+                CONF_CUMULATIVE_UPDATE_INTERVAL
+            ]
+            options[CONF_PACKET_LOG] = user_input[CONF_PACKET_LOG]
+            options[CONF_POWER_WINDOW_INTERVAL] = user_input[CONF_POWER_WINDOW_INTERVAL]
+            options[CONF_ENERGY_STATISTICS] = user_input[CONF_ENERGY_STATISTICS]
+            options[CONF_ADDITIONAL_PORTS] = gem_cv.formatPortList(additional_ports)
+            options[CONF_PACKET_DECODING] = user_input[CONF_PACKET_DECODING]
+            options[CONF_LAZY_ENTITIES] = user_input[CONF_LAZY_ENTITIES]
+            options[CONF_FLAT_DEVICES] = user_input[CONF_FLAT_DEVICES]
+            options[CONF_ADAPTIVE_PACKET_INTERVAL] = user_input[
+                CONF_ADAPTIVE_PACKET_INTERVAL
+            ]
+            options[CONF_MIN_PACKET_INTERVAL] = user_input[CONF_MIN_PACKET_INTERVAL]
+            options[CONF_MAX_PACKET_INTERVAL] = user_input[CONF_MAX_PACKET_INTERVAL]
             return self.async_create_entry(title="", data=options)
 
         return self.async_show_form(
             step_id="global_options",
             data_schema=make_global_options_schema(
-                send_packet_delay=self.config_entry.options[CONF_SEND_PACKET_DELAY]
+                send_packet_delay=self.config_entry.options[CONF_SEND_PACKET_DELAY],
+                cumulative_update_interval=self.config_entry.options.get(
+                    CONF_CUMULATIVE_UPDATE_INTERVAL, DEFAULT_CUMULATIVE_UPDATE_INTERVAL
+                ),
+                packet_log=self.config_entry.options.get(CONF_PACKET_LOG, False),
+                power_window_interval=self.config_entry.options.get(
+                    CONF_POWER_WINDOW_INTERVAL, DEFAULT_POWER_WINDOW_INTERVAL
+                ),
+                energy_statistics=self.config_entry.options.get(
+                    CONF_ENERGY_STATISTICS, False
+                ),
+                additional_ports=self.config_entry.options.get(
+                    CONF_ADDITIONAL_PORTS, ""
+                ),
+                packet_decoding=self.config_entry.options.get(
+                    CONF_PACKET_DECODING, DEFAULT_PACKET_DECODING
+                ),
+                lazy_entities=self.config_entry.options.get(CONF_LAZY_ENTITIES, False),
+                flat_devices=self.config_entry.options.get(CONF_FLAT_DEVICES, False),
+                adaptive_packet_interval=self.config_entry.options.get(
+                    CONF_ADAPTIVE_PACKET_INTERVAL, False
+                ),
+                min_packet_interval=self.config_entry.options.get(
+                    CONF_MIN_PACKET_INTERVAL, DEFAULT_MIN_PACKET_INTERVAL
+                ),
+                max_packet_interval=self.config_entry.options.get(
+                    CONF_MAX_PACKET_INTERVAL, DEFAULT_MAX_PACKET_INTERVAL
+                ),
+            ),
+            errors=errors,
+        )
+
+    async def async_step_significant_change(
+        self, user_input: dict[str, Any] | None = None
+    ) -> data_entry_flow.FlowResult:
+        if user_input is not None:
+            options = deepcopy(dict(self.config_entry.options))
+            options[CONF_SIGNIFICANT_CHANGE] = SIGNIFICANT_CHANGE_SCHEMA(
+                {
+                    **{
+                        sensor_type: {
+                            threshold: user_input[f"{sensor_type}_{threshold}"]
+                            for threshold in [CONF_ABSOLUTE, CONF_RELATIVE]
+                        }
+                        for sensor_type in SIGNIFICANT_CHANGE_SENSOR_TYPES
+                    },
+                    CONF_MAX_SILENCE: user_input[CONF_MAX_SILENCE],
+                }
+            )
+            return self.async_create_entry(title="", data=options)
+
+        return self.async_show_form(
+            step_id="significant_change",
+            data_schema=make_significant_change_options_schema(
+                self.config_entry.options.get(CONF_SIGNIFICANT_CHANGE, {})
             ),
         )
 
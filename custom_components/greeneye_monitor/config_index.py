@@ -0,0 +1,92 @@
+"""Indexed lookups into the monitor configuration of a config entry."""
+from __future__ import annotations
+
+from collections.abc import Mapping
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import callback
+from homeassistant.core import HomeAssistant
+
+from .const import CONF_MONITORS
+from .const import CONF_NUMBER
+from .const import CONF_PULSE_COUNTERS
+from .const import CONF_SERIAL_NUMBER
+from .const import DOMAIN
+
+DATA_CONFIG_INDEX = f"{DOMAIN}_config_index"
+
+
+class MonitorConfigIndex:
+    """The config and options for one monitor, with its pulse counters indexed by number."""
+
+    def __init__(self, config: Mapping[str, Any], options: Mapping[str, Any]) -> None:
+        self.config = config
+        self.options = options
+        self._pulse_counter_configs = {
+            pulse_counter[CONF_NUMBER]: pulse_counter
+            for pulse_counter in config.get(CONF_PULSE_COUNTERS, [])
+        }
+        self._pulse_counter_options = {
+            pulse_counter[CONF_NUMBER]: pulse_counter
+            for pulse_counter in options.get(CONF_PULSE_COUNTERS, [])
+        }
+
+    def get_pulse_counter_config(self, number: int) -> Mapping[str, Any] | None:
+        return self._pulse_counter_configs.get(number)
+
+    def get_pulse_counter_options(self, number: int) -> Mapping[str, Any] | None:
+        return self._pulse_counter_options.get(number)
+
+
+class ConfigIndex:
+    """Monitor configs and options from one revision of a config entry, indexed by serial number."""
+
+    def __init__(self, config_entry: ConfigEntry) -> None:
+        self.data = config_entry.data
+        self.options = config_entry.options
+        monitor_options = {
+            options[CONF_SERIAL_NUMBER]: options
+            for options in self.options.get(CONF_MONITORS, [])
+        }
+        self._monitors = {
+            config[CONF_SERIAL_NUMBER]: MonitorConfigIndex(
+                config, monitor_options[config[CONF_SERIAL_NUMBER]]
+            )
+            for config in self.data.get(CONF_MONITORS, [])
+            if config[CONF_SERIAL_NUMBER] in monitor_options
+        }
+        self._monitor_configs = {
+            config[CONF_SERIAL_NUMBER]: config
+            for config in self.data.get(CONF_MONITORS, [])
+        }
+
+    def is_current(self, config_entry: ConfigEntry) -> bool:
+        """Return True if this index was built from the config entry's current data and options."""
+        return self.data is config_entry.data and self.options is config_entry.options
+
+    def get_monitor(self, serial_number: int) -> MonitorConfigIndex | None:
+        """Return the config and options for the given monitor, if it has both."""
+        return self._monitors.get(serial_number)
+
+    def get_monitor_config(self, serial_number: int) -> Mapping[str, Any] | None:
+        """Return the config for the given monitor, even if it has no options."""
+        return self._monitor_configs.get(serial_number)
+
+
+@callback
+def async_get_config_index(
+    hass: HomeAssistant, config_entry: ConfigEntry
+) -> ConfigIndex:
+    """Return the index for the current revision of the config entry, building it if needed."""
+    indexes: dict[str, ConfigIndex] = hass.data.setdefault(DATA_CONFIG_INDEX, {})
+    index = indexes.get(config_entry.entry_id)
+    if index is None or not index.is_current(config_entry):
+        index = indexes[config_entry.entry_id] = ConfigIndex(config_entry)
+    return index
+
+
+@callback
+def async_remove_config_index(hass: HomeAssistant, config_entry: ConfigEntry) -> None:
+    """Drop the cached index for the config entry."""
+    hass.data.get(DATA_CONFIG_INDEX, {}).pop(config_entry.entry_id, None)
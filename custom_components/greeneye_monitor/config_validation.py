@@ -41,3 +41,37 @@ def deviceClass(value: Any) -> SensorDeviceClass | None:
         return None
     value = cv.string(value)
     return SensorDeviceClass(value)
+
+
+def portList(value: Any) -> list[int]:
+    """Validate a list of ports, given as a list or as a string of comma-separated ports and port ranges like "8001, 8010-8019"."""
+    if isinstance(value, str):
+        ports: list[int] = []
+        for part in value.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            first, _, last = part.partition("-")
+            try:
+                first_port = cv.port(first.strip())
+                last_port = cv.port(last.strip()) if last else first_port
+            except vol.Invalid as e:
+                raise vol.Invalid(f"Invalid port or port range: {part}") from e
+            if last_port < first_port:
+                raise vol.Invalid(f"Invalid port range: {part}")
+            ports.extend(range(first_port, last_port + 1))
+        value = ports
+    return sorted(set(vol.All(cv.ensure_list, [cv.port])(value)))
+
+
+def formatPortList(ports: list[int]) -> str:
+    """Format a list of ports as portList accepts it, with consecutive ports as ranges."""
+    parts: list[str] = []
+    last = -1
+    for port in sorted(ports):
+        if parts and port == last + 1:
+            parts[-1] = f"{parts[-1].partition('-')[0]}-{port}"
+        else:
+            parts.append(str(port))
+        last = port
+    return ", ".join(parts)
@@ -1,6 +1,7 @@
 """Constants for the greeneye_monitor component."""
-from datetime import timedelta
 from typing import cast
+from weakref import WeakKeyDictionary
+from weakref import WeakSet
 
 from greeneye.monitor import Monitor
 from greeneye.monitor import MonitorType
@@ -9,25 +10,50 @@ from homeassistant.helpers.entity import DeviceInfo
 AUX5_TYPE_CT = "ct"
 AUX5_TYPE_PULSE_COUNTER = "pulse_counter"
 
+CONF_ABSOLUTE = "absolute"
+CONF_ADAPTIVE_PACKET_INTERVAL = "adaptive_packet_interval"
+CONF_ADDITIONAL_PORTS = "additional_ports"
 CONF_AUX5_TYPE = "aux5_type"
 CONF_CHANNELS = "channels"
 CONF_COUNTED_QUANTITY = "counted_quantity"
 CONF_COUNTED_QUANTITY_PER_PULSE = "counted_quantity_per_pulse"
+CONF_CUMULATIVE_UPDATE_INTERVAL = "cumulative_update_interval"
+CONF_CURRENT = "current"
 CONF_DEVICE_CLASS = "device_class"
+CONF_ENERGY_STATISTICS = "energy_statistics"
+CONF_FLAT_DEVICES = "flat_devices"
 CONF_IS_AUX = "is_aux"
+CONF_LAZY_ENTITIES = "lazy_entities"
+CONF_MAX_PACKET_INTERVAL = "max_packet_interval"
+CONF_MAX_SILENCE = "max_silence"
+CONF_MIN_PACKET_INTERVAL = "min_packet_interval"
 CONF_MONITORS = "monitors"
 CONF_NET_METERING = "net_metering"
 CONF_NUMBER = "number"
+CONF_PACKET_DECODING = "packet_decoding"
+CONF_PACKET_LOG = "packet_log"
+CONF_POWER = "power"
+CONF_POWER_WINDOW_INTERVAL = "power_window_interval"
 CONF_PULSE_COUNTERS = "pulse_counters"
+CONF_RELATIVE = "relative"
 CONF_SEND_PACKET_DELAY = "send_packet_delay"
 CONF_SERIAL_NUMBER = "serial_number"
+CONF_SIGNIFICANT_CHANGE = "significant_change"
+CONF_TEMPERATURE = "temperature"
 CONF_TEMPERATURE_SENSORS = "temperature_sensors"
 CONF_TIME_UNIT = "time_unit"
+CONF_VOLTAGE = "voltage"
 CONF_VOLTAGE_SENSORS = "voltage"
 
 CONFIG_ENTRY_TITLE = "GreenEye Monitor (GEM)"
 
-DEFAULT_UPDATE_INTERVAL = timedelta(minutes=30)
+CUMULATIVE_UPDATE_INTERVAL_OPTIONS = [1, 5, 10, 15, 20, 30, 60]
+
+DEFAULT_CUMULATIVE_UPDATE_INTERVAL = 5
+DEFAULT_MAX_PACKET_INTERVAL = 60
+DEFAULT_MIN_PACKET_INTERVAL = 2
+DEFAULT_PACKET_DECODING = "event_loop"
+DEFAULT_POWER_WINDOW_INTERVAL = 0
 DEVICE_TYPE_AUX = "aux"
 DEVICE_TYPE_CURRENT_TRANSFORMER = "channel"
 DEVICE_TYPE_PULSE_COUNTER = "pulse counter"
@@ -35,6 +61,29 @@ DEVICE_TYPE_TEMPERATURE_SENSOR = "temperature"
 DEVICE_TYPE_VOLTAGE_SENSOR = "voltage"
 DOMAIN = "greeneye_monitor"
 
+DATA_YAML_CONFIG = f"{DOMAIN}_yaml_config"
+
+ISSUE_REMOVE_YAML = "remove_yaml"
+
+PACKET_DECODING_EVENT_LOOP = "event_loop"
+PACKET_DECODING_THREAD = "thread"
+PACKET_DECODING_PROCESS = "process"
+PACKET_DECODING_OPTIONS = [
+    PACKET_DECODING_EVENT_LOOP,
+    PACKET_DECODING_THREAD,
+    PACKET_DECODING_PROCESS,
+]
+
+# 0 turns power windows off
+POWER_WINDOW_INTERVAL_OPTIONS = [0, 1, 5, 10, 15, 30, 60]
+
+SIGNIFICANT_CHANGE_SENSOR_TYPES = [
+    CONF_POWER,
+    CONF_CURRENT,
+    CONF_VOLTAGE,
+    CONF_TEMPERATURE,
+]
+
 TEMPERATURE_UNIT_CELSIUS = "C"
 
 
@@ -58,7 +107,73 @@ def get_monitor_type_long_name(monitor: Monitor) -> str:
         assert False
 
 
+# The DeviceInfo of each device of a monitor, by device type and number, built the first
+# time it is asked for and shared by every entity of the device for as long as the
+# monitor is around. A device type of None is the monitor itself.
+_DEVICE_INFOS: "WeakKeyDictionary[Monitor, dict[tuple[str | None, int], DeviceInfo]]" = (
+    WeakKeyDictionary()
+)
+
+# Monitors whose entities all belong to the monitor's own device instead of one device
+# per channel, pulse counter, and sensor
+_FLAT_DEVICE_MONITORS: "WeakSet[Monitor]" = WeakSet()
+
+
+def set_flat_devices(monitor: Monitor, flat: bool) -> None:
+    """Choose whether the entities of the given monitor all belong to the monitor's device."""
+    if flat == (monitor in _FLAT_DEVICE_MONITORS):
+        return
+
+    if flat:
+        _FLAT_DEVICE_MONITORS.add(monitor)
+    else:
+        _FLAT_DEVICE_MONITORS.discard(monitor)
+    _DEVICE_INFOS.pop(monitor, None)
+
+
+def has_flat_devices(monitor: Monitor) -> bool:
+    return monitor in _FLAT_DEVICE_MONITORS
+
+
+def make_entity_excluded_issue_id(entity_id: str) -> str:
+    """Return the ID of the issue raised when the given entity is excluded from the recorder."""
+    return f"{entity_id}_excluded"
+
+
+def make_flat_entity_name(device_type: str, number: int, name: str | None) -> str:
+    """Return the name of an entity of the given device when it belongs to the monitor's device instead."""
+    if name is None:
+        return f"{device_type} {number + 1}"
+    return f"{device_type} {number + 1} {name}"
+
+
+def make_monitor_device_info(monitor: Monitor) -> DeviceInfo:
+    device_infos = _DEVICE_INFOS.setdefault(monitor, {})
+    device_info = device_infos.get((None, 0))
+    if device_info is None:
+        device_info = device_infos[(None, 0)] = DeviceInfo(
+            identifiers={(DOMAIN, f"{monitor.serial_number}")},
+            manufacturer="Brultech",
+            name=f"{get_monitor_type_short_name(monitor)} {monitor.serial_number}",
+            model=get_monitor_type_long_name(monitor),
+        )
+    return device_info
+
+
 def make_device_info(monitor: Monitor, device_type: str, number: int) -> DeviceInfo:
+    if monitor in _FLAT_DEVICE_MONITORS:
+        return make_monitor_device_info(monitor)
+
+    device_infos = _DEVICE_INFOS.setdefault(monitor, {})
+    device_info = device_infos.get((device_type, number))
+    if device_info is None:
+        device_info = device_infos[(device_type, number)] = _build_device_info(
+            monitor, device_type, number
+        )
+    return device_info
+
+
+def _build_device_info(monitor: Monitor, device_type: str, number: int) -> DeviceInfo:
     monitor_type_short_name = get_monitor_type_short_name(monitor)
     return DeviceInfo(
         identifiers={
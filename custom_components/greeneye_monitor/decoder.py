@@ -0,0 +1,256 @@
+"""Decoding of the packets from Brultech energy monitors outside of the event loop."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import Executor
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+
+from siobrultech_protocols.gem.packets import BIN32_ABS
+from siobrultech_protocols.gem.packets import BIN32_NET
+from siobrultech_protocols.gem.packets import BIN48_ABS
+from siobrultech_protocols.gem.packets import BIN48_NET
+from siobrultech_protocols.gem.packets import BIN48_NET_TIME
+from siobrultech_protocols.gem.packets import ECM_1220
+from siobrultech_protocols.gem.packets import ECM_1240
+from siobrultech_protocols.gem.packets import Packet
+from siobrultech_protocols.gem.packets import PacketFormat
+from siobrultech_protocols.gem.protocol import PACKET_HEADER
+from siobrultech_protocols.gem.protocol import PacketProtocolMessage
+
+from .const import PACKET_DECODING_PROCESS
+from .ingress import IngressGemProtocol
+from .ingress import TimedPacketReceivedMessage
+
+DECODER_MAX_WORKERS = 2
+
+# Past this many batches waiting on the workers, packets are decoded on the event loop
+# instead, so that a backlog cannot grow without bound
+DECODER_MAX_PENDING_BATCHES = 64
+
+PACKET_FOOTER = bytes.fromhex("fffe")
+
+# The order matters for BIN48-NET, whose packets can only be told apart from
+# BIN48-NET-TIME packets by where their footer is
+PACKET_FORMATS = [
+    BIN32_ABS,
+    BIN32_NET,
+    BIN48_ABS,
+    BIN48_NET,
+    BIN48_NET_TIME,
+    ECM_1240,
+    ECM_1220,
+]
+PACKET_FORMATS_BY_TYPE: dict[int, PacketFormat] = {
+    packet_format.type: packet_format for packet_format in PACKET_FORMATS
+}
+PACKET_SIZES: dict[int, int] = {
+    packet_format.type: packet_format.size for packet_format in PACKET_FORMATS
+}
+PACKET_FORMATS_BY_CODE: dict[int, list[PacketFormat]] = {}
+for _packet_format in PACKET_FORMATS:
+    PACKET_FORMATS_BY_CODE.setdefault(_packet_format.code, []).append(_packet_format)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def frame_packet(buffer: bytearray) -> PacketFormat | None:
+    """Return the format of the packet at the start of the buffer, if it is complete and well formed.
+
+    Only the header, code, footer and checksum are checked, which is all that parsing
+    checks as well. A framed packet can still fail to parse on a field it holds, such
+    as an impossible time stamp.
+    """
+    if len(buffer) <= len(PACKET_HEADER) or not buffer.startswith(PACKET_HEADER):
+        return None
+    for packet_format in PACKET_FORMATS_BY_CODE.get(buffer[len(PACKET_HEADER)], []):
+        size = PACKET_SIZES[packet_format.type]
+        if (
+            len(buffer) >= size
+            and buffer[size - 3 : size - 1] == PACKET_FOOTER
+            and sum(buffer[: size - 1]) % 256 == buffer[size - 1]
+        ):
+            return packet_format
+    return None
+
+
+def decode_packets(frames: list[tuple[int, bytes]]) -> list[Packet | Exception]:
+    """Parse the given (packet format type, packet data) frames. Runs in the workers.
+
+    A frame that fails to parse is returned as the exception it raised, in its place, so
+    that one bad frame does not cost the others in the batch.
+    """
+    packets: list[Packet | Exception] = []
+    for packet_format_type, data in frames:
+        try:
+            packets.append(PACKET_FORMATS_BY_TYPE[packet_format_type].parse(data))
+        except Exception as e:
+            packets.append(e)
+    return packets
+
+
+class PacketDecoder:
+    """A bounded pool of worker threads or processes that packets are decoded in.
+
+    Worker processes are started with "spawn" rather than forked, since forking a
+    process with as many threads as Home Assistant's is not safe.
+    """
+
+    def __init__(self, mode: str, max_workers: int = DECODER_MAX_WORKERS) -> None:
+        self.mode = mode
+        self._executor: Executor
+        if mode == PACKET_DECODING_PROCESS:
+            self._executor = ProcessPoolExecutor(
+                max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            self._executor = ThreadPoolExecutor(
+                max_workers, thread_name_prefix="greeneye_monitor_decoder"
+            )
+
+    def create_protocol(
+        self, queue: asyncio.Queue[PacketProtocolMessage], send_packet_delay: bool
+    ) -> DecodingGemProtocol:
+        """Create a protocol for a new connection that decodes its packets with this decoder.
+
+        Suits the create_protocol argument of IngressMonitors.
+        """
+        return DecodingGemProtocol(queue, self, send_packet_delay=send_packet_delay)
+
+    def async_decode(
+        self, frames: list[tuple[int, bytes]]
+    ) -> asyncio.Future[list[Packet | Exception]]:
+        return asyncio.get_running_loop().run_in_executor(
+            self._executor, decode_packets, frames
+        )
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class _OrderedMessageQueue:
+    """Passes a protocol's messages on to the processor's queue in the order they were produced.
+
+    Messages that follow a batch of packets still being decoded wait behind it, so that,
+    for example, a connection is never reported lost before its last packets arrive.
+    Each batch carries the arrival time of the data it was framed from.
+    """
+
+    def __init__(
+        self,
+        protocol: DecodingGemProtocol,
+        queue: asyncio.Queue[PacketProtocolMessage],
+    ) -> None:
+        self._protocol = protocol
+        self._queue = queue
+        self._pending: deque[
+            tuple[asyncio.Future[list[Packet | Exception]], float]
+            | PacketProtocolMessage
+        ] = deque()
+        self.pending_batches = 0
+
+    def put_nowait(self, message: PacketProtocolMessage) -> None:
+        if self._pending:
+            self._pending.append(message)
+        else:
+            self._queue.put_nowait(message)
+
+    def put_batch(
+        self, batch: asyncio.Future[list[Packet | Exception]], received_at: float
+    ) -> None:
+        self._pending.append((batch, received_at))
+        self.pending_batches += 1
+        batch.add_done_callback(self._drain)
+
+    def _drain(self, _: asyncio.Future[list[Packet | Exception]] | None = None) -> None:
+        while self._pending:
+            item = self._pending[0]
+            if isinstance(item, tuple):
+                batch, received_at = item
+                if not batch.done():
+                    return
+                self.pending_batches -= 1
+                if batch.cancelled():
+                    # The decoder was closed
+                    pass
+                elif (exception := batch.exception()) is not None:
+                    _LOGGER.error("Failed to decode packets", exc_info=exception)
+                else:
+                    for packet in batch.result():
+                        if isinstance(packet, Exception):
+                            _LOGGER.warning(
+                                "Skipping a packet that failed to decode",
+                                exc_info=packet,
+                            )
+                            continue
+                        # Packets decoded in another process come back with copies of
+                        # their formats
+                        packet.packet_format = PACKET_FORMATS_BY_TYPE[
+                            packet.packet_format.type
+                        ]
+                        self._queue.put_nowait(
+                            TimedPacketReceivedMessage(
+                                protocol=self._protocol,
+                                packet=packet,
+                                received_at=received_at,
+                            )
+                        )
+            else:
+                self._queue.put_nowait(item)
+            self._pending.popleft()
+
+
+class DecodingGemProtocol(IngressGemProtocol):
+    """An IngressGemProtocol that frames packets on the event loop but decodes them in a PacketDecoder.
+
+    The packets framed from each chunk of received data are decoded as one batch, and
+    any of them that fail to decode are logged and skipped. Anything that is not a
+    well-formed packet, such as API responses and malformed or partial packets, is left
+    to the base class.
+    """
+
+    def __init__(
+        self,
+        queue: asyncio.Queue[PacketProtocolMessage],
+        decoder: PacketDecoder,
+        send_packet_delay: bool,
+    ) -> None:
+        self._messages = _OrderedMessageQueue(self, queue)
+        super().__init__(
+            self._messages,  # type: ignore[arg-type]
+            send_packet_delay=send_packet_delay,
+        )
+        self._decoder = decoder
+        self._frames: list[tuple[int, bytes]] = []
+
+    def data_received(self, data: bytes) -> None:
+        super().data_received(data)
+        self._send_frames()
+
+    def _process_buffer(self) -> bool:
+        packet_format = frame_packet(self._buffer)
+        if packet_format is None:
+            self._send_frames()
+            return super()._process_buffer()
+
+        size = PACKET_SIZES[packet_format.type]
+        self._frames.append((packet_format.type, bytes(self._buffer[:size])))
+        self._packet_type = packet_format.type
+        del self._buffer[:size]
+        return len(self._buffer) > 0
+
+    def _send_frames(self) -> None:
+        if not self._frames:
+            return
+
+        frames = self._frames
+        self._frames = []
+        if self._messages.pending_batches < DECODER_MAX_PENDING_BATCHES:
+            batch = self._decoder.async_decode(frames)
+        else:
+            batch = asyncio.get_running_loop().create_future()
+            batch.set_result(decode_packets(frames))
+        self._messages.put_batch(batch, self.received_at)
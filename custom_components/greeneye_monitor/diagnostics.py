@@ -2,7 +2,6 @@
 from datetime import datetime
 from typing import Any
 
-from greeneye import Monitors
 from greeneye.monitor import Aux
 from greeneye.monitor import Channel
 from greeneye.monitor import GemSettings
@@ -11,21 +10,28 @@ from greeneye.monitor import PulseCounter
 from greeneye.monitor import TemperatureSensor
 from greeneye.monitor import VoltageSensor
 from homeassistant.components.sensor import SensorEntity
-from homeassistant.config import async_hass_config_yaml
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
 from homeassistant.core import split_entity_id
 from homeassistant.helpers.device_registry import async_get as async_get_device_registry
+from homeassistant.helpers.device_registry import DeviceEntry
 from homeassistant.helpers.entity import Entity
 from homeassistant.helpers.entity_component import (
     DATA_INSTANCES as DATA_ENTITY_COMPONENTS,
 )
 from homeassistant.helpers.entity_component import EntityComponent
-from homeassistant.helpers.entity_registry import async_get as async_get_entity_registry
+from homeassistant.helpers.entity_registry import DeletedRegistryEntry
 from homeassistant.helpers.entity_registry import RegistryEntry as EntityRegistryEntry
 from homeassistant.helpers.issue_registry import async_get as async_get_issue_registry
 
+from .const import DATA_YAML_CONFIG
 from .const import DOMAIN
+from .const import ISSUE_REMOVE_YAML
+from .const import make_entity_excluded_issue_id
+from .monitor_stats import DATA_MONITOR_STATS
+from .monitor_stats import MonitorStats
+from .registry_index import async_get_registry_index
+from .servers import MonitorServers
 
 
 async def async_get_config_entry_diagnostics(
@@ -33,33 +39,40 @@ async def async_get_config_entry_diagnostics(
 ) -> dict[str, Any]:
     """Return diagnostics for a config entry."""
 
-    config = await async_hass_config_yaml(hass)
-    monitors: Monitors = hass.data[DOMAIN]
+    monitors: MonitorServers = hass.data[DOMAIN]
+    stats: dict[int, MonitorStats] = hass.data.get(DATA_MONITOR_STATS, {})
+    registry_index = async_get_registry_index(hass, entry)
+    registry_entries = registry_index.entries()
 
     return {
         "current_time": datetime.now().isoformat(),
-        "yaml": config.get(DOMAIN),
+        "yaml": hass.data.get(DATA_YAML_CONFIG),
         "config_entry": entry.as_dict(),
+        "servers": {
+            port: server_as_dict(monitors, port, stats) for port in monitors.ports
+        },
         "monitors": {
-            number: monitor_as_dict(monitor)
+            number: monitor_as_dict(monitor, stats.get(number))
             for number, monitor in monitors.monitors.items()
         },
-        "entities": entities_as_dict(hass),
-        "issues": issues_as_list(hass),
-        "registries": registries_as_dict(hass),
+        "entities": entities_as_dict(hass, registry_entries),
+        "issues": issues_as_list(hass, registry_entries),
+        "registries": registries_as_dict(
+            hass, registry_entries, registry_index.deleted_entries()
+        ),
     }
 
 
-def entities_as_dict(hass: HomeAssistant) -> dict[str, Any]:
-    er = async_get_entity_registry(hass)
+def entities_as_dict(
+    hass: HomeAssistant, registry_entries: list[EntityRegistryEntry]
+) -> dict[str, Any]:
     return {
         registry_entry.entity_id: {
             "registry": registry_entry.as_partial_dict,
             "entity": entity_as_dict(_get_entity(hass, registry_entry)),
             "state": hass.states.get(registry_entry.entity_id),
         }
-        for registry_entry in er.entities.values()
-        if registry_entry.platform == DOMAIN
+        for registry_entry in registry_entries
     }
 
 
@@ -107,19 +120,21 @@ def base_entity_as_dict(entity: Entity) -> dict[str, Any]:
     }
 
 
-def registries_as_dict(hass: HomeAssistant) -> dict[str, Any]:
+def registries_as_dict(
+    hass: HomeAssistant,
+    registry_entries: list[EntityRegistryEntry],
+    deleted_entries: list[DeletedRegistryEntry],
+) -> dict[str, Any]:
     dr = async_get_device_registry(hass)
-    er = async_get_entity_registry(hass)
-    device_ids = {
-        entity.device_id for entity in er.entities.values() if entity.platform == DOMAIN
-    }
+    devices: dict[str, DeviceEntry] = {}
+    for registry_entry in registry_entries:
+        if registry_entry.device_id and registry_entry.device_id not in devices:
+            device = dr.async_get(registry_entry.device_id)
+            if device is not None:
+                devices[device.id] = device
 
     return {
-        "devices": {
-            id: device.dict_repr
-            for id, device in dr.devices.items()
-            if device.id in device_ids
-        },
+        "devices": {id: device.dict_repr for id, device in devices.items()},
         "deleted_entities": [
             {
                 "entity_id": deleted.entity_id,
@@ -130,22 +145,51 @@ def registries_as_dict(hass: HomeAssistant) -> dict[str, Any]:
                 "id": deleted.id,
                 "orphaned_timestamp": deleted.orphaned_timestamp,
             }
-            for deleted in er.deleted_entities.values()
-            if deleted.platform == DOMAIN
+            for deleted in deleted_entries
         ],
     }
 
 
-def issues_as_list(hass: HomeAssistant) -> list[dict[str, Any]]:
+def issues_as_list(
+    hass: HomeAssistant, registry_entries: list[EntityRegistryEntry]
+) -> list[dict[str, Any]]:
     ir = async_get_issue_registry(hass)
+    issue_ids = [ISSUE_REMOVE_YAML] + [
+        make_entity_excluded_issue_id(registry_entry.entity_id)
+        for registry_entry in registry_entries
+    ]
     return [
         issue.to_json()
-        for (domain, _), issue in ir.issues.items()
-        if domain == DOMAIN and issue.active
+        for issue_id in issue_ids
+        if (issue := ir.async_get_issue(DOMAIN, issue_id)) is not None and issue.active
     ]
 
 
-def monitor_as_dict(monitor: Monitor) -> dict[str, Any]:
+def server_as_dict(
+    monitors: MonitorServers, port: int, stats: dict[int, MonitorStats]
+) -> dict[str, Any]:
+    serial_numbers = [
+        monitor.serial_number for monitor in monitors.monitors_on_port(port)
+    ]
+    server_stats = [
+        stats[serial_number]
+        for serial_number in serial_numbers
+        if serial_number in stats
+    ]
+    return {
+        "monitors": serial_numbers,
+        "packets": sum(monitor_stats.packets for monitor_stats in server_stats),
+        "bytes": sum(monitor_stats.bytes for monitor_stats in server_stats),
+        "writes": sum(monitor_stats.writes for monitor_stats in server_stats),
+        "packets_per_second": sum(
+            monitor_stats.sample.packets_per_second
+            for monitor_stats in server_stats
+            if monitor_stats.sample
+        ),
+    }
+
+
+def monitor_as_dict(monitor: Monitor, stats: MonitorStats | None) -> dict[str, Any]:
     return {
         "serial_number": monitor.serial_number,
         "packet_format": monitor.packet_format,
@@ -163,6 +207,7 @@ def monitor_as_dict(monitor: Monitor) -> dict[str, Any]:
         ],
         "voltage_sensor": voltage_sensor_as_dict(monitor.voltage_sensor),
         "listeners": len(monitor._listeners),
+        "stats": stats.as_dict() if stats else None,
     }
 
 
@@ -0,0 +1,202 @@
+"""Hourly energy statistics for the channels of Brultech energy monitors, imported directly into the recorder."""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime
+from datetime import timedelta
+
+import greeneye
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.models import StatisticData
+from homeassistant.components.recorder.models import StatisticMetaData
+from homeassistant.components.recorder.statistics import async_add_external_statistics
+from homeassistant.components.recorder.statistics import get_last_statistics
+from homeassistant.const import UnitOfEnergy
+from homeassistant.core import callback
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.event import async_track_utc_time_change
+
+from .const import DOMAIN
+from .const import get_monitor_type_short_name
+from .decoder import PACKET_FORMATS_BY_TYPE
+
+WATT_SECONDS_PER_KILOWATT_HOUR = 3600000
+
+
+def make_statistic_id(
+    monitor: greeneye.monitor.Monitor, channel: greeneye.monitor.Channel
+) -> str:
+    channel_type = "channel" if not channel.is_aux else "aux"
+    return (
+        f"{DOMAIN}:{monitor.serial_number}_{channel_type}_{channel.number + 1}_energy"
+    )
+
+
+def _counter_max(
+    monitor: greeneye.monitor.Monitor, channel: greeneye.monitor.Channel
+) -> int | None:
+    """Return the largest value the channel's counters reach before wrapping to 0, if the monitor's packet format is known."""
+    packet_format = PACKET_FORMATS_BY_TYPE.get(monitor.packet_format)  # type: ignore[arg-type]
+    if packet_format is None:
+        return None
+    field = packet_format.fields.get(
+        "aux" if channel.is_aux else "absolute_watt_seconds"
+    )
+    elem_field = getattr(field, "elem_field", None)
+    return getattr(elem_field, "max", None)
+
+
+class ChannelEnergyStatistics:
+    """Keeps the running energy sum of one channel across hours.
+
+    The sum is built from the deltas of the channel's absolute and polarized
+    watt-second counters, the energy used being the absolute delta less twice the
+    polarized (produced) one, as greeneye computes it. It falls in hours when a net
+    metered channel produces more than it consumes. Counters that pass their largest
+    value wrap around to 0, and are counted across the wrap. A drop in the absolute
+    counter that is not a wrap is taken to be a reset of both counters to 0; the
+    polarized counter only ever drops with it.
+
+    Each hourly row records the channel's net kilowatt-hour counter as its state. The
+    state of the last row is where counting resumes after a restart, so no energy is
+    lost while Home Assistant is down; if a channel that is not net metered reads less
+    than that, its counters are taken to have been reset in the meantime.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        monitor: greeneye.monitor.Monitor,
+        channel: greeneye.monitor.Channel,
+        net_metering: bool,
+    ) -> None:
+        self._hass = hass
+        self._channel = channel
+        self._net_metering = net_metering
+        self._monitor = monitor
+        self._last_kwh: float | None = None
+        self._last_absolute: int | None = None
+        self._last_polarized = 0
+        self._sum = 0.0
+        self._loaded = False
+        channel_type = "channel" if not channel.is_aux else "aux"
+        self.metadata = StatisticMetaData(
+            has_mean=False,
+            has_sum=True,
+            name=f"{get_monitor_type_short_name(monitor)} {monitor.serial_number} {channel_type} {channel.number + 1} energy",
+            source=DOMAIN,
+            statistic_id=make_statistic_id(monitor, channel),
+            unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+        )
+
+    @property
+    def _kwh(self) -> float | None:
+        absolute = self._channel.absolute_watt_seconds
+        if absolute is None:
+            return None
+        polarized = self._channel.polarized_watt_seconds or 0
+        return (absolute - 2 * polarized) / WATT_SECONDS_PER_KILOWATT_HOUR
+
+    def _delta(self, previous: int, current: int) -> int | None:
+        """Return how far a counter went from previous to current, or None if it was reset."""
+        if current >= previous:
+            return current - previous
+        counter_max = _counter_max(self._monitor, self._channel)
+        if counter_max is not None:
+            wrapped = counter_max + 1 - previous + current
+            # A wrap only happens near the top of the range, a reset anywhere
+            if wrapped <= counter_max // 2:
+                return wrapped
+        return None
+
+    def _used_watt_seconds(self, absolute: int, polarized: int) -> int:
+        assert self._last_absolute is not None
+        used_absolute = self._delta(self._last_absolute, absolute)
+        if used_absolute is None:
+            return absolute - 2 * polarized
+        produced = self._delta(self._last_polarized, polarized) or 0
+        return used_absolute - 2 * produced
+
+    async def async_load(self) -> None:
+        """Resume from the last row recorded for this channel, if any."""
+        statistic_id = self.metadata["statistic_id"]
+        last_statistics = await get_instance(self._hass).async_add_executor_job(
+            get_last_statistics,
+            self._hass,
+            1,
+            statistic_id,
+            False,
+            {"state", "sum"},
+        )
+        if rows := last_statistics.get(statistic_id):
+            self._last_kwh = rows[0].get("state")
+            self._sum = rows[0].get("sum") or 0.0
+        else:
+            self._last_kwh = self._kwh
+            self._last_absolute = self._channel.absolute_watt_seconds
+            self._last_polarized = self._channel.polarized_watt_seconds or 0
+        self._loaded = True
+
+    @callback
+    def async_end_hour(self, start: datetime) -> StatisticData | None:
+        """Return the row for the hour that began at start, or None if there is nothing to record yet."""
+        kwh = self._kwh
+        absolute = self._channel.absolute_watt_seconds
+        if not self._loaded or kwh is None or absolute is None:
+            return None
+        polarized = self._channel.polarized_watt_seconds or 0
+
+        if self._last_absolute is not None:
+            used = (
+                self._used_watt_seconds(absolute, polarized)
+                / WATT_SECONDS_PER_KILOWATT_HOUR
+            )
+        elif self._last_kwh is not None:
+            # Resuming from the last row, which only has the net counter
+            used = kwh - self._last_kwh
+            if used < 0 and not self._net_metering:
+                used = kwh
+        else:
+            used = 0.0
+        self._sum += used
+        self._last_kwh = kwh
+        self._last_absolute = absolute
+        self._last_polarized = polarized
+        return StatisticData(start=start, state=kwh, sum=self._sum)
+
+
+class EnergyStatisticsWriter:
+    """Imports the hourly energy statistics of all channels at the top of every UTC hour."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self._hass = hass
+        self._channels: list[ChannelEnergyStatistics] = []
+        self._cancel_timer = async_track_utc_time_change(
+            hass, self._async_end_hour, minute=0, second=0
+        )
+
+    async def async_add_channels(
+        self,
+        monitor: greeneye.monitor.Monitor,
+        channels: list[tuple[greeneye.monitor.Channel, bool]],
+    ) -> None:
+        """Start recording statistics for the given channels, each with whether it is net metered."""
+        new_channels = [
+            ChannelEnergyStatistics(self._hass, monitor, channel, net_metering)
+            for channel, net_metering in channels
+        ]
+        self._channels.extend(new_channels)
+        await asyncio.gather(*(statistics.async_load() for statistics in new_channels))
+
+    @callback
+    def _async_end_hour(self, now: datetime) -> None:
+        start = now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
+        for statistics in self._channels:
+            if row := statistics.async_end_hour(start):
+                async_add_external_statistics(self._hass, statistics.metadata, [row])
+
+    @callback
+    def async_close(self) -> None:
+        """Stop the hourly timer."""
+        self._cancel_timer()
+        self._channels.clear()
@@ -0,0 +1,282 @@
+"""The connections that Brultech energy monitors send their packets over."""
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Awaitable
+from collections.abc import Callable
+from dataclasses import dataclass
+from weakref import WeakKeyDictionary
+
+import greeneye
+from greeneye.monitor import MonitorProtocolProcessor
+from greeneye.protocol import GemProtocol
+from siobrultech_protocols.gem.protocol import ConnectionLostMessage
+from siobrultech_protocols.gem.protocol import ConnectionMadeMessage
+from siobrultech_protocols.gem.protocol import PacketProtocolMessage
+from siobrultech_protocols.gem.protocol import PacketReceivedMessage
+
+# Creates the protocol for a new connection, given the queue it passes its messages to
+# and whether it should ask the monitor to delay packets during API calls
+ProtocolFactory = Callable[
+    ["asyncio.Queue[PacketProtocolMessage]", bool], "IngressGemProtocol"
+]
+
+# Called with the time.time() at which a chunk of data arrived, and the data itself
+DataListener = Callable[[float, bytes], None]
+
+# When the data of the packet each monitor is handling, or last handled, arrived
+_PACKET_RECEIVED_AT: WeakKeyDictionary[
+    greeneye.monitor.Monitor, float
+] = WeakKeyDictionary()
+
+
+class PacketListener:
+    """Is told when a monitor starts and finishes handling each of its packets.
+
+    Both are called for every packet an IngressMonitors hands to a monitor it already
+    knows, whether or not the monitor skips the packet, and for nothing else the
+    monitor's own listeners are called for, such as loading its settings.
+    """
+
+    def packet_started(self, size: int) -> None:
+        """Called before the monitor handles a packet, with the number of bytes that arrived for it."""
+
+    def packet_ended(self) -> None:
+        """Called once the monitor and all of its listeners are done with the packet."""
+
+
+_PACKET_LISTENERS: WeakKeyDictionary[
+    greeneye.monitor.Monitor, list[PacketListener]
+] = WeakKeyDictionary()
+
+
+def add_packet_listener(
+    monitor: greeneye.monitor.Monitor, listener: PacketListener
+) -> None:
+    _PACKET_LISTENERS.setdefault(monitor, []).append(listener)
+
+
+def remove_packet_listener(
+    monitor: greeneye.monitor.Monitor, listener: PacketListener
+) -> None:
+    _PACKET_LISTENERS[monitor].remove(listener)
+
+
+def notify_packet_started(monitor: greeneye.monitor.Monitor, size: int) -> None:
+    for listener in list(_PACKET_LISTENERS.get(monitor, [])):
+        listener.packet_started(size)
+
+
+def notify_packet_ended(monitor: greeneye.monitor.Monitor) -> None:
+    for listener in list(_PACKET_LISTENERS.get(monitor, [])):
+        listener.packet_ended()
+
+
+def set_packet_received_at(
+    monitor: greeneye.monitor.Monitor, received_at: float
+) -> None:
+    _PACKET_RECEIVED_AT[monitor] = received_at
+
+
+def get_packet_received_at(monitor: greeneye.monitor.Monitor) -> float | None:
+    """Return the time.monotonic() at which the data of the monitor's latest packet arrived."""
+    return _PACKET_RECEIVED_AT.get(monitor)
+
+
+@dataclass(frozen=True)
+class TimedPacketReceivedMessage(PacketReceivedMessage):
+    """A PacketReceivedMessage that also says when the data of its packet arrived, by time.monotonic()."""
+
+    received_at: float
+
+
+class _TimingQueue:
+    """Passes the messages of an IngressGemProtocol on, stamping packets with the arrival of the data they were parsed from."""
+
+    def __init__(
+        self,
+        protocol: IngressGemProtocol,
+        queue: asyncio.Queue[PacketProtocolMessage],
+    ) -> None:
+        self._protocol = protocol
+        self._queue = queue
+
+    def put_nowait(self, message: PacketProtocolMessage) -> None:
+        if isinstance(message, PacketReceivedMessage) and not isinstance(
+            message, TimedPacketReceivedMessage
+        ):
+            message = TimedPacketReceivedMessage(
+                protocol=message.protocol,
+                packet=message.packet,
+                received_at=self._protocol.received_at,
+            )
+        self._queue.put_nowait(message)
+
+
+class IngressGemProtocol(GemProtocol):
+    """A GemProtocol that notes when each chunk of data arrives, and passes that on with the packets parsed from it.
+
+    The packets reach the monitors through a queue, so this is the only place that knows
+    how long they waited in it. It is also the only place that sees the data exactly as
+    the monitor sent it, before anything is parsed out of it, so data_listener, if set,
+    is given every chunk as it arrives, and bytes_received counts them. The address
+    the connection came from is kept as peer_address, in the "host:port" form, to tell
+    connections apart by.
+    """
+
+    def __init__(
+        self, queue: asyncio.Queue[PacketProtocolMessage], send_packet_delay: bool
+    ) -> None:
+        super().__init__(
+            _TimingQueue(self, queue),  # type: ignore[arg-type]
+            send_packet_delay=send_packet_delay,
+        )
+        self.received_at = time.monotonic()
+        self.data_listener: DataListener | None = None
+        self.bytes_received = 0
+        self.peer_address: str | None = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        peername = transport.get_extra_info("peername")
+        if isinstance(peername, tuple):
+            self.peer_address = f"{peername[0]}:{peername[1]}"
+        super().connection_made(transport)
+
+    def data_received(self, data: bytes) -> None:
+        self.received_at = time.monotonic()
+        self.bytes_received += len(data)
+        if self.data_listener is not None:
+            self.data_listener(time.time(), data)
+        super().data_received(data)
+
+
+def create_gem_protocol(
+    queue: asyncio.Queue[PacketProtocolMessage], send_packet_delay: bool
+) -> IngressGemProtocol:
+    return IngressGemProtocol(queue, send_packet_delay=send_packet_delay)
+
+
+class IngressProtocolProcessor(MonitorProtocolProcessor):
+    """A MonitorProtocolProcessor whose connections use protocols from the given factory."""
+
+    def __init__(
+        self,
+        listener: Callable[[PacketProtocolMessage], Awaitable[None]],
+        send_packet_delay: bool,
+        create_protocol: ProtocolFactory,
+    ) -> None:
+        super().__init__(listener, send_packet_delay=send_packet_delay)
+        self._protocol_factory = create_protocol
+
+    def _create_protocol(self) -> IngressGemProtocol:
+        protocol = self._protocol_factory(self._queue, self._send_packet_delay)
+        self._protocols[id(protocol)] = protocol
+        return protocol
+
+
+class IngressMonitors(greeneye.Monitors):
+    """A greeneye.Monitors whose connections use protocols from the given factory.
+
+    The arrival time of each packet from an IngressGemProtocol is recorded for its
+    monitor, for get_packet_received_at, before the monitor handles the packet. The
+    monitor's packet listeners are told when it starts and finishes handling the packet,
+    and the packet is given the bytes that arrived on its connection since the one
+    before it on that connection. The monitors that have sent packets over each open
+    connection are tracked as well, for connected_monitors.
+
+    greeneye.Monitors always creates a processor of its own, so that one is stopped and
+    replaced with an IngressProtocolProcessor before anything can connect to it. This
+    relies on greeneye internals, which is why the manifest only allows the greeneye
+    releases this was written against.
+    """
+
+    def __init__(
+        self,
+        send_packet_delay: bool,
+        create_protocol: ProtocolFactory = create_gem_protocol,
+    ) -> None:
+        super().__init__(send_packet_delay=send_packet_delay)
+        default_processor = self._processor
+        if default_processor._consumer_task is not None:
+            default_processor._consumer_task.cancel()
+        self._processor = IngressProtocolProcessor(
+            self._handle_message, send_packet_delay, create_protocol
+        )
+        self._connections: dict[
+            IngressGemProtocol, dict[int, greeneye.monitor.Monitor]
+        ] = {}
+        self._monitor_connections: dict[int, IngressGemProtocol] = {}
+        # How many of the bytes received on each connection went to earlier packets
+        self._bytes_counted: dict[IngressGemProtocol, int] = {}
+
+    @property
+    def connected_monitors(self) -> list[greeneye.monitor.Monitor]:
+        """Return the monitors that have sent packets over a connection that is still open, by serial number."""
+        monitors = {
+            serial_number: monitor
+            for connection in self._connections.values()
+            for serial_number, monitor in connection.items()
+        }
+        return [monitors[serial_number] for serial_number in sorted(monitors)]
+
+    def peer_address(self, serial_number: int) -> str | None:
+        """Return the address of the open connection the given monitor sent its latest packet over, if any."""
+        protocol = self._monitor_connections.get(serial_number)
+        if protocol is None:
+            return None
+        return protocol.peer_address
+
+    async def _handle_message(self, message: PacketProtocolMessage) -> None:
+        protocol = message.protocol
+        if isinstance(message, PacketReceivedMessage):
+            packet = message.packet
+            serial_number = packet.device_id * 100000 + packet.serial_number
+            monitor = self.monitors.get(serial_number)
+            if monitor is not None:
+                if isinstance(message, TimedPacketReceivedMessage):
+                    set_packet_received_at(monitor, message.received_at)
+                notify_packet_started(monitor, self._count_bytes(protocol))
+            await super()._handle_message(message)
+            if monitor is not None:
+                notify_packet_ended(monitor)
+            if self._monitor_connections.get(serial_number) is not protocol:
+                self._move_monitor(serial_number, protocol)
+            return
+
+        if isinstance(message, ConnectionMadeMessage) and isinstance(
+            protocol, IngressGemProtocol
+        ):
+            self._connections[protocol] = {}
+            self._bytes_counted[protocol] = 0
+        elif isinstance(message, ConnectionLostMessage) and isinstance(
+            protocol, IngressGemProtocol
+        ):
+            self._bytes_counted.pop(protocol, None)
+            for serial_number in self._connections.pop(protocol, {}):
+                if self._monitor_connections.get(serial_number) is protocol:
+                    del self._monitor_connections[serial_number]
+        await super()._handle_message(message)
+
+    def _count_bytes(self, protocol: object) -> int:
+        # Packets can still be handed over after their connection is lost
+        if protocol not in self._bytes_counted:
+            return 0
+        assert isinstance(protocol, IngressGemProtocol)
+        size = protocol.bytes_received - self._bytes_counted[protocol]
+        self._bytes_counted[protocol] = protocol.bytes_received
+        return size
+
+    def _move_monitor(self, serial_number: int, protocol: object) -> None:
+        # A monitor only has one connection, the one its latest packet came over
+        old_protocol = self._monitor_connections.pop(serial_number, None)
+        if old_protocol is not None and old_protocol in self._connections:
+            self._connections[old_protocol].pop(serial_number, None)
+        monitor = self.monitors.get(serial_number)
+        if (
+            isinstance(protocol, IngressGemProtocol)
+            and protocol in self._connections
+            and monitor is not None
+        ):
+            self._connections[protocol][serial_number] = monitor
+            self._monitor_connections[serial_number] = protocol
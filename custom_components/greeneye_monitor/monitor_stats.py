@@ -0,0 +1,298 @@
+"""Cheap load counters for each Brultech energy monitor."""
+from __future__ import annotations
+
+import time
+from bisect import bisect_left
+from dataclasses import asdict
+from dataclasses import dataclass
+from datetime import datetime
+from datetime import timedelta
+from typing import Any
+from typing import Callable
+
+import greeneye
+from homeassistant.core import callback
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .ingress import add_packet_listener
+from .ingress import get_packet_received_at
+from .ingress import PacketListener
+from .ingress import remove_packet_listener
+
+DATA_MONITOR_STATS = f"{DOMAIN}_monitor_stats"
+
+STATS_SAMPLE_INTERVAL = timedelta(minutes=1)
+
+# Bound on the dispatch times kept between samples, in case samples stop being taken
+MAX_DISPATCH_TIMES = 10000
+
+# Upper bounds of the buckets of the latency histograms. Latencies past the last bound
+# are counted in one more, unbounded, bucket.
+LATENCY_BUCKET_MILLISECONDS = [
+    1,
+    2,
+    5,
+    10,
+    20,
+    50,
+    100,
+    200,
+    500,
+    1000,
+    2000,
+    5000,
+    10000,
+    30000,
+]
+
+
+@dataclass(frozen=True)
+class MonitorStatsSample:
+    """Rates computed from the counters of a MonitorStats over one sample interval."""
+
+    packets_per_second: float
+    bytes_per_second: float
+    seconds_since_last_packet: float | None
+    dispatch_milliseconds_p50: float | None
+    dispatch_milliseconds_p99: float | None
+    queue_milliseconds_p50: float | None
+    queue_milliseconds_p95: float | None
+    queue_milliseconds_p99: float | None
+    state_milliseconds_p50: float | None
+    state_milliseconds_p95: float | None
+    state_milliseconds_p99: float | None
+    writes_per_minute: float
+    filtered_writes_per_minute: float
+    dropped_writes_per_minute: float
+
+
+class LatencyHistogram:
+    """Counts latencies in the fixed buckets of LATENCY_BUCKET_MILLISECONDS.
+
+    Percentiles are reported as the upper bound of the bucket they fall in, or the last
+    bound if they fall past it. Percentiles over any interval can be had by subtracting
+    the counts at its start.
+    """
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(LATENCY_BUCKET_MILLISECONDS) + 1)
+
+    def add(self, seconds: float) -> None:
+        self.counts[bisect_left(LATENCY_BUCKET_MILLISECONDS, seconds * 1000)] += 1
+
+    def percentile_milliseconds(
+        self, fraction: float, since: list[int] | None = None
+    ) -> float | None:
+        counts = (
+            self.counts
+            if since is None
+            else [count - before for count, before in zip(self.counts, since)]
+        )
+        rank = fraction * sum(counts)
+        if not rank:
+            return None
+        cumulative = 0
+        for index, count in enumerate(counts):
+            cumulative += count
+            if cumulative >= rank:
+                break
+        return LATENCY_BUCKET_MILLISECONDS[
+            min(index, len(LATENCY_BUCKET_MILLISECONDS) - 1)
+        ]
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "bucket_milliseconds": LATENCY_BUCKET_MILLISECONDS,
+            "counts": list(self.counts),
+            "p50": self.percentile_milliseconds(0.50),
+            "p95": self.percentile_milliseconds(0.95),
+            "p99": self.percentile_milliseconds(0.99),
+        }
+
+
+class MonitorStats(PacketListener):
+    """Counts the packets from one monitor, the bytes they arrived in, and the state writes they cause.
+
+    The connection tells the stats when the monitor starts and finishes handling each
+    packet, and how many bytes arrived for it. The time from start to end is the time
+    taken to dispatch the packet to every listener.
+
+    The connection also notes when the data of each packet arrived, by the host's
+    monotonic clock (see get_packet_received_at). The time from then to the start of the
+    packet is how long the packet waited for the event loop. At the end of a packet that
+    caused state writes, that is added to the queue latency histogram, and the time from
+    the arrival to the end to the state latency histogram (how long until its states were
+    written).
+    """
+
+    def __init__(self, monitor: greeneye.monitor.Monitor) -> None:
+        self._monitor = monitor
+        self._packet_started_at: float | None = None
+        self._packet_received_at: float | None = None
+        self._writes_at_packet_start = 0
+        self._dispatch_times: list[float] = []
+        self._last_sample_at = time.monotonic()
+        self._last_sample_counts = (0, 0, 0, 0, 0)
+        self._last_sample_latency_counts: tuple[list[int], list[int]] | None = None
+        self._listeners: list[Callable[[], None]] = []
+        self.packets = 0
+        self.bytes = 0
+        self.writes = 0
+        self.filtered_writes = 0
+        self.dropped_writes = 0
+        self.last_packet_at: float | None = None
+        self.queue_latency = LatencyHistogram()
+        self.state_latency = LatencyHistogram()
+        self.sample: MonitorStatsSample | None = None
+
+    def add_listener(self, listener: Callable[[], None]) -> None:
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[], None]) -> None:
+        self._listeners.remove(listener)
+
+    @callback
+    def packet_started(self, size: int) -> None:
+        now = time.monotonic()
+        self.packets += 1
+        self.bytes += size
+        self.last_packet_at = now
+        self._packet_started_at = now
+        self._writes_at_packet_start = self.writes
+        self._packet_received_at = get_packet_received_at(self._monitor)
+
+    @callback
+    def packet_ended(self) -> None:
+        if self._packet_started_at is None:
+            return
+        now = time.monotonic()
+        if len(self._dispatch_times) < MAX_DISPATCH_TIMES:
+            self._dispatch_times.append(now - self._packet_started_at)
+        if (
+            self.writes > self._writes_at_packet_start
+            and self._packet_received_at is not None
+        ):
+            self.queue_latency.add(self._packet_started_at - self._packet_received_at)
+            self.state_latency.add(now - self._packet_received_at)
+        self._packet_started_at = None
+
+    @property
+    def packet_in_progress(self) -> bool:
+        """Return whether the start of a packet has been seen, but not its end."""
+        return self._packet_started_at is not None
+
+    def packet_queue_seconds(self) -> float | None:
+        """Return how long the packet being handled, or last handled, waited for the event loop."""
+        if self._packet_received_at is None or self.last_packet_at is None:
+            return None
+        return self.last_packet_at - self._packet_received_at
+
+    @callback
+    def async_close(self) -> None:
+        remove_packet_listener(self._monitor, self)
+
+    @callback
+    def async_sample(self, _: datetime | None = None) -> None:
+        """Compute the rates since the last sample and notify listeners."""
+        now = time.monotonic()
+        elapsed = now - self._last_sample_at
+        counts = (
+            self.packets,
+            self.bytes,
+            self.writes,
+            self.filtered_writes,
+            self.dropped_writes,
+        )
+        packets, bytes, writes, filtered_writes, dropped_writes = (
+            count - last for count, last in zip(counts, self._last_sample_counts)
+        )
+        dispatch_times = sorted(self._dispatch_times)
+        self._dispatch_times.clear()
+        queue_since, state_since = self._last_sample_latency_counts or (None, None)
+        self._last_sample_at = now
+        self._last_sample_counts = counts
+        self._last_sample_latency_counts = (
+            list(self.queue_latency.counts),
+            list(self.state_latency.counts),
+        )
+
+        self.sample = MonitorStatsSample(
+            packets_per_second=packets / elapsed,
+            bytes_per_second=bytes / elapsed,
+            seconds_since_last_packet=(
+                now - self.last_packet_at if self.last_packet_at is not None else None
+            ),
+            dispatch_milliseconds_p50=_percentile_milliseconds(dispatch_times, 0.50),
+            dispatch_milliseconds_p99=_percentile_milliseconds(dispatch_times, 0.99),
+            queue_milliseconds_p50=self.queue_latency.percentile_milliseconds(
+                0.50, queue_since
+            ),
+            queue_milliseconds_p95=self.queue_latency.percentile_milliseconds(
+                0.95, queue_since
+            ),
+            queue_milliseconds_p99=self.queue_latency.percentile_milliseconds(
+                0.99, queue_since
+            ),
+            state_milliseconds_p50=self.state_latency.percentile_milliseconds(
+                0.50, state_since
+            ),
+            state_milliseconds_p95=self.state_latency.percentile_milliseconds(
+                0.95, state_since
+            ),
+            state_milliseconds_p99=self.state_latency.percentile_milliseconds(
+                0.99, state_since
+            ),
+            writes_per_minute=writes * 60 / elapsed,
+            filtered_writes_per_minute=filtered_writes * 60 / elapsed,
+            dropped_writes_per_minute=dropped_writes * 60 / elapsed,
+        )
+        for listener in self._listeners:
+            listener()
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "packets": self.packets,
+            "bytes": self.bytes,
+            "writes": self.writes,
+            "filtered_writes": self.filtered_writes,
+            "dropped_writes": self.dropped_writes,
+            "seconds_since_last_packet": (
+                time.monotonic() - self.last_packet_at
+                if self.last_packet_at is not None
+                else None
+            ),
+            "queue_latency": self.queue_latency.as_dict(),
+            "state_latency": self.state_latency.as_dict(),
+            "sample": asdict(self.sample) if self.sample else None,
+        }
+
+
+def _percentile_milliseconds(
+    sorted_seconds: list[float], fraction: float
+) -> float | None:
+    if not sorted_seconds:
+        return None
+    index = min(int(len(sorted_seconds) * fraction), len(sorted_seconds) - 1)
+    return sorted_seconds[index] * 1000
+
+
+@callback
+def async_get_monitor_stats(
+    hass: HomeAssistant, monitor: greeneye.monitor.Monitor
+) -> MonitorStats:
+    """Return the stats for the given monitor, creating them if needed."""
+    all_stats: dict[int, MonitorStats] = hass.data.setdefault(DATA_MONITOR_STATS, {})
+    stats = all_stats.get(monitor.serial_number)
+    if stats is None:
+        stats = all_stats[monitor.serial_number] = MonitorStats(monitor)
+        add_packet_listener(monitor, stats)
+    return stats
+
+
+@callback
+def async_remove_monitor_stats(hass: HomeAssistant) -> None:
+    """Drop the stats for all monitors."""
+    all_stats: dict[int, MonitorStats] = hass.data.pop(DATA_MONITOR_STATS, {})
+    for stats in all_stats.values():
+        stats.async_close()
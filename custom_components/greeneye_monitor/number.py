@@ -1,5 +1,9 @@
 """Support for configuration entities that are numbers."""
 import logging
+from collections.abc import Awaitable
+from collections.abc import Callable
+from datetime import datetime
+from datetime import timedelta
 
 import greeneye
 from homeassistant.components.number import NumberEntity
@@ -7,20 +11,37 @@ from homeassistant.components.number import NumberMode
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import EntityCategory
 from homeassistant.const import UnitOfTime
+from homeassistant.core import callback
+from homeassistant.core import CALLBACK_TYPE
 from homeassistant.core import HomeAssistant
-from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity import Entity
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-
-from .const import CONF_MONITORS
-from .const import CONF_SERIAL_NUMBER
+from homeassistant.helpers.event import async_call_later
+
+from .config_index import async_get_config_index
+from .const import CONF_ADAPTIVE_PACKET_INTERVAL
+from .const import CONF_FLAT_DEVICES
+from .const import CONF_MAX_PACKET_INTERVAL
+from .const import CONF_MIN_PACKET_INTERVAL
+from .const import DEFAULT_MAX_PACKET_INTERVAL
+from .const import DEFAULT_MIN_PACKET_INTERVAL
 from .const import DEVICE_TYPE_CURRENT_TRANSFORMER
 from .const import DOMAIN
+from .const import has_flat_devices
 from .const import make_device_info
-
+from .const import make_flat_entity_name
+from .const import make_monitor_device_info
+from .const import set_flat_devices
+from .monitor_stats import async_get_monitor_stats
+from .packet_interval import PacketIntervalController
+from .servers import MonitorServers
 
 _LOGGER = logging.getLogger(__name__)
 
+# How long a setting must go without a new value before the last value is sent to the
+# monitor
+SETTING_WRITE_DELAY_SECONDS = 1.0
+
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -32,36 +53,76 @@ async def async_setup_entry(
 
     async def on_new_monitor(monitor: greeneye.monitor.Monitor) -> None:
         config_entry = hass.config_entries.async_get_entry(entry_id)
-        monitor_configs = config_entry.data[CONF_MONITORS]
-
-        serial_number = monitor.serial_number
-        monitor_config = next(
-            filter(
-                lambda config: config[CONF_SERIAL_NUMBER] == serial_number,
-                monitor_configs,
-            ),
-            None,
+        monitor_config = async_get_config_index(hass, config_entry).get_monitor_config(
+            monitor.serial_number
         )
 
-        if monitor_config is not None:
-            entities: list[Entity] = []
+        if monitor_config is None:
+            return
 
-            for channel in monitor.channels:
-                if channel.ct_type is not None:
-                    entities.append(ChannelTypeEntity(monitor, channel))
-                if channel.ct_range is not None:
-                    entities.append(ChannelRangeEntity(monitor, channel))
+        set_flat_devices(monitor, config_entry.options.get(CONF_FLAT_DEVICES, False))
+        if monitor.control is None:
+            # A monitor restored from a snapshot has no settings until it connects
+            waiting = True
 
-            if monitor.control is not None:
-                entities.append(PacketIntervalEntity(monitor))
+            @callback
+            def on_monitor_update() -> None:
+                if monitor.control is not None:
+                    stop_waiting()
+                    add_entities(config_entry, monitor)
 
-            async_add_entities(entities)
+            @callback
+            def stop_waiting() -> None:
+                nonlocal waiting
+                if waiting:
+                    waiting = False
+                    monitor.remove_listener(on_monitor_update)
 
-            _LOGGER.info(
-                "Added configuration entities for new monitor %d", monitor.serial_number
+            monitor.add_listener(on_monitor_update)
+            config_entry.async_on_unload(stop_waiting)
+            return
+
+        add_entities(config_entry, monitor)
+
+    def add_entities(
+        config_entry: ConfigEntry, monitor: greeneye.monitor.Monitor
+    ) -> None:
+        entities: list[Entity] = []
+
+        for channel in monitor.channels:
+            if channel.ct_type is not None:
+                entities.append(ChannelTypeEntity(hass, monitor, channel))
+            if channel.ct_range is not None:
+                entities.append(ChannelRangeEntity(hass, monitor, channel))
+
+        packet_interval_entity = None
+        if monitor.control is not None:
+            packet_interval_entity = PacketIntervalEntity(hass, monitor)
+            entities.append(packet_interval_entity)
+
+        async_add_entities(entities)
+
+        if packet_interval_entity is not None and config_entry.options.get(
+            CONF_ADAPTIVE_PACKET_INTERVAL, False
+        ):
+            controller = PacketIntervalController(
+                monitor,
+                async_get_monitor_stats(hass, monitor),
+                packet_interval_entity.writer.async_set,
+                config_entry.options.get(
+                    CONF_MIN_PACKET_INTERVAL, DEFAULT_MIN_PACKET_INTERVAL
+                ),
+                config_entry.options.get(
+                    CONF_MAX_PACKET_INTERVAL, DEFAULT_MAX_PACKET_INTERVAL
+                ),
             )
+            config_entry.async_on_unload(controller.async_close)
 
-    monitors: greeneye.Monitors = hass.data[DOMAIN]
+        _LOGGER.info(
+            "Added configuration entities for new monitor %d", monitor.serial_number
+        )
+
+    monitors: MonitorServers = hass.data[DOMAIN]
     monitors.add_listener(on_new_monitor)
     for monitor in monitors.monitors.values():
         await on_new_monitor(monitor)
@@ -69,139 +130,215 @@ async def async_setup_entry(
     return True
 
 
-class ChannelTypeEntity(NumberEntity):
-    _attr_mode = NumberMode.BOX
-    _attr_name = "CT type"
-    _attr_native_step = 1.0
-    _attr_native_min_value = 0
-    _attr_native_max_value = 255
+class SettingWriter:
+    """Sends only the last of a burst of values for one setting to the monitor.
+
+    Every command is a round trip that holds up packets from the monitor, so a value is
+    only sent once no other value has been set for SETTING_WRITE_DELAY_SECONDS, as when
+    a slider is dragged. A value set while an earlier one is being sent replaces any
+    value still waiting, and is sent after the earlier one once the delay has passed.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, write: Callable[[int], Awaitable[None]]
+    ) -> None:
+        self._hass = hass
+        self._write = write
+        self._pending: int | None = None
+        self._cancel_write: CALLBACK_TYPE | None = None
+        self._writing = False
+
+    @callback
+    def async_set(self, value: int) -> None:
+        """Send the given value once no other value follows it within the delay."""
+        self._pending = value
+        if self._cancel_write is not None:
+            self._cancel_write()
+        self._cancel_write = async_call_later(
+            self._hass, SETTING_WRITE_DELAY_SECONDS, self._async_write_later
+        )
+
+    @callback
+    def _async_write_later(self, _: datetime) -> None:
+        self._cancel_write = None
+        if not self._writing:
+            self._hass.async_create_task(self._async_write_pending())
+
+    async def _async_write_pending(self) -> None:
+        self._writing = True
+        try:
+            # Stop if another value was set during the write, its own timer sends it
+            while self._pending is not None and self._cancel_write is None:
+                value = self._pending
+                self._pending = None
+                try:
+                    await self._write(value)
+                except Exception:
+                    _LOGGER.exception("Failed to send setting value %d", value)
+        finally:
+            self._writing = False
+
+    @callback
+    def async_cancel(self) -> None:
+        """Drop any value that has not been sent yet."""
+        if self._cancel_write is not None:
+            self._cancel_write()
+            self._cancel_write = None
+        self._pending = None
+
+
+class MonitorSettingEntity(NumberEntity):
+    """Base class for entities showing a setting of a monitor.
+
+    The channel or monitor holding the setting notifies its listeners on every packet,
+    so the state is only written when the setting has changed since the last write.
+    New values go through the entity's SettingWriter, so only the last of a burst is
+    sent, whether they come from the UI or from elsewhere in the integration. The state
+    is refreshed once a value has been sent.
+    """
+
     _attr_entity_category = EntityCategory.CONFIG
     _attr_entity_registry_enabled_default = True
     _attr_has_entity_name = True
     _attr_should_poll = False
 
     def __init__(
-        self, monitor: greeneye.monitor.Monitor, channel: greeneye.monitor.Channel
+        self,
+        hass: HomeAssistant,
+        source: greeneye.monitor.Monitor | greeneye.monitor.Channel,
     ) -> None:
         super().__init__()
+        self._source = source
+        self._written_value: float | None = None
+        self._listening = False
+        self.writer = SettingWriter(hass, self._async_write)
+
+    async def async_added_to_hass(self) -> None:
+        """Wait for and connect to the sensor."""
+        self._source.add_listener(self._update)
+        self._listening = True
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Remove listener from the sensor."""
+        self._listening = False
+        self._source.remove_listener(self._update)
+        self.writer.async_cancel()
+
+    async def async_set_native_value(self, value: float) -> None:
+        self.writer.async_set(int(value))
+
+    async def _async_write(self, value: int) -> None:
+        await self._async_write_setting(value)
+        if self._listening:
+            self._update()
+
+    async def _async_write_setting(self, value: int) -> None:
+        """Send the given value of the setting to the monitor."""
+        raise NotImplementedError()
+
+    @callback
+    def _update(self) -> None:
+        if self.native_value != self._written_value:
+            self.async_write_ha_state()
+
+    @callback
+    def async_write_ha_state(self) -> None:
+        self._written_value = self.native_value
+        super().async_write_ha_state()
+
+
+class ChannelTypeEntity(MonitorSettingEntity):
+    _attr_mode = NumberMode.BOX
+    _attr_name = "CT type"
+    _attr_native_step = 1.0
+    _attr_native_min_value = 0
+    _attr_native_max_value = 255
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        monitor: greeneye.monitor.Monitor,
+        channel: greeneye.monitor.Channel,
+    ) -> None:
+        super().__init__(hass, channel)
         self._monitor = monitor
         self._channel = channel
         self._attr_unique_id = (
             f"{self._monitor.serial_number}-ct_type-{self._channel.number + 1}"
         )
-        assert self._channel.ct_type is not None
-
-    @property
-    def device_info(self) -> DeviceInfo | None:
-        return make_device_info(
-            self._monitor, DEVICE_TYPE_CURRENT_TRANSFORMER, self._channel.number
+        self._attr_device_info = make_device_info(
+            monitor, DEVICE_TYPE_CURRENT_TRANSFORMER, channel.number
         )
+        if has_flat_devices(monitor):
+            self._attr_name = make_flat_entity_name(
+                DEVICE_TYPE_CURRENT_TRANSFORMER, channel.number, self._attr_name
+            )
+        assert self._channel.ct_type is not None
 
     @property
     def native_value(self) -> float | None:
         return self._channel.ct_type
 
-    async def async_set_native_value(self, value: float) -> None:
-        await self._channel.set_ct_type(int(value))
-
-    async def async_added_to_hass(self) -> None:
-        """Wait for and connect to the sensor."""
-        self._channel.add_listener(self._update)
-
-    async def async_will_remove_from_hass(self) -> None:
-        """Remove listener from the sensor."""
-        if self._channel:
-            self._channel.remove_listener(self._update)
-
-    def _update(self) -> None:
-        self.async_write_ha_state()
+    async def _async_write_setting(self, value: int) -> None:
+        await self._channel.set_ct_type(value)
 
 
-class ChannelRangeEntity(NumberEntity):
+class ChannelRangeEntity(MonitorSettingEntity):
     _attr_mode = NumberMode.BOX
     _attr_name = "CT range"
     _attr_native_step = 1.0
     _attr_native_min_value = 0
     _attr_native_max_value = 15
-    _attr_entity_category = EntityCategory.CONFIG
-    _attr_entity_registry_enabled_default = True
-    _attr_has_entity_name = True
-    _attr_should_poll = False
 
     def __init__(
-        self, monitor: greeneye.monitor.Monitor, channel: greeneye.monitor.Channel
+        self,
+        hass: HomeAssistant,
+        monitor: greeneye.monitor.Monitor,
+        channel: greeneye.monitor.Channel,
     ) -> None:
-        super().__init__()
+        super().__init__(hass, channel)
         self._monitor = monitor
         self._channel = channel
         self._attr_unique_id = (
             f"{self._monitor.serial_number}-ct_range-{self._channel.number + 1}"
         )
-        assert self._channel.ct_range is not None
-
-    @property
-    def device_info(self) -> DeviceInfo | None:
-        return make_device_info(
-            self._monitor, DEVICE_TYPE_CURRENT_TRANSFORMER, self._channel.number
+        self._attr_device_info = make_device_info(
+            monitor, DEVICE_TYPE_CURRENT_TRANSFORMER, channel.number
         )
+        if has_flat_devices(monitor):
+            self._attr_name = make_flat_entity_name(
+                DEVICE_TYPE_CURRENT_TRANSFORMER, channel.number, self._attr_name
+            )
+        assert self._channel.ct_range is not None
 
     @property
     def native_value(self) -> float | None:
         return self._channel.ct_range
 
-    async def async_set_native_value(self, value: float) -> None:
-        await self._channel.set_ct_range(int(value))
-
-    async def async_added_to_hass(self) -> None:
-        """Wait for and connect to the sensor."""
-        self._channel.add_listener(self._update)
-
-    async def async_will_remove_from_hass(self) -> None:
-        """Remove listener from the sensor."""
-        if self._channel:
-            self._channel.remove_listener(self._update)
-
-    def _update(self) -> None:
-        self.async_write_ha_state()
+    async def _async_write_setting(self, value: int) -> None:
+        await self._channel.set_ct_range(value)
 
 
-class PacketIntervalEntity(NumberEntity):
+class PacketIntervalEntity(MonitorSettingEntity):
     _attr_mode = NumberMode.SLIDER
     _attr_name = "packet interval"
     _attr_native_step = 1.0
     _attr_native_min_value = 1
     _attr_native_max_value = 255
     _attr_native_unit_of_measurement = UnitOfTime.SECONDS
-    _attr_entity_category = EntityCategory.CONFIG
-    _attr_entity_registry_enabled_default = True
-    _attr_has_entity_name = True
-    _attr_should_poll = False
 
-    def __init__(self, monitor: greeneye.monitor.Monitor) -> None:
-        super().__init__()
+    def __init__(self, hass: HomeAssistant, monitor: greeneye.monitor.Monitor) -> None:
+        super().__init__(hass, monitor)
         self._monitor = monitor
         self._attr_unique_id = f"{monitor.serial_number}-packet_send_interval"
+        self._attr_device_info = make_monitor_device_info(monitor)
         assert self._monitor.control is not None
 
-    @property
-    def device_info(self) -> DeviceInfo | None:
-        return DeviceInfo(identifiers={(DOMAIN, f"{self._monitor.serial_number}")})
-
     @property
     def native_value(self) -> float | None:
         return self._monitor.packet_send_interval.total_seconds()
 
-    async def async_set_native_value(self, value: float) -> None:
-        await self._monitor.set_packet_send_interval(seconds=int(value))
-
-    async def async_added_to_hass(self) -> None:
-        """Wait for and connect to the sensor."""
-        self._monitor.add_listener(self._update)
-
-    async def async_will_remove_from_hass(self) -> None:
-        """Remove listener from the sensor."""
-        if self._monitor:
-            self._monitor.remove_listener(self._update)
-
-    def _update(self) -> None:
-        self.async_write_ha_state()
+    async def _async_write_setting(self, value: int) -> None:
+        await self._monitor.set_packet_send_interval(seconds=value)
+        # The library only reads this from the monitor's settings when it connects
+        self._monitor.packet_send_interval = timedelta(seconds=value)
@@ -0,0 +1,115 @@
+"""Adjusts how often a Brultech energy monitor sends packets to the load on Home Assistant and the monitor's channels."""
+from __future__ import annotations
+
+from collections.abc import Callable
+
+import greeneye
+from homeassistant.core import callback
+
+from .ingress import add_packet_listener
+from .ingress import PacketListener
+from .ingress import remove_packet_listener
+from .monitor_stats import MonitorStats
+
+# Packets waiting longer than this for the event loop, at the 95th percentile, or taking
+# longer than this to dispatch, at the 99th, mean Home Assistant is falling behind
+QUEUE_MILLISECONDS_HIGH = 200
+DISPATCH_MILLISECONDS_HIGH = 50
+
+# The largest change in a monitor's total power between two packets, as a fraction of
+# the total, above which the monitor's load is changing fast, and below which the house
+# is idle
+VOLATILE_POWER_CHANGE = 0.1
+IDLE_POWER_CHANGE = 0.01
+
+
+class PacketIntervalController(PacketListener):
+    """Stretches or shrinks the packet send interval of one monitor once per stats sample.
+
+    The interval doubles, up to the maximum, while packets queue or dispatch slowly on
+    the event loop, or while the monitor's total power barely changes from packet to
+    packet. It halves, down to the minimum, while the total power swings. Otherwise it
+    is left alone.
+
+    The total power is sampled once per packet, when the connection reports that the
+    monitor finished handling it. New intervals are passed to set_interval, which is the
+    SettingWriter of the monitor's packet interval entity, so they are sent the same way
+    as values set from the UI.
+    """
+
+    def __init__(
+        self,
+        monitor: greeneye.monitor.Monitor,
+        stats: MonitorStats,
+        set_interval: Callable[[int], None],
+        min_seconds: int,
+        max_seconds: int,
+    ) -> None:
+        self._monitor = monitor
+        self._stats = stats
+        self._set_interval = set_interval
+        self._min_seconds = min_seconds
+        self._max_seconds = max_seconds
+        self._last_total_watts: float | None = None
+        self._max_power_change = 0.0
+        add_packet_listener(monitor, self)
+        self._stats.add_listener(self._async_on_sample)
+
+    @callback
+    def packet_ended(self) -> None:
+        total_watts = sum(
+            channel.watts for channel in self._monitor.channels if channel.watts
+        )
+        if self._last_total_watts is not None:
+            change = abs(total_watts - self._last_total_watts) / max(
+                total_watts, self._last_total_watts, 1.0
+            )
+            self._max_power_change = max(self._max_power_change, change)
+        self._last_total_watts = total_watts
+
+    @callback
+    def _async_on_sample(self) -> None:
+        power_change = self._max_power_change
+        self._max_power_change = 0.0
+        sample = self._stats.sample
+        if (
+            sample is None
+            or not sample.packets_per_second
+            or self._monitor.control is None
+        ):
+            return
+
+        current = int(self._monitor.packet_send_interval.total_seconds())
+        interval = self.next_interval(
+            current,
+            sample.queue_milliseconds_p95,
+            sample.dispatch_milliseconds_p99,
+            power_change,
+        )
+        if interval != current:
+            self._set_interval(interval)
+
+    def next_interval(
+        self,
+        current: int,
+        queue_milliseconds: float | None,
+        dispatch_milliseconds: float | None,
+        power_change: float,
+    ) -> int:
+        """Return the interval that should follow the current one, given the last sample."""
+        if (queue_milliseconds or 0) > QUEUE_MILLISECONDS_HIGH or (
+            dispatch_milliseconds or 0
+        ) > DISPATCH_MILLISECONDS_HIGH:
+            interval = current * 2
+        elif power_change > VOLATILE_POWER_CHANGE:
+            interval = current // 2
+        elif power_change < IDLE_POWER_CHANGE:
+            interval = current * 2
+        else:
+            interval = current
+        return min(max(interval, self._min_seconds), self._max_seconds)
+
+    @callback
+    def async_close(self) -> None:
+        remove_packet_listener(self._monitor, self)
+        self._stats.remove_listener(self._async_on_sample)
@@ -0,0 +1,165 @@
+"""Capture of the data received from Brultech energy monitors to a rotating binary log."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import struct
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import datetime
+from datetime import timedelta
+from functools import partial
+
+from homeassistant.core import callback
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.event import async_track_time_interval
+from siobrultech_protocols.gem.protocol import PacketProtocolMessage
+
+from .ingress import IngressGemProtocol
+from .ingress import ProtocolFactory
+
+PACKET_LOG_FILENAME = "greeneye_monitor_packets.bin"
+PACKET_LOG_MAX_BYTES = 16 * 1024 * 1024
+PACKET_LOG_BACKUP_COUNT = 4
+PACKET_LOG_WRITE_INTERVAL = timedelta(seconds=5)
+
+# Each record is this header followed by one chunk of data as it was received: the time
+# it arrived in seconds since the epoch, the number of the connection it arrived on, and
+# its length in bytes
+RECORD_HEADER = struct.Struct("<dII")
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PacketLogRecord:
+    timestamp: float
+    connection: int
+    data: bytes
+
+
+def read_packet_log(path: str) -> Iterator[PacketLogRecord]:
+    """Read the records of a packet log, ignoring a partially written last record."""
+    with open(path, "rb") as log:
+        while header := log.read(RECORD_HEADER.size):
+            if len(header) < RECORD_HEADER.size:
+                return
+            timestamp, connection, length = RECORD_HEADER.unpack(header)
+            data = log.read(length)
+            if len(data) < length:
+                return
+            yield PacketLogRecord(timestamp, connection, data)
+
+
+def packet_log_paths(
+    path: str, backup_count: int = PACKET_LOG_BACKUP_COUNT
+) -> list[str]:
+    """Return the existing files of a rotating packet log, oldest first."""
+    paths = [f"{path}.{number}" for number in range(backup_count, 0, -1)] + [path]
+    return [path for path in paths if os.path.exists(path)]
+
+
+class PacketLogWriter:
+    """Buffers packet log records in memory and appends them to the log from the executor.
+
+    Connections are numbered in the order they were opened, from 1 each time a writer is
+    created.
+
+    When the log would grow past max_bytes it is renamed to <path>.1, any older backups
+    are shifted up by one, and the oldest is dropped so that at most backup_count remain.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        path: str,
+        max_bytes: int = PACKET_LOG_MAX_BYTES,
+        backup_count: int = PACKET_LOG_BACKUP_COUNT,
+    ) -> None:
+        self._hass = hass
+        self._path = path
+        self._max_bytes = max_bytes
+        self._backup_count = backup_count
+        self._buffer = bytearray()
+        self._write_task: asyncio.Future[None] | None = None
+        self._connections = 0
+        self.records = 0
+        self._cancel_timer = async_track_time_interval(
+            hass, self._async_write_buffer, PACKET_LOG_WRITE_INTERVAL
+        )
+
+    @callback
+    def async_add_connection(self, protocol: IngressGemProtocol) -> None:
+        """Log every chunk of data the given protocol receives, under a new connection number."""
+        self._connections += 1
+        protocol.data_listener = partial(self.async_record, self._connections)
+
+    @callback
+    def async_record(self, connection: int, timestamp: float, data: bytes) -> None:
+        """Add the given chunk of data, received on the given connection, to the log."""
+        self._buffer.extend(RECORD_HEADER.pack(timestamp, connection, len(data)))
+        self._buffer.extend(data)
+        self.records += 1
+
+    @callback
+    def _async_write_buffer(self, _: datetime | None = None) -> None:
+        # Writes are done one at a time so that records stay in order
+        if not self._buffer or (
+            self._write_task is not None and not self._write_task.done()
+        ):
+            return
+
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        self._write_task = self._hass.async_add_executor_job(self._write, data)
+
+    def _write(self, data: bytes) -> None:
+        try:
+            if os.path.exists(self._path) and (
+                os.path.getsize(self._path) + len(data) > self._max_bytes
+            ):
+                self._rotate()
+            with open(self._path, "ab") as log:
+                log.write(data)
+        except OSError as e:
+            _LOGGER.error("Failed to write packet log %s: %s", self._path, e)
+
+    def _rotate(self) -> None:
+        for number in range(self._backup_count - 1, 0, -1):
+            backup = f"{self._path}.{number}"
+            if os.path.exists(backup):
+                os.replace(backup, f"{self._path}.{number + 1}")
+        if self._backup_count > 0:
+            os.replace(self._path, f"{self._path}.1")
+        else:
+            os.remove(self._path)
+
+    async def async_flush(self) -> None:
+        """Write out any buffered records now."""
+        if self._write_task is not None:
+            await self._write_task
+        self._async_write_buffer()
+        if self._write_task is not None:
+            await self._write_task
+            self._write_task = None
+
+    async def async_close(self) -> None:
+        """Stop the write timer and write out any buffered records."""
+        self._cancel_timer()
+        await self.async_flush()
+
+
+def recording(
+    create_protocol: ProtocolFactory, packet_log: PacketLogWriter
+) -> ProtocolFactory:
+    """Return a protocol factory whose protocols log all the data they receive, whether or not it parses."""
+
+    def create_recording_protocol(
+        queue: asyncio.Queue[PacketProtocolMessage], send_packet_delay: bool
+    ) -> IngressGemProtocol:
+        protocol = create_protocol(queue, send_packet_delay)
+        packet_log.async_add_connection(protocol)
+        return protocol
+
+    return create_recording_protocol
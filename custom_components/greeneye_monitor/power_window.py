@@ -0,0 +1,109 @@
+"""Minimum, maximum, and mean power of a channel over fixed, clock-aligned windows."""
+from __future__ import annotations
+
+import time
+from datetime import datetime
+from typing import Callable
+
+import greeneye
+from homeassistant.core import callback
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.event import async_track_utc_time_change
+
+
+class PowerWindow:
+    """Tracks the power of one channel over the current window in constant memory.
+
+    The mean is weighted by how long each reading was current, so it does not depend on
+    how often the channel reports or whether it only reports changes. The window only
+    follows the channel, and is only ended by the scheduler, while it has listeners.
+    """
+
+    def __init__(
+        self, channel: greeneye.monitor.Channel, scheduler: PowerWindowScheduler
+    ) -> None:
+        self._channel = channel
+        self._scheduler = scheduler
+        self._watts: float | None = None
+        self._updated_at = time.monotonic()
+        self._watt_seconds = 0.0
+        self._seconds = 0.0
+        self._min: float | None = None
+        self._max: float | None = None
+        self._listeners: list[Callable[[], None]] = []
+        self.min: float | None = None
+        self.max: float | None = None
+        self.mean: float | None = None
+
+    def add_listener(self, listener: Callable[[], None]) -> None:
+        if not self._listeners:
+            self._channel.add_listener(self.async_update)
+            self._scheduler.async_add(self)
+            self.async_update()
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[], None]) -> None:
+        self._listeners.remove(listener)
+        if not self._listeners:
+            self._channel.remove_listener(self.async_update)
+            self._scheduler.async_remove(self)
+            # The time until listeners come back is not part of any window
+            self._watts = None
+
+    @callback
+    def async_update(self) -> None:
+        """Account for the time since the last reading and take a new one."""
+        self._accumulate(time.monotonic())
+        watts = self._channel.watts
+        self._watts = watts
+        if watts is not None:
+            self._min = watts if self._min is None else min(self._min, watts)
+            self._max = watts if self._max is None else max(self._max, watts)
+
+    def _accumulate(self, now: float) -> None:
+        if self._watts is not None:
+            self._watt_seconds += self._watts * (now - self._updated_at)
+            self._seconds += now - self._updated_at
+        self._updated_at = now
+
+    @callback
+    def async_end_window(self) -> None:
+        """Publish the results for the window that just ended and start the next one."""
+        self._accumulate(time.monotonic())
+        self.min = self._min
+        self.max = self._max
+        self.mean = self._watt_seconds / self._seconds if self._seconds else self._watts
+
+        self._min = self._max = self._watts
+        self._watt_seconds = self._seconds = 0.0
+        for listener in self._listeners:
+            listener()
+
+
+class PowerWindowScheduler:
+    """Ends the windows of all channels together at the start of every UTC minute that is a multiple of the interval."""
+
+    def __init__(self, hass: HomeAssistant, interval_minutes: int) -> None:
+        self._windows: dict[PowerWindow, None] = {}
+        self._cancel_timer = async_track_utc_time_change(
+            hass, self._async_end_windows, minute=f"/{interval_minutes}", second=0
+        )
+
+    @callback
+    def async_add(self, window: PowerWindow) -> None:
+        self._windows[window] = None
+
+    @callback
+    def async_remove(self, window: PowerWindow) -> None:
+        self._windows.pop(window, None)
+
+    @callback
+    def _async_end_windows(self, _: datetime) -> None:
+        for window in self._windows:
+            window.async_end_window()
+
+    @callback
+    def async_close(self) -> None:
+        """Stop the window timer."""
+        self._cancel_timer()
+        self._windows.clear()
@@ -0,0 +1,111 @@
+"""The entity registry entries of the config entry, kept without scanning the whole registry."""
+from __future__ import annotations
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import callback
+from homeassistant.core import Event
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import entity_registry as er
+
+from .const import DOMAIN
+
+DATA_REGISTRY_INDEX = f"{DOMAIN}_registry_index"
+
+
+# How the entity registry keys its deleted entries: domain, platform, and unique ID
+DeletedEntityKey = tuple[str, str, str]
+
+
+def _deleted_entity_key(entry: er.RegistryEntry) -> DeletedEntityKey:
+    return (entry.domain, entry.platform, entry.unique_id)
+
+
+class RegistryIndex:
+    """The entity IDs of the config entry's registry entries, and the keys of its deleted ones.
+
+    The registry is scanned once when the index is built, and the index is then kept up
+    to date from registry events, so listing the config entry's entities costs the same
+    however many other entities the registry holds. An entity of the config entry that
+    is removed from the registry moves to its deleted entries, until it is created again.
+    """
+
+    def __init__(self, hass: HomeAssistant, config_entry: ConfigEntry) -> None:
+        self._registry = er.async_get(hass)
+        self._config_entry_id = config_entry.entry_id
+        self._entity_ids = {
+            entry.entity_id: _deleted_entity_key(entry)
+            for entry in er.async_entries_for_config_entry(
+                self._registry, self._config_entry_id
+            )
+        }
+        self._deleted_keys = {
+            key
+            for key, deleted in self._registry.deleted_entities.items()
+            if deleted.config_entry_id == self._config_entry_id
+        }
+        self._unsubscribe = hass.bus.async_listen(
+            er.EVENT_ENTITY_REGISTRY_UPDATED,
+            self._async_registry_updated,
+            run_immediately=True,
+        )
+
+    @callback
+    def _async_registry_updated(self, event: Event) -> None:
+        entity_id = event.data["entity_id"]
+        if event.data["action"] == "remove":
+            if (key := self._entity_ids.pop(entity_id, None)) is not None:
+                self._deleted_keys.add(key)
+            return
+
+        if old_entity_id := event.data.get("old_entity_id"):
+            self._entity_ids.pop(old_entity_id, None)
+        entry = self._registry.async_get(entity_id)
+        if entry is not None and entry.config_entry_id == self._config_entry_id:
+            key = _deleted_entity_key(entry)
+            self._entity_ids[entity_id] = key
+            self._deleted_keys.discard(key)
+        else:
+            self._entity_ids.pop(entity_id, None)
+
+    def entries(self) -> list[er.RegistryEntry]:
+        """Return the config entry's registry entries, ordered by entity ID."""
+        return [
+            entry
+            for entity_id in sorted(self._entity_ids)
+            if (entry := self._registry.async_get(entity_id)) is not None
+        ]
+
+    def deleted_entries(self) -> list[er.DeletedRegistryEntry]:
+        """Return the config entry's deleted registry entries that the registry still keeps."""
+        return sorted(
+            (
+                deleted
+                for key in self._deleted_keys
+                if (deleted := self._registry.deleted_entities.get(key)) is not None
+                and deleted.config_entry_id == self._config_entry_id
+            ),
+            key=lambda deleted: deleted.entity_id,
+        )
+
+    @callback
+    def async_close(self) -> None:
+        self._unsubscribe()
+
+
+@callback
+def async_get_registry_index(
+    hass: HomeAssistant, config_entry: ConfigEntry
+) -> RegistryIndex:
+    """Return the registry index for the config entry, building it if needed."""
+    index: RegistryIndex | None = hass.data.get(DATA_REGISTRY_INDEX)
+    if index is None:
+        index = hass.data[DATA_REGISTRY_INDEX] = RegistryIndex(hass, config_entry)
+    return index
+
+
+@callback
+def async_remove_registry_index(hass: HomeAssistant) -> None:
+    """Stop keeping the registry index."""
+    index: RegistryIndex | None = hass.data.pop(DATA_REGISTRY_INDEX, None)
+    if index is not None:
+        index.async_close()
@@ -2,10 +2,14 @@
 from __future__ import annotations
 
 import logging
-from datetime import timedelta
+import time
+from collections.abc import Callable
+from collections.abc import Mapping
+from types import MappingProxyType
 from typing import Any
 
 import greeneye
+from greeneye.monitor import MonitorType
 from homeassistant.components.logbook import DOMAIN as LOGBOOK_DOMAIN
 from homeassistant.components.logbook import LogbookConfig
 from homeassistant.components.sensor import SensorDeviceClass
@@ -14,47 +18,116 @@ from homeassistant.components.sensor import SensorStateClass
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.config_entries import SOURCE_INTEGRATION_DISCOVERY
 from homeassistant.const import CONF_TEMPERATURE_UNIT
+from homeassistant.const import EntityCategory
+from homeassistant.const import Platform
+from homeassistant.const import UnitOfDataRate
 from homeassistant.const import UnitOfElectricCurrent
 from homeassistant.const import UnitOfElectricPotential
 from homeassistant.const import UnitOfEnergy
 from homeassistant.const import UnitOfPower
 from homeassistant.const import UnitOfTime
+from homeassistant.core import callback
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers import entity_registry as er
 from homeassistant.helpers import issue_registry as ir
-from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity import Entity
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.event import async_track_time_interval
 from homeassistant.helpers.issue_registry import IssueSeverity
-from homeassistant.util import Throttle
 
+from .config_index import async_get_config_index
 from .const import AUX5_TYPE_PULSE_COUNTER
+from .const import CONF_ABSOLUTE
 from .const import CONF_AUX5_TYPE
 from .const import CONF_COUNTED_QUANTITY
 from .const import CONF_COUNTED_QUANTITY_PER_PULSE
+from .const import CONF_CUMULATIVE_UPDATE_INTERVAL
+from .const import CONF_CURRENT
 from .const import CONF_DEVICE_CLASS
-from .const import CONF_MONITORS
+from .const import CONF_ENERGY_STATISTICS
+from .const import CONF_FLAT_DEVICES
+from .const import CONF_LAZY_ENTITIES
+from .const import CONF_MAX_SILENCE
 from .const import CONF_NET_METERING
 from .const import CONF_NUMBER
+from .const import CONF_POWER
+from .const import CONF_POWER_WINDOW_INTERVAL
 from .const import CONF_PULSE_COUNTERS
-from .const import CONF_SERIAL_NUMBER
+from .const import CONF_RELATIVE
+from .const import CONF_SIGNIFICANT_CHANGE
+from .const import CONF_TEMPERATURE
 from .const import CONF_TIME_UNIT
-from .const import DEFAULT_UPDATE_INTERVAL
+from .const import CONF_VOLTAGE
+from .const import DEFAULT_CUMULATIVE_UPDATE_INTERVAL
+from .const import DEFAULT_POWER_WINDOW_INTERVAL
 from .const import DEVICE_TYPE_AUX
 from .const import DEVICE_TYPE_CURRENT_TRANSFORMER
 from .const import DEVICE_TYPE_PULSE_COUNTER
 from .const import DEVICE_TYPE_TEMPERATURE_SENSOR
 from .const import DEVICE_TYPE_VOLTAGE_SENSOR
 from .const import DOMAIN
-from .const import get_monitor_type_long_name
-from .const import get_monitor_type_short_name
+from .const import has_flat_devices
 from .const import make_device_info
+from .const import make_entity_excluded_issue_id
+from .const import make_flat_entity_name
+from .const import make_monitor_device_info
+from .const import set_flat_devices
+from .const import SIGNIFICANT_CHANGE_SENSOR_TYPES
+from .energy_statistics import EnergyStatisticsWriter
+from .monitor_stats import async_get_monitor_stats
+from .monitor_stats import MonitorStats
+from .monitor_stats import STATS_SAMPLE_INTERVAL
+from .power_window import PowerWindow
+from .power_window import PowerWindowScheduler
+from .servers import MonitorServers
+from .state_writer import AlignedFlushScheduler
+from .state_writer import StateWriteCoalescer
 
 DATA_PULSES = "pulses"
 DATA_WATT_SECONDS = "watt_seconds"
 
 COUNTER_ICON = "mdi:counter"
 
+SOURCE_AUX = "aux"
+SOURCE_CHANNELS = "channels"
+SOURCE_PULSE_COUNTERS = "pulse_counters"
+SOURCE_TEMPERATURE_SENSORS = "temperature_sensors"
+SOURCE_VOLTAGE_SENSOR = "voltage_sensor"
+
+# The sources that get entities on each type of monitor, in the order they are set up.
+# Only GEMs have pulse counters, and only ECMs have aux channels.
+MONITOR_SOURCES: Mapping[MonitorType, tuple[str, ...]] = MappingProxyType(
+    {
+        MonitorType.GEM: (
+            SOURCE_CHANNELS,
+            SOURCE_PULSE_COUNTERS,
+            SOURCE_TEMPERATURE_SENSORS,
+            SOURCE_VOLTAGE_SENSOR,
+        ),
+        MonitorType.ECM_1220: (
+            SOURCE_CHANNELS,
+            SOURCE_TEMPERATURE_SENSORS,
+            SOURCE_VOLTAGE_SENSOR,
+            SOURCE_AUX,
+        ),
+        MonitorType.ECM_1240: (
+            SOURCE_CHANNELS,
+            SOURCE_TEMPERATURE_SENSORS,
+            SOURCE_VOLTAGE_SENSOR,
+            SOURCE_AUX,
+        ),
+    }
+)
+
+SECONDS_PER_TIME_UNIT: Mapping[str, int] = MappingProxyType(
+    {
+        UnitOfTime.SECONDS: 1,
+        UnitOfTime.MINUTES: 60,
+        UnitOfTime.HOURS: 3600,
+    }
+)
+
 _LOGGER = logging.getLogger(__name__)
 
 
@@ -65,171 +138,255 @@ async def async_setup_entry(
 ) -> bool:
     """Set up Brultech energy monitor sensors from the config entry"""
     entry_id = config_entry.entry_id
+    flush_scheduler = AlignedFlushScheduler(
+        hass,
+        config_entry.options.get(
+            CONF_CUMULATIVE_UPDATE_INTERVAL, DEFAULT_CUMULATIVE_UPDATE_INTERVAL
+        ),
+    )
+    config_entry.async_on_unload(flush_scheduler.async_close)
+    power_window_interval = config_entry.options.get(
+        CONF_POWER_WINDOW_INTERVAL, DEFAULT_POWER_WINDOW_INTERVAL
+    )
+    power_window_scheduler: PowerWindowScheduler | None = None
+    if power_window_interval:
+        power_window_scheduler = PowerWindowScheduler(hass, power_window_interval)
+        config_entry.async_on_unload(power_window_scheduler.async_close)
+    energy_statistics: EnergyStatisticsWriter | None = None
+    if config_entry.options.get(CONF_ENERGY_STATISTICS, False):
+        energy_statistics = EnergyStatisticsWriter(hass)
+        config_entry.async_on_unload(energy_statistics.async_close)
+    lazy_entities = config_entry.options.get(CONF_LAZY_ENTITIES, False)
+    entity_registry = er.async_get(hass)
 
     async def on_new_monitor(monitor: greeneye.monitor.Monitor) -> None:
         config_entry = hass.config_entries.async_get_entry(entry_id)
-        monitor_configs = config_entry.data[CONF_MONITORS]
-        monitor_options = config_entry.options[CONF_MONITORS]
-
-        serial_number = monitor.serial_number
-        monitor_config = next(
-            filter(
-                lambda config: config[CONF_SERIAL_NUMBER] == serial_number,
-                monitor_configs,
-            ),
-            None,
-        )
-        monitor_option = next(
-            filter(
-                lambda option: option[CONF_SERIAL_NUMBER] == serial_number,
-                monitor_options,
-            ),
-            None,
+        monitor_index = async_get_config_index(hass, config_entry).get_monitor(
+            monitor.serial_number
         )
 
-        if monitor_config is not None and monitor_option is not None:
+        if monitor_index is not None:
+            monitor_config = monitor_index.config
+            monitor_option = monitor_index.options
             entities: list[Entity] = []
-
-            device_registry = dr.async_get(hass)
-            monitor_type_short_name = get_monitor_type_short_name(monitor)
-            monitor_type_long_name = get_monitor_type_long_name(monitor)
-            device_registry.async_get_or_create(
-                config_entry_id=config_entry.entry_id,
-                identifiers={(DOMAIN, f"{monitor.serial_number}")},
-                manufacturer="Brultech",
-                name=f"{monitor_type_short_name} {monitor.serial_number}",
-                model=monitor_type_long_name,
+            energy_channels: list[tuple[greeneye.monitor.Channel, bool]] = []
+            stats = async_get_monitor_stats(hass, monitor)
+            config_entry.async_on_unload(
+                async_track_time_interval(
+                    hass, stats.async_sample, STATS_SAMPLE_INTERVAL
+                )
             )
+            state_writer = StateWriteCoalescer(hass, monitor, stats)
+            config_entry.async_on_unload(state_writer.async_close)
+            significant_changes = make_significant_changes(config_entry.options)
 
-            net_metering = set(monitor_config[CONF_NET_METERING])
-            for channel in monitor.channels:
-                channel_net_metered = str(channel.number) in net_metering
-                entities.append(
+            flat_devices = config_entry.options.get(CONF_FLAT_DEVICES, False)
+            set_flat_devices(monitor, flat_devices)
+
+            def make_channel_entities(
+                channel: greeneye.monitor.Channel, channel_net_metered: bool
+            ) -> list[Entity]:
+                channel_entities: list[Entity] = [
                     PowerSensor(
                         monitor,
+                        state_writer,
+                        channel,
+                        channel_net_metered,
+                        significant_changes[CONF_POWER],
+                    )
+                ]
+                if power_window_scheduler is not None:
+                    channel_entities.extend(
+                        make_power_window_sensors(
+                            monitor, stats, power_window_scheduler, channel
+                        )
+                    )
+                if not channel.is_aux:
+                    channel_entities.append(
+                        CurrentSensor(
+                            monitor,
+                            state_writer,
+                            channel,
+                            significant_changes[CONF_CURRENT],
+                        )
+                    )
+                channel_entities.append(
+                    EnergySensor(
+                        monitor,
+                        state_writer,
+                        flush_scheduler,
                         channel,
                         channel_net_metered,
                     )
                 )
+                return channel_entities
+
+            def add_deferred_channel(
+                channel: greeneye.monitor.Channel, channel_net_metered: bool
+            ) -> None:
+                async_add_entities(make_channel_entities(channel, channel_net_metered))
+                if energy_statistics is not None:
+                    hass.async_create_task(
+                        energy_statistics.async_add_channels(
+                            monitor, [(channel, channel_net_metered)]
+                        )
+                    )
+
+            def add_channel(
+                channel: greeneye.monitor.Channel, channel_net_metered: bool
+            ) -> None:
+                sensor_type = "current" if not channel.is_aux else "aux_current"
+                if (
+                    lazy_entities
+                    and not is_channel_active(channel)
+                    and not entity_registry.async_get_entity_id(
+                        Platform.SENSOR,
+                        DOMAIN,
+                        f"{monitor.serial_number}-{sensor_type}-{channel.number + 1}",
+                    )
+                ):
+                    deferred = DeferredEntities(
+                        channel,
+                        is_channel_active,
+                        lambda: add_deferred_channel(channel, channel_net_metered),
+                    )
+                    config_entry.async_on_unload(deferred.async_cancel)
+                    return
+
+                entities.extend(make_channel_entities(channel, channel_net_metered))
+                energy_channels.append((channel, channel_net_metered))
+
+            def add_pulse_counter(
+                pulse_counter: greeneye.monitor.PulseCounter,
+                config: Mapping[str, Any],
+                options: Mapping[str, Any],
+            ) -> None:
                 entities.append(
-                    CurrentSensor(
+                    PulseRateSensor(
                         monitor,
-                        channel,
+                        state_writer,
+                        pulse_counter,
+                        config[CONF_COUNTED_QUANTITY],
+                        options[CONF_TIME_UNIT],
+                        config[CONF_COUNTED_QUANTITY_PER_PULSE],
                     )
                 )
                 entities.append(
-                    EnergySensor(
+                    PulseCountSensor(
                         monitor,
-                        channel,
-                        channel_net_metered,
+                        state_writer,
+                        flush_scheduler,
+                        pulse_counter,
+                        config[CONF_DEVICE_CLASS],
+                        config[CONF_COUNTED_QUANTITY],
+                        config[CONF_COUNTED_QUANTITY_PER_PULSE],
                     )
                 )
 
-            pulse_counter_configs = monitor_config[CONF_PULSE_COUNTERS]
-            pulse_counter_options = monitor_option[CONF_PULSE_COUNTERS]
-            for pulse_counter in monitor.pulse_counters:
-                config = next(
-                    filter(
-                        lambda config: config[CONF_NUMBER] == pulse_counter.number,
-                        pulse_counter_configs,
-                    ),
-                    None,
-                )
-                options = next(
-                    filter(
-                        lambda option: option[CONF_NUMBER] == pulse_counter.number,
-                        pulse_counter_options,
-                    ),
-                    None,
+            temperature_unit = monitor_config.get(CONF_TEMPERATURE_UNIT)
+
+            def make_temperature_sensor(
+                temperature_sensor: greeneye.monitor.TemperatureSensor,
+            ) -> TemperatureSensor:
+                assert temperature_unit
+                return TemperatureSensor(
+                    monitor,
+                    state_writer,
+                    temperature_sensor,
+                    temperature_unit,
+                    significant_changes[CONF_TEMPERATURE],
                 )
-                if config and options:
-                    entities.append(
-                        PulseRateSensor(
-                            monitor,
-                            pulse_counter,
-                            config[CONF_COUNTED_QUANTITY],
-                            options[CONF_TIME_UNIT],
-                            config[CONF_COUNTED_QUANTITY_PER_PULSE],
-                        )
+
+            def add_temperature_sensor(
+                temperature_sensor: greeneye.monitor.TemperatureSensor,
+            ) -> None:
+                if (
+                    lazy_entities
+                    and not is_temperature_sensor_active(temperature_sensor)
+                    and not entity_registry.async_get_entity_id(
+                        Platform.SENSOR,
+                        DOMAIN,
+                        f"{monitor.serial_number}-temp-{temperature_sensor.number + 1}",
                     )
-                    entities.append(
-                        PulseCountSensor(
-                            monitor,
-                            pulse_counter,
-                            config[CONF_DEVICE_CLASS],
-                            config[CONF_COUNTED_QUANTITY],
-                            config[CONF_COUNTED_QUANTITY_PER_PULSE],
-                        )
+                ):
+                    deferred = DeferredEntities(
+                        temperature_sensor,
+                        is_temperature_sensor_active,
+                        lambda: async_add_entities(
+                            [make_temperature_sensor(temperature_sensor)]
+                        ),
                     )
+                    config_entry.async_on_unload(deferred.async_cancel)
+                    return
 
-            temperature_unit = monitor_config.get(CONF_TEMPERATURE_UNIT)
-            for temperature_sensor in monitor.temperature_sensors:
+                entities.append(make_temperature_sensor(temperature_sensor))
+
+            def add_channels() -> None:
+                net_metering = set(monitor_config[CONF_NET_METERING])
+                for channel in monitor.channels:
+                    add_channel(channel, str(channel.number) in net_metering)
+
+            def add_pulse_counters() -> None:
+                for pulse_counter in monitor.pulse_counters:
+                    config = monitor_index.get_pulse_counter_config(
+                        pulse_counter.number
+                    )
+                    options = monitor_index.get_pulse_counter_options(
+                        pulse_counter.number
+                    )
+                    if config and options:
+                        add_pulse_counter(pulse_counter, config, options)
+
+            def add_temperature_sensors() -> None:
                 if temperature_unit:
+                    for temperature_sensor in monitor.temperature_sensors:
+                        add_temperature_sensor(temperature_sensor)
+
+            def add_voltage_sensor() -> None:
+                if monitor.voltage_sensor:
                     entities.append(
-                        TemperatureSensor(
-                            monitor,
-                            temperature_sensor,
-                            temperature_unit,
+                        VoltageSensor(
+                            monitor, state_writer, significant_changes[CONF_VOLTAGE]
                         )
                     )
 
-            if monitor.voltage_sensor:
-                entities.append(VoltageSensor(monitor))
+            def add_aux() -> None:
+                for aux in monitor.aux:
+                    if isinstance(aux, greeneye.monitor.Channel):
+                        add_channel(aux, False)
+                        continue
 
-            for aux in monitor.aux:
-                channel = None
-                pulse_counter = None
-                if isinstance(aux, greeneye.monitor.Channel):
-                    channel = aux
-                else:
                     assert aux.number == 4
-                    if monitor_config[CONF_AUX5_TYPE] == AUX5_TYPE_PULSE_COUNTER:
-                        pulse_counter = aux.pulse_counter
-                    else:
-                        channel = aux.channel
+                    if monitor_config[CONF_AUX5_TYPE] != AUX5_TYPE_PULSE_COUNTER:
+                        add_channel(aux.channel, False)
+                        continue
 
-                if channel:
-                    channel_net_metered = False
-                    entities.append(
-                        PowerSensor(
-                            monitor,
-                            channel,
-                            channel_net_metered,
-                        )
-                    )
-                    entities.append(
-                        EnergySensor(
-                            monitor,
-                            channel,
-                            channel_net_metered,
-                        )
-                    )
-                else:
-                    assert pulse_counter
+                    pulse_counter = aux.pulse_counter
                     config = monitor_config[CONF_PULSE_COUNTERS][0]
                     options = monitor_option[CONF_PULSE_COUNTERS][0]
                     assert config[CONF_NUMBER] == pulse_counter.number
                     assert options[CONF_NUMBER] == pulse_counter.number
-                    entities.append(
-                        PulseRateSensor(
-                            monitor,
-                            pulse_counter,
-                            config[CONF_COUNTED_QUANTITY],
-                            options[CONF_TIME_UNIT],
-                            config[CONF_COUNTED_QUANTITY_PER_PULSE],
-                        )
-                    )
-                    entities.append(
-                        PulseCountSensor(
-                            monitor,
-                            pulse_counter,
-                            config[CONF_DEVICE_CLASS],
-                            config[CONF_COUNTED_QUANTITY],
-                            config[CONF_COUNTED_QUANTITY_PER_PULSE],
-                        )
-                    )
+                    add_pulse_counter(pulse_counter, config, options)
+
+            add_sources = {
+                SOURCE_CHANNELS: add_channels,
+                SOURCE_PULSE_COUNTERS: add_pulse_counters,
+                SOURCE_TEMPERATURE_SENSORS: add_temperature_sensors,
+                SOURCE_VOLTAGE_SENSOR: add_voltage_sensor,
+                SOURCE_AUX: add_aux,
+            }
+            for source in MONITOR_SOURCES[monitor.type]:
+                add_sources[source]()
+
+            entities.extend(
+                MonitorStatsSensor(monitor, stats, *description)
+                for description in MONITOR_STATS_SENSORS
+            )
 
+            async_register_devices(hass, config_entry, monitor, entities, flat_devices)
             async_add_entities(entities)
+            if energy_statistics is not None:
+                await energy_statistics.async_add_channels(monitor, energy_channels)
 
             _LOGGER.info("Set up sensors for new monitor %d", monitor.serial_number)
         else:
@@ -242,7 +399,7 @@ async def async_setup_entry(
                 },
             )
 
-    monitors: greeneye.Monitors = hass.data[DOMAIN]
+    monitors: MonitorServers = hass.data[DOMAIN]
     monitors.add_listener(on_new_monitor)
     for monitor in monitors.monitors.values():
         await on_new_monitor(monitor)
@@ -250,6 +407,160 @@ async def async_setup_entry(
     return True
 
 
+@callback
+def async_register_devices(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    monitor: greeneye.monitor.Monitor,
+    entities: list[Entity],
+    flat_devices: bool,
+) -> None:
+    """Register the monitor's device and the devices of the given entities in one pass, before the entities are added.
+
+    With flat devices, entities left on the monitor's per-channel and per-sensor
+    devices by an earlier setup are moved to the monitor's device, and those devices
+    are removed from the registry.
+    """
+    device_registry = dr.async_get(hass)
+    monitor_device_info = make_monitor_device_info(monitor)
+    monitor_device = device_registry.async_get_or_create(
+        config_entry_id=config_entry.entry_id, **monitor_device_info
+    )
+
+    if flat_devices:
+        entity_registry = er.async_get(hass)
+        for device in dr.async_entries_for_config_entry(
+            device_registry, config_entry.entry_id
+        ):
+            if device.via_device_id != monitor_device.id:
+                continue
+            for entry in er.async_entries_for_device(
+                entity_registry, device.id, include_disabled_entities=True
+            ):
+                entity_registry.async_update_entity(
+                    entry.entity_id, device_id=monitor_device.id
+                )
+            device_registry.async_remove_device(device.id)
+        return
+
+    # Entities of the same device share its DeviceInfo
+    registered = {id(monitor_device_info)}
+    for entity in entities:
+        device_info = entity.device_info
+        if device_info is None or id(device_info) in registered:
+            continue
+        registered.add(id(device_info))
+        device_registry.async_get_or_create(
+            config_entry_id=config_entry.entry_id, **device_info
+        )
+
+
+def is_channel_active(channel: greeneye.monitor.Channel) -> bool:
+    return bool(channel.watts) or bool(channel.amps)
+
+
+def is_temperature_sensor_active(
+    temperature_sensor: greeneye.monitor.TemperatureSensor,
+) -> bool:
+    # Monitors report a missing probe as out of range, which is parsed as None, while a
+    # probe can read exactly 0
+    return temperature_sensor.temperature is not None
+
+
+class DeferredEntities:
+    """Adds the entities of a channel or temperature sensor once it first reports meaningful data.
+
+    Most monitors have many more channels and temperature sensors than are wired up,
+    and each of them would otherwise add entities that never leave 0 or unknown.
+    """
+
+    def __init__(
+        self,
+        sensor: greeneye.monitor.Channel | greeneye.monitor.TemperatureSensor,
+        is_active: Callable[[Any], bool],
+        add_entities: Callable[[], None],
+    ) -> None:
+        self._sensor = sensor
+        self._is_active = is_active
+        self._add_entities = add_entities
+        self._waiting = True
+        sensor.add_listener(self._on_update)
+
+    def _on_update(self) -> None:
+        if not self._is_active(self._sensor):
+            return
+        self.async_cancel()
+        self._add_entities()
+
+    @callback
+    def async_cancel(self) -> None:
+        """Stop waiting for data."""
+        if self._waiting:
+            self._waiting = False
+            self._sensor.remove_listener(self._on_update)
+
+
+class SignificantChange:
+    """Decides whether a new sensor value differs enough from the last written one to be worth writing."""
+
+    def __init__(self, absolute: float, relative: float, max_silence: float) -> None:
+        self._absolute = absolute
+        self._relative = relative / 100
+        self._max_silence = max_silence
+
+    def is_significant(
+        self,
+        old_value: float | None,
+        new_value: float | None,
+        seconds_since_write: float,
+    ) -> bool:
+        """Return True if new_value should be written given that old_value was last written seconds_since_write seconds ago."""
+        if self._max_silence and seconds_since_write >= self._max_silence:
+            return True
+        if old_value is None or new_value is None:
+            return old_value != new_value
+
+        change = abs(new_value - old_value)
+        return (
+            change > 0
+            and change >= self._absolute
+            and change >= abs(old_value) * self._relative
+        )
+
+
+def make_significant_changes(
+    options: Mapping[str, Any]
+) -> dict[str, SignificantChange | None]:
+    """Build the significant change filter for each filterable sensor type from the config entry options."""
+    significant_change_options = options.get(CONF_SIGNIFICANT_CHANGE, {})
+    max_silence = significant_change_options.get(CONF_MAX_SILENCE, 0)
+    significant_changes: dict[str, SignificantChange | None] = {}
+    for sensor_type in SIGNIFICANT_CHANGE_SENSOR_TYPES:
+        thresholds = significant_change_options.get(sensor_type, {})
+        absolute = thresholds.get(CONF_ABSOLUTE, 0.0)
+        relative = thresholds.get(CONF_RELATIVE, 0.0)
+        significant_changes[sensor_type] = (
+            SignificantChange(absolute, relative, max_silence)
+            if absolute or relative
+            else None
+        )
+    return significant_changes
+
+
+def make_power_window_sensors(
+    monitor: greeneye.monitor.Monitor,
+    stats: MonitorStats,
+    power_window_scheduler: PowerWindowScheduler,
+    channel: greeneye.monitor.Channel,
+) -> list[PowerWindowSensor]:
+    """Create the minimum, maximum, and mean power sensors of a channel, sharing one window."""
+    window = PowerWindow(channel, power_window_scheduler)
+    return [
+        PowerWindowSensor(monitor, stats, window, channel, statistic)
+        for statistic in POWER_WINDOW_STATISTICS
+    ]
+
+
 UnderlyingSensorType = (
     greeneye.monitor.Channel
     | greeneye.monitor.PulseCounter
@@ -269,15 +580,19 @@ class MonitorSensor(SensorEntity):
     def __init__(
         self,
         monitor: greeneye.monitor.Monitor,
+        state_writer: StateWriteCoalescer,
         device_type: str,
         sensor_type: str,
         sensor: UnderlyingSensorType,
         number: int,
-        update_interval: timedelta | None = None,
+        flush_scheduler: AlignedFlushScheduler | None = None,
+        significant_change: SignificantChange | None = None,
     ) -> None:
         """Construct the entity."""
         self._monitor = monitor
         self._monitor_serial_number = self._monitor.serial_number
+        self._state_writer = state_writer
+        self._stats = state_writer.stats
         self._device_type = device_type
         self._sensor_type = sensor_type
         self._sensor: UnderlyingSensorType = sensor
@@ -285,18 +600,21 @@ class MonitorSensor(SensorEntity):
         self._attr_unique_id = (
             f"{self._monitor_serial_number}-{self._sensor_type}-{self._number + 1}"
         )
-        if update_interval:
-            self._update = Throttle(update_interval)(self.async_write_ha_state)
-        else:
-            self._update = self.async_write_ha_state
-
-    @property
-    def device_info(self) -> DeviceInfo | None:
-        return make_device_info(self._monitor, self._device_type, self._number)
+        self._flush_scheduler = flush_scheduler
+        self._significant_change = significant_change
+        self._last_written_value: float | None = None
+        self._last_written_at = 0.0
+        self._attr_device_info = make_device_info(monitor, device_type, number)
+        if has_flat_devices(monitor):
+            self._attr_name = make_flat_entity_name(
+                device_type, number, getattr(self, "_attr_name", None)
+            )
 
     async def async_added_to_hass(self) -> None:
         """Wait for and connect to the sensor."""
-        self._sensor.add_listener(self._update)
+        self._sensor.add_listener(self._schedule_write)
+        if self._flush_scheduler is not None:
+            self._flush_scheduler.async_add(self)
 
         if (
             self.state_class == SensorStateClass.TOTAL
@@ -307,7 +625,33 @@ class MonitorSensor(SensorEntity):
     async def async_will_remove_from_hass(self) -> None:
         """Remove listener from the sensor."""
         if self._sensor:
-            self._sensor.remove_listener(self._update)
+            self._sensor.remove_listener(self._schedule_write)
+        self._state_writer.async_discard(self)
+        if self._flush_scheduler is not None:
+            self._flush_scheduler.async_discard(self)
+
+    def _schedule_write(self) -> None:
+        """Write state along with the rest of the monitor's sensors once the packet is processed, or at the next aligned flush for cumulative sensors."""
+        if self._significant_change is not None:
+            value = self.native_value
+            now = time.monotonic()
+            if not self._significant_change.is_significant(
+                self._last_written_value, value, now - self._last_written_at
+            ):
+                self._stats.filtered_writes += 1
+                return
+            self._last_written_value = value
+            self._last_written_at = now
+
+        if self._flush_scheduler is not None:
+            self._flush_scheduler.async_schedule_write(self)
+        else:
+            self._state_writer.async_schedule_write(self)
+
+    @callback
+    def async_write_ha_state(self) -> None:
+        self._stats.writes += 1
+        super().async_write_ha_state()
 
     def _warn_if_excluded_from_recorder(self) -> None:
         """Posts a warning if this sensor is excluded from the recorder."""
@@ -319,7 +663,7 @@ class MonitorSensor(SensorEntity):
             ir.async_create_issue(
                 self.hass,
                 DOMAIN,
-                f"{self.entity_id}_excluded",
+                make_entity_excluded_issue_id(self.entity_id),
                 is_fixable=False,
                 severity=IssueSeverity.WARNING,
                 translation_key="entity_excluded",
@@ -340,16 +684,20 @@ class PowerSensor(MonitorSensor):
     def __init__(
         self,
         monitor: greeneye.monitor.Monitor,
+        state_writer: StateWriteCoalescer,
         sensor: greeneye.monitor.Channel,
         net_metering: bool,
+        significant_change: SignificantChange | None = None,
     ) -> None:
         """Construct the entity."""
         super().__init__(
             monitor,
+            state_writer,
             DEVICE_TYPE_CURRENT_TRANSFORMER if not sensor.is_aux else DEVICE_TYPE_AUX,
             "current" if not sensor.is_aux else "aux_current",
             sensor,
             sensor.number,
+            significant_change=significant_change,
         )
         self._sensor: greeneye.monitor.Channel = self._sensor
         self._net_metering = net_metering
@@ -369,6 +717,69 @@ class PowerSensor(MonitorSensor):
         return {DATA_WATT_SECONDS: watt_seconds}
 
 
+# Attribute of PowerWindow and name of each power window sensor
+POWER_WINDOW_STATISTICS = {
+    "min": "minimum power",
+    "max": "maximum power",
+    "mean": "mean power",
+}
+
+
+class PowerWindowSensor(SensorEntity):
+    """Entity showing the minimum, maximum, or mean power on one channel over the last window."""
+
+    _attr_native_unit_of_measurement = UnitOfPower.WATT
+    _attr_device_class = SensorDeviceClass.POWER
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_has_entity_name = True
+    _attr_should_poll = False
+    _attr_suggested_display_precision = 0
+
+    def __init__(
+        self,
+        monitor: greeneye.monitor.Monitor,
+        stats: MonitorStats,
+        window: PowerWindow,
+        channel: greeneye.monitor.Channel,
+        statistic: str,
+    ) -> None:
+        """Construct the entity."""
+        self._stats = stats
+        self._window = window
+        self._statistic = statistic
+        sensor_type = "current" if not channel.is_aux else "aux_current"
+        self._attr_unique_id = (
+            f"{monitor.serial_number}-{sensor_type}-{channel.number + 1}-{statistic}"
+        )
+        device_type = (
+            DEVICE_TYPE_CURRENT_TRANSFORMER if not channel.is_aux else DEVICE_TYPE_AUX
+        )
+        self._attr_name = POWER_WINDOW_STATISTICS[statistic]
+        self._attr_device_info = make_device_info(monitor, device_type, channel.number)
+        if has_flat_devices(monitor):
+            self._attr_name = make_flat_entity_name(
+                device_type, channel.number, self._attr_name
+            )
+
+    async def async_added_to_hass(self) -> None:
+        """Listen for the end of each window."""
+        self._window.add_listener(self.async_write_ha_state)
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Stop listening for the end of each window."""
+        self._window.remove_listener(self.async_write_ha_state)
+
+    @callback
+    def async_write_ha_state(self) -> None:
+        self._stats.writes += 1
+        super().async_write_ha_state()
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the statistic for the last window."""
+        return getattr(self._window, self._statistic)
+
+
 class CurrentSensor(MonitorSensor):
     """Entity showing current on one channel of the monitor."""
 
@@ -380,17 +791,25 @@ class CurrentSensor(MonitorSensor):
     def __init__(
         self,
         monitor: greeneye.monitor.Monitor,
+        state_writer: StateWriteCoalescer,
         sensor: greeneye.monitor.Channel,
+        significant_change: SignificantChange | None = None,
     ) -> None:
         """Construct the entity."""
         super().__init__(
-            monitor, DEVICE_TYPE_CURRENT_TRANSFORMER, "amps", sensor, sensor.number
+            monitor,
+            state_writer,
+            DEVICE_TYPE_CURRENT_TRANSFORMER,
+            "amps",
+            sensor,
+            sensor.number,
+            significant_change=significant_change,
         )
         self._sensor: greeneye.monitor.Channel = self._sensor
 
     @property
     def native_value(self) -> float | None:
-        """Return the current number of watts being used by the channel."""
+        """Return the current number of amps being used by the channel."""
         return self._sensor.amps
 
 
@@ -406,17 +825,20 @@ class EnergySensor(MonitorSensor):
     def __init__(
         self,
         monitor: greeneye.monitor.Monitor,
+        state_writer: StateWriteCoalescer,
+        flush_scheduler: AlignedFlushScheduler,
         sensor: greeneye.monitor.Channel,
         net_metering: bool,
     ) -> None:
         """Construct the entity."""
         super().__init__(
             monitor,
+            state_writer,
             DEVICE_TYPE_CURRENT_TRANSFORMER if not sensor.is_aux else DEVICE_TYPE_AUX,
             "energy" if not sensor.is_aux else "aux_energy",
             sensor,
             sensor.number,
-            update_interval=DEFAULT_UPDATE_INTERVAL,
+            flush_scheduler=flush_scheduler,
         )
         self._sensor: greeneye.monitor.Channel = self._sensor
         self._net_metering = net_metering
@@ -440,6 +862,7 @@ class PulseRateSensor(MonitorSensor):
     def __init__(
         self,
         monitor: greeneye.monitor.Monitor,
+        state_writer: StateWriteCoalescer,
         sensor: greeneye.monitor.PulseCounter,
         counted_quantity: str,
         time_unit: str,
@@ -448,15 +871,24 @@ class PulseRateSensor(MonitorSensor):
         """Construct the entity."""
         super().__init__(
             monitor,
+            state_writer,
             DEVICE_TYPE_PULSE_COUNTER if not sensor.is_aux else DEVICE_TYPE_AUX,
             "pulse" if not sensor.is_aux else "aux_pulse",
             sensor,
             sensor.number,
         )
         self._sensor: greeneye.monitor.PulseCounter = self._sensor
-        self._counted_quantity_per_pulse = counted_quantity_per_pulse
-        self._time_unit = time_unit
-        self._attr_native_unit_of_measurement = f"{counted_quantity}/{self._time_unit}"
+        seconds_per_time_unit = SECONDS_PER_TIME_UNIT.get(time_unit)
+        if seconds_per_time_unit is None:
+            # Config schema should have ensured it is one of the known values
+            raise RuntimeError(
+                f"Invalid value for time unit: {time_unit}. Expected one of"
+                f" {UnitOfTime.SECONDS}, {UnitOfTime.MINUTES}, or {UnitOfTime.HOURS}"
+            )
+        self._quantity_per_pulse_per_second = (
+            counted_quantity_per_pulse * seconds_per_time_unit
+        )
+        self._attr_native_unit_of_measurement = f"{counted_quantity}/{time_unit}"
 
     @property
     def native_value(self) -> float | None:
@@ -464,28 +896,7 @@ class PulseRateSensor(MonitorSensor):
         if self._sensor.pulses_per_second is None:
             return None
 
-        result = (
-            self._sensor.pulses_per_second
-            * self._counted_quantity_per_pulse
-            * self._seconds_per_time_unit
-        )
-        return result
-
-    @property
-    def _seconds_per_time_unit(self) -> int:
-        """Return the number of seconds in the given display time unit."""
-        if self._time_unit == UnitOfTime.SECONDS:
-            return 1
-        if self._time_unit == UnitOfTime.MINUTES:
-            return 60
-        if self._time_unit == UnitOfTime.HOURS:
-            return 3600
-
-        # Config schema should have ensured it is one of the above values
-        raise RuntimeError(
-            f"Invalid value for time unit: {self._time_unit}. Expected one of"
-            f" {UnitOfTime.SECONDS}, {UnitOfTime.MINUTES}, or {UnitOfTime.HOURS}"
-        )
+        return self._sensor.pulses_per_second * self._quantity_per_pulse_per_second
 
     @property
     def extra_state_attributes(self) -> dict[str, Any]:
@@ -503,6 +914,8 @@ class PulseCountSensor(MonitorSensor):
     def __init__(
         self,
         monitor: greeneye.monitor.Monitor,
+        state_writer: StateWriteCoalescer,
+        flush_scheduler: AlignedFlushScheduler,
         sensor: greeneye.monitor.PulseCounter,
         device_class: SensorDeviceClass | None,
         counted_quantity: str,
@@ -511,11 +924,12 @@ class PulseCountSensor(MonitorSensor):
         """Construct the entity."""
         super().__init__(
             monitor,
+            state_writer,
             DEVICE_TYPE_PULSE_COUNTER if not sensor.is_aux else DEVICE_TYPE_AUX,
             "count" if not sensor.is_aux else "aux_count",
             sensor,
             sensor.number,
-            update_interval=DEFAULT_UPDATE_INTERVAL,
+            flush_scheduler=flush_scheduler,
         )
         self._sensor: greeneye.monitor.PulseCounter = self._sensor
         self._counted_quantity_per_pulse = counted_quantity_per_pulse
@@ -540,12 +954,20 @@ class TemperatureSensor(MonitorSensor):
     def __init__(
         self,
         monitor: greeneye.monitor.Monitor,
+        state_writer: StateWriteCoalescer,
         sensor: greeneye.monitor.TemperatureSensor,
         unit: str,
+        significant_change: SignificantChange | None = None,
     ) -> None:
         """Construct the entity."""
         super().__init__(
-            monitor, DEVICE_TYPE_TEMPERATURE_SENSOR, "temp", sensor, sensor.number
+            monitor,
+            state_writer,
+            DEVICE_TYPE_TEMPERATURE_SENSOR,
+            "temp",
+            sensor,
+            sensor.number,
+            significant_change=significant_change,
         )
         self._sensor: greeneye.monitor.TemperatureSensor = self._sensor
         self._attr_native_unit_of_measurement = unit
@@ -563,10 +985,21 @@ class VoltageSensor(MonitorSensor):
     _attr_device_class = SensorDeviceClass.VOLTAGE
     _attr_state_class = SensorStateClass.MEASUREMENT
 
-    def __init__(self, monitor: greeneye.monitor.Monitor) -> None:
+    def __init__(
+        self,
+        monitor: greeneye.monitor.Monitor,
+        state_writer: StateWriteCoalescer,
+        significant_change: SignificantChange | None = None,
+    ) -> None:
         """Construct the entity."""
         super().__init__(
-            monitor, DEVICE_TYPE_VOLTAGE_SENSOR, "volts", monitor.voltage_sensor, 0
+            monitor,
+            state_writer,
+            DEVICE_TYPE_VOLTAGE_SENSOR,
+            "volts",
+            monitor.voltage_sensor,
+            0,
+            significant_change=significant_change,
         )
         self._sensor: greeneye.monitor.VoltageSensor = self._sensor
 
@@ -574,3 +1007,92 @@ class VoltageSensor(MonitorSensor):
     def native_value(self) -> float | None:
         """Return the current voltage being reported by this sensor."""
         return self._sensor.voltage
+
+
+# Field of MonitorStatsSample, name, unit, and device class of each stats sensor
+MONITOR_STATS_SENSORS: list[tuple[str, str, str, SensorDeviceClass | None]] = [
+    ("packets_per_second", "packets received", "packets/s", None),
+    (
+        "bytes_per_second",
+        "bytes received",
+        UnitOfDataRate.BYTES_PER_SECOND,
+        SensorDeviceClass.DATA_RATE,
+    ),
+    (
+        "seconds_since_last_packet",
+        "time since last packet",
+        UnitOfTime.SECONDS,
+        SensorDeviceClass.DURATION,
+    ),
+    (
+        "dispatch_milliseconds_p50",
+        "packet dispatch time p50",
+        UnitOfTime.MILLISECONDS,
+        SensorDeviceClass.DURATION,
+    ),
+    (
+        "dispatch_milliseconds_p99",
+        "packet dispatch time p99",
+        UnitOfTime.MILLISECONDS,
+        SensorDeviceClass.DURATION,
+    ),
+    *(
+        (
+            f"{key}_milliseconds_{percentile}",
+            f"{name} {percentile}",
+            UnitOfTime.MILLISECONDS,
+            SensorDeviceClass.DURATION,
+        )
+        for key, name in [
+            ("queue", "packet queue latency"),
+            ("state", "packet to state latency"),
+        ]
+        for percentile in ["p50", "p95", "p99"]
+    ),
+    ("writes_per_minute", "state writes", "writes/min", None),
+    ("filtered_writes_per_minute", "filtered state writes", "writes/min", None),
+    ("dropped_writes_per_minute", "dropped state writes", "writes/min", None),
+]
+
+
+class MonitorStatsSensor(SensorEntity):
+    """Diagnostic entity showing one rate from the load counters of a monitor."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+    _attr_has_entity_name = True
+    _attr_should_poll = False
+    _attr_suggested_display_precision = 2
+
+    def __init__(
+        self,
+        monitor: greeneye.monitor.Monitor,
+        stats: MonitorStats,
+        key: str,
+        name: str,
+        unit: str,
+        device_class: SensorDeviceClass | None,
+    ) -> None:
+        """Construct the entity."""
+        self._stats = stats
+        self._key = key
+        self._attr_unique_id = f"{monitor.serial_number}-{key}"
+        self._attr_name = name
+        self._attr_native_unit_of_measurement = unit
+        self._attr_device_class = device_class
+        self._attr_device_info = make_monitor_device_info(monitor)
+
+    async def async_added_to_hass(self) -> None:
+        """Listen for new samples of the stats."""
+        self._stats.add_listener(self.async_write_ha_state)
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Stop listening for new samples of the stats."""
+        self._stats.remove_listener(self.async_write_ha_state)
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the value from the most recent sample of the stats."""
+        if self._stats.sample is None:
+            return None
+        return getattr(self._stats.sample, self._key)
@@ -0,0 +1,142 @@
+"""Servers that listen for Brultech energy monitors on several ports at once."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Awaitable
+from typing import Callable
+
+import greeneye
+
+from .decoder import PacketDecoder
+from .ingress import IngressMonitors
+from .packet_log import PacketLogWriter
+from .snapshot import MonitorSnapshots
+
+_LOGGER = logging.getLogger(__name__)
+
+NewMonitorListener = Callable[[greeneye.monitor.Monitor], Awaitable[None]]
+
+
+class MonitorServers:
+    """Runs one IngressMonitors server per port, and presents them as a single set of monitors.
+
+    The monitors of all servers are gathered from their new monitor listeners. Every
+    monitor known so far is also added to the monitors of each server, when it starts
+    and when another server discovers it, so a monitor that moves to another port, or
+    that reconnects after its port's server was restarted, keeps its Monitor object and
+    with it every entity listening to it. Listeners are told about each monitor once,
+    whichever server it first connects to. Monitors restored from a snapshot are known
+    from the start, so listeners are never told about them. The packet log, packet
+    decoder, and snapshots, if any, are shared by all servers and outlive restarts of
+    any one of them.
+    """
+
+    def __init__(
+        self,
+        create_server: Callable[[], IngressMonitors],
+        packet_log: PacketLogWriter | None = None,
+        decoder: PacketDecoder | None = None,
+        snapshots: MonitorSnapshots | None = None,
+    ) -> None:
+        self._create_server = create_server
+        self.packet_log = packet_log
+        self.decoder = decoder
+        self.snapshots = snapshots
+        self._listeners: list[NewMonitorListener] = []
+        self.servers: dict[int, IngressMonitors] = {}
+        self.monitors: dict[int, greeneye.monitor.Monitor] = {}
+        if snapshots is not None:
+            self._listeners.append(snapshots.async_on_new_monitor)
+
+    async def async_restore(self, serial_numbers: list[int]) -> None:
+        """Add the monitors with the given serial numbers from the last snapshot, before any server starts."""
+        assert self.snapshots is not None and not self.servers
+        for monitor in await self.snapshots.async_load(serial_numbers):
+            self.monitors[monitor.serial_number] = monitor
+
+    def add_listener(self, listener: NewMonitorListener) -> None:
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: NewMonitorListener) -> None:
+        self._listeners.remove(listener)
+
+    @property
+    def ports(self) -> list[int]:
+        return sorted(self.servers)
+
+    async def async_start_server(self, port: int) -> None:
+        """Start listening on the given port."""
+        if port in self.servers:
+            return
+
+        server = self._create_server()
+        server.monitors.update(self.monitors)
+        server.add_listener(self._async_on_new_monitor)
+        try:
+            await server.start_server(port)
+        except Exception:
+            await server.close()
+            raise
+        self.servers[port] = server
+        _LOGGER.info("Listening for monitors on port %d", port)
+
+    async def async_stop_server(self, port: int) -> None:
+        """Stop listening on the given port, disconnecting the monitors connected to it."""
+        server = self.servers.pop(port, None)
+        if server is None:
+            return
+
+        server.remove_listener(self._async_on_new_monitor)
+        await server.close()
+        _LOGGER.info("Stopped listening for monitors on port %d", port)
+
+    async def async_restart_server(self, port: int) -> None:
+        """Restart the server on the given port without touching the others."""
+        await self.async_stop_server(port)
+        await self.async_start_server(port)
+
+    async def async_set_ports(self, ports: list[int]) -> None:
+        """Stop the servers on ports that are not in the given list and start servers on the ones that are new.
+
+        A port that cannot be listened on is logged and skipped, so that one bad port
+        does not keep monitors on the others from connecting.
+        """
+        await asyncio.gather(
+            *(self.async_stop_server(port) for port in self.ports if port not in ports)
+        )
+        for port in ports:
+            try:
+                await self.async_start_server(port)
+            except OSError as e:
+                _LOGGER.error("Failed to listen for monitors on port %d: %s", port, e)
+
+    def monitors_on_port(self, port: int) -> list[greeneye.monitor.Monitor]:
+        """Return the monitors currently connected to the server on the given port."""
+        server = self.servers.get(port)
+        if server is None:
+            return []
+        return server.connected_monitors
+
+    def peer_address(self, serial_number: int) -> str | None:
+        """Return the address of the connection the given monitor is on, whichever port it connected to."""
+        for server in self.servers.values():
+            address = server.peer_address(serial_number)
+            if address is not None:
+                return address
+        return None
+
+    async def close(self) -> None:
+        await asyncio.gather(*(self.async_stop_server(port) for port in self.ports))
+        if self.packet_log is not None:
+            await self.packet_log.async_close()
+        if self.decoder is not None:
+            self.decoder.close()
+        if self.snapshots is not None:
+            await self.snapshots.async_close()
+
+    async def _async_on_new_monitor(self, monitor: greeneye.monitor.Monitor) -> None:
+        self.monitors[monitor.serial_number] = monitor
+        for server in self.servers.values():
+            server.monitors.setdefault(monitor.serial_number, monitor)
+        await asyncio.gather(*(listener(monitor) for listener in self._listeners))
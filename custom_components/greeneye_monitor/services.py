@@ -0,0 +1,173 @@
+"""Services for configuring Brultech energy monitors."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any
+
+import greeneye
+import homeassistant.helpers.config_validation as cv
+import voluptuous as vol
+from homeassistant.core import callback
+from homeassistant.core import HomeAssistant
+from homeassistant.core import ServiceCall
+from homeassistant.core import ServiceResponse
+from homeassistant.core import SupportsResponse
+from homeassistant.exceptions import HomeAssistantError
+from siobrultech_protocols.gem.protocol import ApiType
+
+from .const import CONF_CHANNELS
+from .const import CONF_SERIAL_NUMBER
+from .const import DOMAIN
+from .servers import MonitorServers
+
+_LOGGER = logging.getLogger(__name__)
+
+ATTR_CHANNEL = "channel"
+ATTR_CT_RANGE = "ct_range"
+ATTR_CT_TYPE = "ct_type"
+
+SERVICE_CONFIGURE_CHANNELS = "configure_channels"
+
+# How many connections to monitors are sent commands at once. The commands for the
+# monitors on one connection are always sent one after another, since a connection
+# carries one command at a time.
+CONFIGURE_CHANNELS_MAX_CONCURRENCY = 4
+
+CHANNEL_SETTINGS_SCHEMA = vol.All(
+    vol.Schema(
+        {
+            vol.Required(CONF_SERIAL_NUMBER): cv.positive_int,
+            vol.Required(ATTR_CHANNEL): vol.All(vol.Coerce(int), vol.Range(min=1)),
+            vol.Optional(ATTR_CT_TYPE): vol.All(
+                vol.Coerce(int), vol.Range(min=0, max=255)
+            ),
+            vol.Optional(ATTR_CT_RANGE): vol.All(
+                vol.Coerce(int), vol.Range(min=0, max=15)
+            ),
+        }
+    ),
+    cv.has_at_least_one_key(ATTR_CT_TYPE, ATTR_CT_RANGE),
+)
+
+CONFIGURE_CHANNELS_SCHEMA = vol.Schema(
+    {vol.Required(CONF_CHANNELS): vol.All(cv.ensure_list, [CHANNEL_SETTINGS_SCHEMA])}
+)
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the services of the integration."""
+
+    async def configure_channels(call: ServiceCall) -> ServiceResponse:
+        monitors: MonitorServers | None = hass.data.get(DOMAIN)
+        if monitors is None:
+            raise HomeAssistantError("GreenEye Monitor is not set up")
+
+        return await async_configure_channels(monitors, call.data[CONF_CHANNELS])
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_CONFIGURE_CHANNELS,
+        configure_channels,
+        schema=CONFIGURE_CHANNELS_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+
+async def async_configure_channels(
+    monitors: MonitorServers, channels: list[dict[str, Any]]
+) -> dict[str, Any]:
+    """Set the CT type and range of the given channels, and report how each one went.
+
+    Monitors that share a connection are configured one after another, and separate
+    connections concurrently, up to CONFIGURE_CHANNELS_MAX_CONCURRENCY at a time.
+    """
+    start = time.monotonic()
+    results: list[dict[str, Any]] = [
+        {
+            CONF_SERIAL_NUMBER: settings[CONF_SERIAL_NUMBER],
+            ATTR_CHANNEL: settings[ATTR_CHANNEL],
+            "success": False,
+        }
+        for settings in channels
+    ]
+
+    # The indexes of the settings for each connection, in the order they were given.
+    # Monitors whose connection is not known are given one of their own.
+    connections: dict[str | int, list[int]] = {}
+    for index, settings in enumerate(channels):
+        monitor = monitors.monitors.get(settings[CONF_SERIAL_NUMBER])
+        if monitor is None or monitor.control is None:
+            results[index]["error"] = "Monitor is not connected"
+            continue
+        if not 0 < settings[ATTR_CHANNEL] <= len(monitor.channels):
+            results[index]["error"] = "No such channel"
+            continue
+        connection = (
+            monitors.peer_address(monitor.serial_number) or monitor.serial_number
+        )
+        connections.setdefault(connection, []).append(index)
+
+    semaphore = asyncio.Semaphore(CONFIGURE_CHANNELS_MAX_CONCURRENCY)
+
+    async def configure_connection(indexes: list[int]) -> None:
+        async with semaphore:
+            for index in indexes:
+                settings = channels[index]
+                monitor = monitors.monitors[settings[CONF_SERIAL_NUMBER]]
+                channel = monitor.channels[settings[ATTR_CHANNEL] - 1]
+                try:
+                    await _async_configure_channel(
+                        monitor,
+                        channel,
+                        settings.get(ATTR_CT_TYPE),
+                        settings.get(ATTR_CT_RANGE),
+                    )
+                except Exception as e:
+                    _LOGGER.warning(
+                        "Failed to configure channel %d of monitor %d: %s",
+                        channel.number + 1,
+                        monitor.serial_number,
+                        e,
+                    )
+                    results[index]["error"] = str(e) or type(e).__name__
+                else:
+                    results[index]["success"] = True
+
+    await asyncio.gather(
+        *(configure_connection(indexes) for indexes in connections.values())
+    )
+    return {
+        CONF_CHANNELS: results,
+        "elapsed_seconds": time.monotonic() - start,
+    }
+
+
+async def _async_configure_channel(
+    monitor: greeneye.monitor.Monitor,
+    channel: greeneye.monitor.Channel,
+    ct_type: int | None,
+    ct_range: int | None,
+) -> None:
+    control = monitor.control
+    assert control is not None
+    if (
+        control.api_type == ApiType.ECM
+        and ct_type is not None
+        and ct_range is not None
+        and (ct_type, ct_range) != (channel.ct_type, channel.ct_range)
+    ):
+        # ECMs set both with one command, which setting them separately would send twice
+        await control.set_ct_type_and_range(
+            channel=channel.number + 1, type=ct_type, range=ct_range
+        )
+        channel.ct_type = ct_type
+        channel.ct_range = ct_range
+        return
+
+    if ct_type is not None:
+        await channel.set_ct_type(ct_type)
+    if ct_range is not None:
+        await channel.set_ct_range(ct_range)
@@ -0,0 +1,211 @@
+"""Snapshots of the monitors seen by the integration, so that their entities can be set up before they connect."""
+from __future__ import annotations
+
+import logging
+from collections.abc import Container
+from typing import Any
+
+import greeneye
+from greeneye.api import TemperatureUnit
+from homeassistant.core import callback
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+from siobrultech_protocols.gem.packets import PacketFormatType
+
+from .const import DOMAIN
+
+SNAPSHOT_STORAGE_KEY = f"{DOMAIN}.snapshot"
+SNAPSHOT_STORAGE_VERSION = 1
+
+# How long after a monitor reports to wait before saving the snapshot. Pending saves
+# are also written when Home Assistant stops.
+SNAPSHOT_SAVE_DELAY_SECONDS = 300
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def snapshot_monitor(monitor: greeneye.monitor.Monitor) -> dict[str, Any]:
+    """Return the topology and counters of the given monitor as JSON-serializable data."""
+    return {
+        "serial_number": monitor.serial_number,
+        "packet_format": monitor.packet_format,
+        "channels": [_snapshot_channel(channel) for channel in monitor.channels],
+        "temperature_sensors": [
+            {"unit": sensor.unit.value if sensor.unit is not None else None}
+            for sensor in monitor.temperature_sensors
+        ],
+        "pulse_counters": [
+            _snapshot_pulse_counter(pulse_counter)
+            for pulse_counter in monitor.pulse_counters
+        ],
+        "aux": [
+            _snapshot_channel(aux)
+            if isinstance(aux, greeneye.monitor.Channel)
+            else {
+                "channel": _snapshot_channel(aux.channel),
+                "pulse_counter": _snapshot_pulse_counter(aux.pulse_counter),
+            }
+            for aux in monitor.aux
+        ],
+    }
+
+
+def _snapshot_channel(channel: greeneye.monitor.Channel) -> dict[str, Any]:
+    return {
+        "net_metering": channel.net_metering,
+        "absolute_watt_seconds": channel.absolute_watt_seconds,
+        "polarized_watt_seconds": channel.polarized_watt_seconds,
+    }
+
+
+def _snapshot_pulse_counter(
+    pulse_counter: greeneye.monitor.PulseCounter,
+) -> dict[str, Any]:
+    return {"pulses": pulse_counter.pulses}
+
+
+def restore_monitor(data: dict[str, Any]) -> greeneye.monitor.Monitor:
+    """Build a monitor from a snapshot, for the library to use once the monitor connects.
+
+    Only counters are restored. Power, current, temperature, and voltage stay unknown
+    until the monitor reports them, since a value from before the restart would be
+    recorded as if it were current.
+    """
+    monitor = greeneye.monitor.Monitor(data["serial_number"])
+    if data["packet_format"] is not None:
+        monitor.packet_format = PacketFormatType(data["packet_format"])
+    monitor.channels = [
+        _restore_channel(greeneye.monitor.Channel(monitor, number), channel)
+        for number, channel in enumerate(data["channels"])
+    ]
+    monitor.temperature_sensors = [
+        greeneye.monitor.TemperatureSensor(
+            monitor,
+            number,
+            TemperatureUnit(sensor["unit"]) if sensor["unit"] is not None else None,
+        )
+        for number, sensor in enumerate(data["temperature_sensors"])
+    ]
+    monitor.pulse_counters = [
+        _restore_pulse_counter(
+            greeneye.monitor.PulseCounter(monitor, number), pulse_counter
+        )
+        for number, pulse_counter in enumerate(data["pulse_counters"])
+    ]
+    for number, aux in enumerate(data["aux"]):
+        if "pulse_counter" in aux:
+            restored_aux = greeneye.monitor.Aux(monitor, number)
+            _restore_channel(restored_aux.channel, aux["channel"])
+            _restore_pulse_counter(restored_aux.pulse_counter, aux["pulse_counter"])
+            monitor.aux.append(restored_aux)
+        else:
+            monitor.aux.append(
+                _restore_channel(
+                    greeneye.monitor.Channel(monitor, number, is_aux=True), aux
+                )
+            )
+
+    # Keep the library from adding a second set of channels and sensors when the first
+    # packet arrives
+    monitor._configured = True
+    return monitor
+
+
+def _restore_channel(
+    channel: greeneye.monitor.Channel, data: dict[str, Any]
+) -> greeneye.monitor.Channel:
+    channel.net_metering = data["net_metering"]
+    channel.absolute_watt_seconds = data["absolute_watt_seconds"]
+    channel.polarized_watt_seconds = data["polarized_watt_seconds"]
+    return channel
+
+
+def _restore_pulse_counter(
+    pulse_counter: greeneye.monitor.PulseCounter, data: dict[str, Any]
+) -> greeneye.monitor.PulseCounter:
+    pulse_counter.pulses = data["pulses"]
+    return pulse_counter
+
+
+async def async_remove_snapshots(hass: HomeAssistant) -> None:
+    """Delete the saved snapshots."""
+    await Store(hass, SNAPSHOT_STORAGE_VERSION, SNAPSHOT_STORAGE_KEY).async_remove()
+
+
+class MonitorSnapshots:
+    """Saves a snapshot of every monitor seen in Home Assistant's storage, and restores them at startup.
+
+    A restored monitor is handed to the servers before they start, so the library
+    updates it in place when the monitor connects, and the entities set up from it
+    keep working without being set up again.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self._store: Store[dict[str, Any]] = Store(
+            hass, SNAPSHOT_STORAGE_VERSION, SNAPSHOT_STORAGE_KEY
+        )
+        self._monitors: dict[int, greeneye.monitor.Monitor] = {}
+        self._data: dict[int, dict[str, Any]] = {}
+        self._save_pending = False
+
+    async def async_load(
+        self, serial_numbers: Container[int]
+    ) -> list[greeneye.monitor.Monitor]:
+        """Restore the monitors with the given serial numbers from the last snapshot.
+
+        Snapshots of other monitors are kept as they are, in case those monitors are
+        added back later.
+        """
+        data = await self._store.async_load() or {}
+        restored: list[greeneye.monitor.Monitor] = []
+        for monitor_data in data.get("monitors", []):
+            serial_number = monitor_data["serial_number"]
+            self._data[serial_number] = monitor_data
+            if serial_number not in serial_numbers:
+                continue
+
+            try:
+                monitor = restore_monitor(monitor_data)
+            except (KeyError, TypeError, ValueError):
+                _LOGGER.warning(
+                    "Ignoring invalid snapshot of monitor %d", serial_number
+                )
+                continue
+            self.async_track(monitor)
+            restored.append(monitor)
+        return restored
+
+    @callback
+    def async_track(self, monitor: greeneye.monitor.Monitor) -> None:
+        """Keep the snapshot of the given monitor up to date."""
+        if monitor.serial_number in self._monitors:
+            return
+
+        self._monitors[monitor.serial_number] = monitor
+        monitor.add_listener(self._async_schedule_save)
+        self._async_schedule_save()
+
+    async def async_on_new_monitor(self, monitor: greeneye.monitor.Monitor) -> None:
+        self.async_track(monitor)
+
+    @callback
+    def _async_schedule_save(self) -> None:
+        if self._save_pending:
+            return
+
+        self._save_pending = True
+        self._store.async_delay_save(self._async_snapshot, SNAPSHOT_SAVE_DELAY_SECONDS)
+
+    @callback
+    def _async_snapshot(self) -> dict[str, Any]:
+        self._save_pending = False
+        for serial_number, monitor in self._monitors.items():
+            self._data[serial_number] = snapshot_monitor(monitor)
+        return {"monitors": list(self._data.values())}
+
+    async def async_close(self) -> None:
+        """Stop following the monitors and save their final snapshot."""
+        for monitor in self._monitors.values():
+            monitor.remove_listener(self._async_schedule_save)
+        await self._store.async_save(self._async_snapshot())
+        self._monitors.clear()
@@ -0,0 +1,219 @@
+"""Coalesced state writes for the entities of a Brultech energy monitor."""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any
+
+import greeneye
+from homeassistant.components.sensor import SensorEntity
+from homeassistant.core import callback
+from homeassistant.core import CALLBACK_TYPE
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.event import async_track_utc_time_change
+
+from .monitor_stats import MonitorStats
+
+# How long to wait for the end of a packet before writing pending states anyway
+FLUSH_DELAY_SECONDS = 0.5
+
+# A packet that waited longer than this between its data arriving on the connection and
+# the monitor handling it means Home Assistant is falling behind the monitor. Until a
+# packet arrives that waited less, pending states are only written this often.
+OVERLOAD_QUEUE_SECONDS = 1.0
+OVERLOAD_FLUSH_DELAY_SECONDS = 5.0
+
+
+class StateWriteCoalescer:
+    """Collects the entities of one monitor that need a state write and writes them in one batch.
+
+    The greeneye library notifies the listeners of every channel, pulse counter, and sensor
+    in a packet before it notifies the listeners of the monitor itself, so the monitor
+    listener marks the end of a packet. That is where pending writes are flushed. Writes
+    marked outside of a packet, as the connection reports them to the stats, arm a short
+    timer instead, one for all of them, so that a packet never costs a timer. An entity whose state and attributes are the same as
+    when it was last written is not written again.
+
+    Only instantaneous sensors write through here; cumulative ones use the
+    AlignedFlushScheduler. So when packets start queueing for the event loop, the
+    writes of a packet are held back instead, and an entity marked again while its
+    write is pending has the earlier update dropped in favor of the later one. Each
+    held entity is written once, with its latest value, when the backlog clears or
+    OVERLOAD_FLUSH_DELAY_SECONDS after the first held write at the latest.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        monitor: greeneye.monitor.Monitor,
+        stats: MonitorStats,
+    ) -> None:
+        self._hass = hass
+        self._monitor = monitor
+        self.stats = stats
+        self._pending: dict[SensorEntity, None] = {}
+        self._written: dict[SensorEntity, tuple[Any, Any]] = {}
+        self._cancel_flush: CALLBACK_TYPE | None = None
+        self.flushes = 0
+        self.writes = 0
+        self.unchanged = 0
+        self.overloaded = False
+        self._monitor.add_listener(self._async_on_monitor_update)
+
+    @callback
+    def async_schedule_write(self, entity: SensorEntity) -> None:
+        """Mark the given entity as needing its state written with the next flush."""
+        if entity in self._pending:
+            self.stats.dropped_writes += 1
+        else:
+            self._pending[entity] = None
+        if not self.stats.packet_in_progress:
+            self._async_flush_later_if_needed()
+
+    @callback
+    def async_discard(self, entity: SensorEntity) -> None:
+        """Forget any pending write for the given entity, and the state it last wrote."""
+        self._pending.pop(entity, None)
+        self._written.pop(entity, None)
+
+    @callback
+    def async_flush(self) -> None:
+        """Write the state of every entity marked since the last flush."""
+        self._async_cancel_flush()
+        if not self._pending:
+            return
+
+        pending = self._pending
+        self._pending = {}
+        self.flushes += 1
+        for entity in pending:
+            state = (entity.native_value, entity.extra_state_attributes)
+            if self._written.get(entity) == state:
+                self.unchanged += 1
+                self.stats.filtered_writes += 1
+                continue
+            self._written[entity] = state
+            self.writes += 1
+            entity.async_write_ha_state()
+
+    @callback
+    def _async_on_monitor_update(self) -> None:
+        queue_seconds = self.stats.packet_queue_seconds()
+        if queue_seconds is not None:
+            overloaded = queue_seconds > OVERLOAD_QUEUE_SECONDS
+            if overloaded and not self.overloaded:
+                # Stretch the flush timer of writes marked before the backlog was seen
+                self._async_cancel_flush()
+            self.overloaded = overloaded
+
+        if self.overloaded:
+            if self._pending:
+                self._async_flush_later_if_needed()
+        else:
+            self.async_flush()
+
+    @callback
+    def _async_flush_later_if_needed(self) -> None:
+        if self._cancel_flush is None:
+            self._cancel_flush = async_call_later(
+                self._hass,
+                OVERLOAD_FLUSH_DELAY_SECONDS
+                if self.overloaded
+                else FLUSH_DELAY_SECONDS,
+                self._async_flush_later,
+            )
+
+    @callback
+    def _async_cancel_flush(self) -> None:
+        if self._cancel_flush is not None:
+            self._cancel_flush()
+            self._cancel_flush = None
+
+    @callback
+    def _async_flush_later(self, _: datetime) -> None:
+        self._cancel_flush = None
+        self.async_flush()
+
+    @callback
+    def async_close(self) -> None:
+        """Stop listening to the monitor and drop any pending writes."""
+        self._async_cancel_flush()
+        self._pending.clear()
+        self._written.clear()
+        self._monitor.remove_listener(self._async_on_monitor_update)
+
+
+class AlignedFlushScheduler:
+    """Writes the state of the cumulative sensors of all monitors in one batch at clock-aligned times.
+
+    Flushes happen in the last second before every UTC minute that is a multiple of the
+    interval, so the state that closes each of the recorder's 5-minute and hourly
+    statistics periods is recorded within that period, and is at most a second old when
+    it ends. An entity that has no value written yet, because its monitor had not sent
+    a packet when it was added, has its first one written straight away instead. An
+    entity whose state and attributes are the same as when it was last written is not
+    written again.
+    """
+
+    def __init__(self, hass: HomeAssistant, interval_minutes: int) -> None:
+        self._pending: dict[SensorEntity, None] = {}
+        self._written: dict[SensorEntity, tuple[Any, Any]] = {}
+        self.flushes = 0
+        self.writes = 0
+        self.unchanged = 0
+        self._cancel_timer = async_track_utc_time_change(
+            hass,
+            self._async_flush,
+            minute=list(range(interval_minutes - 1, 60, interval_minutes)),
+            second=59,
+        )
+
+    @callback
+    def async_add(self, entity: SensorEntity) -> None:
+        """Note the state the given entity is about to be added with, if it has a value."""
+        if entity.native_value is not None:
+            self._written[entity] = (entity.native_value, entity.extra_state_attributes)
+
+    @callback
+    def async_schedule_write(self, entity: SensorEntity) -> None:
+        """Mark the given entity as needing its state written at the next flush time."""
+        if entity in self._written:
+            self._pending[entity] = None
+        elif entity.native_value is not None:
+            self._write(entity)
+
+    @callback
+    def async_discard(self, entity: SensorEntity) -> None:
+        """Forget any pending write for the given entity, and the state it last wrote."""
+        self._pending.pop(entity, None)
+        self._written.pop(entity, None)
+
+    @callback
+    def _async_flush(self, _: datetime) -> None:
+        if not self._pending:
+            return
+
+        pending = self._pending
+        self._pending = {}
+        self.flushes += 1
+        for entity in pending:
+            if self._written.get(entity) == (
+                entity.native_value,
+                entity.extra_state_attributes,
+            ):
+                self.unchanged += 1
+                continue
+            self._write(entity)
+
+    @callback
+    def _write(self, entity: SensorEntity) -> None:
+        self._written[entity] = (entity.native_value, entity.extra_state_attributes)
+        self.writes += 1
+        entity.async_write_ha_state()
+
+    @callback
+    def async_close(self) -> None:
+        """Stop the flush timer and drop any pending writes."""
+        self._cancel_timer()
+        self._pending.clear()
+        self._written.clear()
@@ -18,6 +18,8 @@ from custom_components.greeneye_monitor.const import CONF_TEMPERATURE_SENSORS
 from custom_components.greeneye_monitor.const import CONF_TIME_UNIT
 from custom_components.greeneye_monitor.const import CONF_VOLTAGE_SENSORS
 from custom_components.greeneye_monitor.const import DOMAIN
+from custom_components.greeneye_monitor.ingress import notify_packet_ended
+from custom_components.greeneye_monitor.ingress import notify_packet_started
 from greeneye.monitor import MonitorType
 from homeassistant.const import CONF_NAME
 from homeassistant.const import CONF_PORT
@@ -233,8 +235,12 @@ def mock_channel(number: int) -> MagicMock:
     channel.polarized_watt_seconds = -400
     channel.absolute_kilowatt_hours = 42
     channel.polarized_kilowatt_hours = -50
+    # As greeneye's Channel computes them from the absolute and polarized watt-seconds
+    channel.watt_seconds = 1800
+    channel.kilowatt_hours = 0.0005
     channel.watts = None
     channel.is_aux = False
+    channel.timestamp = None
     return channel
 
 
@@ -260,6 +266,18 @@ async def connect_monitor(
     return monitor
 
 
+async def start_packet(monitor: MagicMock, size: int = 0) -> None:
+    """Simulate the connection handing a packet to a mock monitor, which notifies its listeners at the start of a packet."""
+    notify_packet_started(monitor, size)
+    await monitor.notify_all_listeners()
+
+
+async def end_packet(monitor: MagicMock) -> None:
+    """Simulate a mock monitor finishing a packet, notifying its listeners and then the connection's packet listeners."""
+    await monitor.notify_all_listeners()
+    notify_packet_ended(monitor)
+
+
 def _ensure_coroutine(listener):
     if inspect.iscoroutinefunction(listener):
         return listener
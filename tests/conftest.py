@@ -162,9 +162,12 @@ def assert_sensor_registered(
 @pytest.fixture
 def monitors() -> AsyncMock:
     """Provide a mock greeneye.Monitors object that has listeners and can add new monitors."""
-    with patch("greeneye.Monitors", new=AsyncMock) as mock_monitors:
+    with patch(
+        "custom_components.greeneye_monitor.IngressMonitors", new=AsyncMock
+    ) as mock_monitors:
         add_listeners(mock_monitors)
         mock_monitors.monitors = {}
+        mock_monitors.peer_address = MagicMock(return_value=None)
 
         async def add_monitor(monitor: MagicMock) -> None:
             """Add the given mock monitor as a monitor with the given serial number, notifying any listeners on the Monitors object."""
@@ -0,0 +1,445 @@
+"""Simulated Brultech monitors that send real GEM and ECM packets over TCP.
+
+Run against a live Home Assistant instance with, for example:
+
+    python -m tests.simulator --host 192.168.1.10 --port 8000 --monitors 10 --rate 1
+
+or replay a packet log recorded by the integration at 100 times its original speed with:
+
+    python -m tests.simulator --port 8000 --speed 100 \
+        --replay greeneye_monitor_packets.bin.1 greeneye_monitor_packets.bin
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import socket
+import time
+from collections.abc import Callable
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from custom_components.greeneye_monitor.decoder import frame_packet
+from custom_components.greeneye_monitor.packet_log import PacketLogRecord
+from custom_components.greeneye_monitor.packet_log import read_packet_log
+from siobrultech_protocols.gem.packets import BIN32_ABS
+from siobrultech_protocols.gem.packets import BIN32_NET
+from siobrultech_protocols.gem.packets import BIN48_ABS
+from siobrultech_protocols.gem.packets import BIN48_NET
+from siobrultech_protocols.gem.packets import ECM_1220
+from siobrultech_protocols.gem.packets import ECM_1240
+from siobrultech_protocols.gem.packets import ECMPacketFormat
+from siobrultech_protocols.gem.packets import GEMPacketFormat
+from siobrultech_protocols.gem.packets import Packet
+from siobrultech_protocols.gem.packets import PacketFormat
+
+_LOGGER = logging.getLogger(__name__)
+
+PACKET_FORMATS: dict[str, PacketFormat] = {
+    packet_format.name: packet_format
+    for packet_format in [
+        BIN48_NET,
+        BIN48_ABS,
+        BIN32_NET,
+        BIN32_ABS,
+        ECM_1240,
+        ECM_1220,
+    ]
+}
+
+BASE_VOLTAGE = 120.0
+# Each packet's voltage is BASE_VOLTAGE plus its sequence number modulo this many tenths
+# of a volt, so the state of the voltage sensor identifies the packet that produced it.
+VOLTAGE_TAG_STEPS = 100
+
+ECM_ACK = b"\xfc"
+
+# Offsets into the 512-byte settings block returned by ^^^RQSALL
+GEM_SETTINGS_SIZE = 512
+GEM_SETTINGS_CHANNEL_OPTIONS = 1
+GEM_SETTINGS_PACKET_FORMAT = 123
+GEM_SETTINGS_PACKET_SEND_INTERVAL = 124
+GEM_SETTINGS_NUM_CHANNELS = 249
+GEM_CHANNEL_OPTION_ABSOLUTE = 0x40
+
+
+def tag_voltage(sequence: int) -> float:
+    """Return the voltage that a simulated monitor reports in the packet with the given sequence number."""
+    return BASE_VOLTAGE + (sequence % VOLTAGE_TAG_STEPS) / 10
+
+
+def voltage_tag(voltage: float) -> int:
+    """Return the sequence number modulo VOLTAGE_TAG_STEPS of the packet that reported the given voltage."""
+    return round((voltage - BASE_VOLTAGE) * 10) % VOLTAGE_TAG_STEPS
+
+
+class SimulatedMonitor:
+    """The counters of one simulated monitor, which advance by one simulated second per packet."""
+
+    def __init__(
+        self,
+        serial_number: int,
+        packet_format: PacketFormat = BIN48_NET,
+        watts: float = 100.0,
+    ) -> None:
+        self.serial_number = serial_number
+        self.packet_format = packet_format
+        self.watts = watts
+        self.sequence = 0
+        self._watt_seconds = [0] * packet_format.num_channels
+        self._pulse_counts = [0] * GEMPacketFormat.NUM_PULSE_COUNTERS
+
+    @property
+    def is_ecm(self) -> bool:
+        return isinstance(self.packet_format, ECMPacketFormat)
+
+    def next_packet(self) -> bytes:
+        """Advance the counters by one second and return the encoded packet."""
+        self.sequence += 1
+        num_channels = self.packet_format.num_channels
+        self._watt_seconds = [
+            watt_seconds + round(self.watts * (channel + 1))
+            for channel, watt_seconds in enumerate(self._watt_seconds)
+        ]
+        self._pulse_counts = [count + 1 for count in self._pulse_counts]
+        voltage = tag_voltage(self.sequence)
+        packet = Packet(
+            packet_format=self.packet_format,
+            voltage=voltage,
+            absolute_watt_seconds=self._watt_seconds,
+            polarized_watt_seconds=self._watt_seconds,
+            currents=[
+                round(self.watts * (channel + 1) / voltage, 2)
+                for channel in range(num_channels)
+            ],
+            device_id=self.serial_number // 100000,
+            serial_number=self.serial_number % 100000,
+            seconds=self.sequence,
+        )
+        if self.is_ecm:
+            packet.aux = [0] * 5
+            packet.dc_voltage = 0
+        else:
+            packet.pulse_counts = self._pulse_counts
+            packet.temperatures = [20.0 + number for number in range(8)]
+        return self.packet_format.format(packet)
+
+    def settings_response(self) -> bytes:
+        """Return the monitor's reply to a request for all of its settings."""
+        if self.is_ecm:
+            settings = bytearray(33)
+            settings[6] = 1  # Packet send interval
+            settings[10] = self.serial_number // 100000
+            settings[11:13] = (self.serial_number % 100000).to_bytes(2, "big")
+            settings[32] = sum(settings[:32]) % 256
+            return ECM_ACK + bytes(settings)
+
+        settings = bytearray(GEM_SETTINGS_SIZE)
+        num_channels = self.packet_format.num_channels
+        if self.packet_format in (BIN48_ABS, BIN32_ABS):
+            for channel in range(num_channels):
+                settings[
+                    GEM_SETTINGS_CHANNEL_OPTIONS + channel
+                ] = GEM_CHANNEL_OPTION_ABSOLUTE
+        settings[GEM_SETTINGS_PACKET_FORMAT] = self.packet_format.type
+        settings[GEM_SETTINGS_PACKET_SEND_INTERVAL] = 1
+        settings[GEM_SETTINGS_NUM_CHANNELS] = num_channels
+        return ("ALL\r\n" + ",".join(f"{b:02X}" for b in settings) + "\r\n").encode()
+
+
+class _MonitorProtocol(asyncio.Protocol):
+    """Answers the API requests that the greeneye library makes of a newly connected monitor."""
+
+    def __init__(self, monitor: SimulatedMonitor) -> None:
+        self._monitor = monitor
+        self._buffer = bytearray()
+        self._awaiting_ecm_ack = False
+        self.transport: asyncio.Transport | None = None
+        self.closed = asyncio.get_running_loop().create_future()
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        assert isinstance(transport, asyncio.Transport)
+        self.transport = transport
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        self.transport = None
+        if not self.closed.done():
+            self.closed.set_result(None)
+
+    def data_received(self, data: bytes) -> None:
+        assert self.transport
+        if self._monitor.is_ecm:
+            # ECM API calls arrive one chunk at a time, and each chunk waits for an ack
+            if self._awaiting_ecm_ack and data == ECM_ACK:
+                self._awaiting_ecm_ack = False
+            elif data == b"RCV":
+                self.transport.write(self._monitor.settings_response())
+                self._awaiting_ecm_ack = True
+            else:
+                self.transport.write(ECM_ACK)
+            return
+
+        # GEM commands have no terminator, so only the one that needs a reply is
+        # recognized
+        self._buffer.extend(data)
+        index = self._buffer.find(b"RQSALL")
+        if index != -1:
+            del self._buffer[: index + len(b"RQSALL")]
+            self.transport.write(self._monitor.settings_response())
+        else:
+            del self._buffer[: -len(b"RQSALL")]
+
+
+PacketSentCallback = Callable[[SimulatedMonitor, float], None]
+
+
+@dataclass
+class SimulatorStats:
+    packets_sent: int = 0
+    bytes_sent: int = 0
+    cpu_seconds: float = 0.0
+
+
+class Simulator:
+    """Connects simulated monitors to a port and sends packets from each at a fixed rate.
+
+    Sends from different monitors are spread evenly across the packet interval, as they
+    would be from real monitors that were powered on at different times. With
+    one_connection, all monitors send over a single connection, as monitors chained
+    behind one network interface do.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        monitors: list[SimulatedMonitor],
+        packets_per_second: float = 1.0,
+        on_packet_sent: PacketSentCallback | None = None,
+        one_connection: bool = False,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.monitors = monitors
+        self.interval = 1 / packets_per_second
+        self.stats = SimulatorStats()
+        self._on_packet_sent = on_packet_sent
+        self._one_connection = one_connection
+        self._protocols: list[_MonitorProtocol] = []
+
+    async def connect(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._one_connection:
+            _, protocol = await loop.create_connection(
+                lambda: _MonitorProtocol(self.monitors[0]), self.host, self.port
+            )
+            self._protocols = [protocol] * len(self.monitors)
+            return
+
+        for monitor in self.monitors:
+            _, protocol = await loop.create_connection(
+                lambda monitor=monitor: _MonitorProtocol(monitor), self.host, self.port
+            )
+            self._protocols.append(protocol)
+
+    async def run(self, packets_per_monitor: int | None = None) -> None:
+        """Send packets until each monitor has sent the given number, or forever if None."""
+        start = asyncio.get_running_loop().time()
+        await asyncio.gather(
+            *(
+                self._run_monitor(
+                    monitor,
+                    protocol,
+                    start + self.interval * index / len(self.monitors),
+                    packets_per_monitor,
+                )
+                for index, (monitor, protocol) in enumerate(
+                    zip(self.monitors, self._protocols)
+                )
+            )
+        )
+
+    async def _run_monitor(
+        self,
+        monitor: SimulatedMonitor,
+        protocol: _MonitorProtocol,
+        start: float,
+        packets_per_monitor: int | None,
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        sent = 0
+        while packets_per_monitor is None or sent < packets_per_monitor:
+            await asyncio.sleep(max(0.0, start + sent * self.interval - loop.time()))
+            if protocol.transport is None:
+                return
+
+            cpu_start = time.process_time()
+            packet = monitor.next_packet()
+            protocol.transport.write(packet)
+            self.stats.cpu_seconds += time.process_time() - cpu_start
+            self.stats.packets_sent += 1
+            self.stats.bytes_sent += len(packet)
+            sent += 1
+            if self._on_packet_sent:
+                self._on_packet_sent(monitor, time.perf_counter())
+
+    async def close(self) -> None:
+        for protocol in self._protocols:
+            if protocol.transport:
+                protocol.transport.close()
+        await asyncio.gather(*(protocol.closed for protocol in self._protocols))
+        self._protocols.clear()
+
+
+def find_monitor(data: bytes) -> SimulatedMonitor | None:
+    """Return a simulated monitor with the serial number and packet format of the first packet in the given data."""
+    buffer = bytearray(data)
+    for start in range(len(buffer)):
+        packet_format = frame_packet(buffer[start:])
+        if packet_format is not None:
+            packet = packet_format.parse(bytes(buffer[start:]))
+            return SimulatedMonitor(
+                packet.device_id * 100000 + packet.serial_number, packet_format
+            )
+    return None
+
+
+class Replayer:
+    """Sends the data from a packet log to a port at its original pace multiplied by speed.
+
+    Each connection in the log is opened when the data of its first packet is due, with
+    everything it received until then, and answers API requests the same way as a
+    simulated monitor with the serial number and packet format of that packet.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        records: Iterable[PacketLogRecord],
+        speed: float = 1.0,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.speed = speed
+        self.stats = SimulatorStats()
+        self._records = records
+        self._protocols: dict[int, _MonitorProtocol] = {}
+        self._unsent: dict[int, bytes] = {}
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        first_timestamp: float | None = None
+        for record in self._records:
+            if first_timestamp is None:
+                first_timestamp = record.timestamp
+            due = start + (record.timestamp - first_timestamp) / self.speed
+            await asyncio.sleep(max(0.0, due - loop.time()))
+
+            data = record.data
+            protocol = self._protocols.get(record.connection)
+            if protocol is None:
+                data = self._unsent.pop(record.connection, b"") + data
+                monitor = find_monitor(data)
+                if monitor is None:
+                    self._unsent[record.connection] = data
+                    continue
+                _, protocol = await loop.create_connection(
+                    lambda: _MonitorProtocol(monitor), self.host, self.port
+                )
+                self._protocols[record.connection] = protocol
+            if protocol.transport is None:
+                continue
+
+            protocol.transport.write(data)
+            self.stats.bytes_sent += len(data)
+
+    async def close(self) -> None:
+        for protocol in self._protocols.values():
+            if protocol.transport:
+                protocol.transport.close()
+        await asyncio.gather(
+            *(protocol.closed for protocol in self._protocols.values())
+        )
+        self._protocols.clear()
+
+
+def read_packet_logs(paths: Iterable[str]) -> Iterable[PacketLogRecord]:
+    for path in paths:
+        yield from read_packet_log(path)
+
+
+def unused_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def make_monitors(
+    count: int, packet_format: PacketFormat = BIN48_NET, first_serial_number: int = 1
+) -> list[SimulatedMonitor]:
+    return [
+        SimulatedMonitor(first_serial_number + index, packet_format)
+        for index in range(count)
+    ]
+
+
+async def _replay(args: argparse.Namespace) -> None:
+    replayer = Replayer(args.host, args.port, read_packet_logs(args.replay), args.speed)
+    try:
+        await replayer.run()
+    finally:
+        await replayer.close()
+        _LOGGER.info("Replayed %d bytes", replayer.stats.bytes_sent)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    if args.replay:
+        await _replay(args)
+        return
+
+    simulator = Simulator(
+        args.host,
+        args.port,
+        make_monitors(
+            args.monitors, PACKET_FORMATS[args.format], args.first_serial_number
+        ),
+        args.rate,
+    )
+    await simulator.connect()
+    _LOGGER.info("Connected %d monitors to %s:%d", args.monitors, args.host, args.port)
+    try:
+        await simulator.run(args.packets)
+    finally:
+        await simulator.close()
+        _LOGGER.info(
+            "Sent %d packets (%d bytes)",
+            simulator.stats.packets_sent,
+            simulator.stats.bytes_sent,
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--monitors", type=int, default=1)
+    parser.add_argument("--rate", type=float, default=1.0, help="packets/s per monitor")
+    parser.add_argument(
+        "--packets", type=int, help="packets per monitor (default: run forever)"
+    )
+    parser.add_argument("--format", choices=PACKET_FORMATS, default=BIN48_NET.name)
+    parser.add_argument("--first-serial-number", type=int, default=1)
+    parser.add_argument(
+        "--replay",
+        nargs="+",
+        metavar="PACKET_LOG",
+        help="replay these packet logs, oldest first, instead of simulating monitors",
+    )
+    parser.add_argument(
+        "--speed", type=float, default=1.0, help="replay speed multiplier"
+    )
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,138 @@
+"""Microbenchmarks for the per-packet path of greeneye_monitor entities.
+
+Save a run with `pytest tests/test_benchmark.py --benchmark-autosave` and compare a later
+one against it with `--benchmark-compare --benchmark-compare-fail=mean:10%`.
+"""
+from __future__ import annotations
+
+from datetime import timedelta
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+
+import pytest
+from custom_components.greeneye_monitor.const import CONF_MONITORS
+from custom_components.greeneye_monitor.const import CONF_PULSE_COUNTERS
+from custom_components.greeneye_monitor.const import CONF_TEMPERATURE_SENSORS
+from custom_components.greeneye_monitor.const import DEVICE_TYPE_CURRENT_TRANSFORMER
+from custom_components.greeneye_monitor.const import DOMAIN
+from custom_components.greeneye_monitor.const import make_device_info
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.entity_platform import async_get_platforms
+
+from .common import make_single_monitor_config_with_sensors
+from .common import mock_channel
+from .common import mock_monitor
+from .common import setup_greeneye_monitor_component_with_config
+from .common import SINGLE_MONITOR_CONFIG_PULSE_COUNTERS
+from .common import SINGLE_MONITOR_CONFIG_TEMPERATURE_SENSORS
+from .common import SINGLE_MONITOR_SERIAL_NUMBER
+
+pytestmark = pytest.mark.benchmark(max_time=0.2)
+
+ENTITY_CLASSES = [
+    "PowerSensor",
+    "CurrentSensor",
+    "EnergySensor",
+    "PulseRateSensor",
+    "PulseCountSensor",
+    "TemperatureSensor",
+    "VoltageSensor",
+    "ChannelTypeEntity",
+    "ChannelRangeEntity",
+    "PacketIntervalEntity",
+]
+
+BENCHMARK_CONFIG = make_single_monitor_config_with_sensors(
+    {
+        CONF_PULSE_COUNTERS: SINGLE_MONITOR_CONFIG_PULSE_COUNTERS[DOMAIN][
+            CONF_MONITORS
+        ][0][CONF_PULSE_COUNTERS],
+        CONF_TEMPERATURE_SENSORS: SINGLE_MONITOR_CONFIG_TEMPERATURE_SENSORS[DOMAIN][
+            CONF_MONITORS
+        ][0][CONF_TEMPERATURE_SENSORS],
+    }
+)
+
+
+async def connect_48_channel_monitor(
+    hass: HomeAssistant, monitors: AsyncMock
+) -> MagicMock:
+    """Set up the integration with every sensor type configured and connect a mock 48-channel GEM."""
+    await setup_greeneye_monitor_component_with_config(hass, BENCHMARK_CONFIG)
+    monitor = mock_monitor(SINGLE_MONITOR_SERIAL_NUMBER)
+    monitor.channels = [mock_channel(i) for i in range(0, 48)]
+    for channel in monitor.channels:
+        channel.watts = 100.0
+        channel.amps = 1.0
+        channel.ct_type = 1
+        channel.ct_range = 3
+    monitor.packet_send_interval = timedelta(seconds=5)
+    await monitors.add_monitor(monitor)
+    await hass.async_block_till_done()
+    return monitor
+
+
+def get_entity(hass: HomeAssistant, class_name: str) -> Entity:
+    """Return one of the integration's entities of the given class."""
+    for platform in async_get_platforms(hass, DOMAIN):
+        for entity in platform.entities.values():
+            if type(entity).__name__ == class_name:
+                return entity
+    raise AssertionError(f"No {class_name} entity was created")
+
+
+@pytest.mark.parametrize("class_name", ENTITY_CLASSES)
+@pytest.mark.parametrize(
+    "operation", ["native_value", "extra_state_attributes", "async_write_ha_state"]
+)
+async def test_entity_benchmark(
+    hass: HomeAssistant,
+    monitors: AsyncMock,
+    benchmark,
+    class_name: str,
+    operation: str,
+) -> None:
+    """Benchmark the per-packet operations of each entity class."""
+    await connect_48_channel_monitor(hass, monitors)
+    entity = get_entity(hass, class_name)
+    benchmark.group = operation
+
+    if operation == "async_write_ha_state":
+        benchmark(entity.async_write_ha_state)
+    else:
+        benchmark(getattr, entity, operation)
+
+    await hass.async_block_till_done()
+
+
+async def test_make_device_info_benchmark(
+    hass: HomeAssistant, monitors: AsyncMock, benchmark
+) -> None:
+    """Benchmark building the device info of a channel."""
+    monitor = mock_monitor(SINGLE_MONITOR_SERIAL_NUMBER)
+    benchmark(make_device_info, monitor, DEVICE_TYPE_CURRENT_TRANSFORMER, 0)
+
+
+async def test_packet_dispatch_benchmark(
+    hass: HomeAssistant, monitors: AsyncMock, benchmark
+) -> None:
+    """Benchmark notifying every listener of a 48-channel monitor, as the greeneye library does for each packet."""
+    monitor = await connect_48_channel_monitor(hass, monitors)
+    sensors = [
+        monitor.voltage_sensor,
+        *monitor.channels,
+        *monitor.temperature_sensors,
+        *monitor.pulse_counters,
+    ]
+
+    def dispatch_packet() -> None:
+        for sensor in sensors:
+            for listener in sensor.listeners:
+                listener()
+        for listener in monitor.listeners:
+            listener()
+
+    benchmark(dispatch_packet)
+
+    await hass.async_block_till_done()
@@ -0,0 +1,100 @@
+"""Tests for greeneye_monitor packet decoding outside of the event loop."""
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+from custom_components.greeneye_monitor.const import PACKET_DECODING_PROCESS
+from custom_components.greeneye_monitor.const import PACKET_DECODING_THREAD
+from custom_components.greeneye_monitor.decoder import decode_packets
+from custom_components.greeneye_monitor.decoder import DecodingGemProtocol
+from custom_components.greeneye_monitor.decoder import frame_packet
+from custom_components.greeneye_monitor.decoder import PacketDecoder
+from custom_components.greeneye_monitor.ingress import TimedPacketReceivedMessage
+from siobrultech_protocols.gem.packets import BIN48_NET
+from siobrultech_protocols.gem.packets import BIN48_NET_TIME
+from siobrultech_protocols.gem.packets import Packet
+from siobrultech_protocols.gem.protocol import ConnectionLostMessage
+from siobrultech_protocols.gem.protocol import ConnectionMadeMessage
+from siobrultech_protocols.gem.protocol import PacketProtocolMessage
+
+from .simulator import PACKET_FORMATS
+from .simulator import SimulatedMonitor
+
+
+@pytest.mark.parametrize("packet_format_name", PACKET_FORMATS)
+def test_frame_packet(packet_format_name: str) -> None:
+    """Test that a packet is framed only once it is complete and well formed."""
+    packet_format = PACKET_FORMATS[packet_format_name]
+    data = bytearray(SimulatedMonitor(1234567, packet_format).next_packet())
+
+    assert frame_packet(data) is packet_format
+    assert frame_packet(data + b"\xfe\xff") is packet_format
+    assert frame_packet(data[:-1]) is None
+    data[-1] ^= 0xFF
+    assert frame_packet(data) is None
+
+
+@pytest.mark.parametrize("mode", [PACKET_DECODING_THREAD, PACKET_DECODING_PROCESS])
+async def test_decoding_protocol_keeps_order(mode: str) -> None:
+    """Test that packets split across arbitrary chunks are decoded in order, and that the connection is only reported lost after them."""
+    monitor = SimulatedMonitor(1234567)
+    packets = [monitor.next_packet() for _ in range(10)]
+    stream = b"".join(packets)
+    queue: asyncio.Queue[PacketProtocolMessage] = asyncio.Queue()
+    decoder = PacketDecoder(mode)
+    protocol = DecodingGemProtocol(queue, decoder, send_packet_delay=False)
+    protocol.connection_made(MagicMock())
+    for start in range(0, len(stream), 1000):
+        protocol.data_received(stream[start : start + 1000])
+    protocol.connection_lost(None)
+
+    messages = [await asyncio.wait_for(queue.get(), 30) for _ in range(12)]
+    decoder.close()
+
+    assert isinstance(messages[0], ConnectionMadeMessage)
+    assert isinstance(messages[-1], ConnectionLostMessage)
+    received = messages[1:-1]
+    assert all(isinstance(message, TimedPacketReceivedMessage) for message in received)
+    assert [message.received_at for message in received] == sorted(
+        message.received_at for message in received
+    )
+    assert [message.packet.seconds for message in received] == list(range(1, 11))
+    assert all(
+        message.packet.packet_format is monitor.packet_format for message in received
+    )
+
+
+@pytest.mark.parametrize("mode", [PACKET_DECODING_THREAD, PACKET_DECODING_PROCESS])
+async def test_decoding_protocol_skips_bad_packets(mode: str) -> None:
+    """Test that a packet that is framed but fails to decode is skipped without losing the rest of its batch."""
+    monitor = SimulatedMonitor(1234567, BIN48_NET_TIME)
+    packets = [bytearray(monitor.next_packet()) for _ in range(3)]
+    # An invalid month in the time stamp only shows when the packet is parsed
+    packets[1][-8] = 13
+    packets[1][-1] = sum(packets[1][:-1]) % 256
+    assert frame_packet(packets[1]) is BIN48_NET_TIME
+    queue: asyncio.Queue[PacketProtocolMessage] = asyncio.Queue()
+    decoder = PacketDecoder(mode)
+    protocol = DecodingGemProtocol(queue, decoder, send_packet_delay=False)
+    protocol.connection_made(MagicMock())
+    protocol.data_received(b"".join(packets))
+    protocol.connection_lost(None)
+
+    messages = [await asyncio.wait_for(queue.get(), 30) for _ in range(4)]
+    decoder.close()
+
+    assert isinstance(messages[0], ConnectionMadeMessage)
+    assert [message.packet.seconds for message in messages[1:3]] == [1, 3]
+    assert isinstance(messages[3], ConnectionLostMessage)
+
+
+def test_decode_packets_returns_errors_in_place() -> None:
+    """Test that decoding a batch returns the error of a bad frame in its place."""
+    data = SimulatedMonitor(1234567, BIN48_NET).next_packet()
+
+    packets = decode_packets([(BIN48_NET.type, data), (BIN48_NET.type, b"\xfe\xff")])
+
+    assert isinstance(packets[0], Packet)
+    assert isinstance(packets[1], Exception)
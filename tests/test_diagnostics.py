@@ -0,0 +1,105 @@
+"""Tests for greeneye_monitor diagnostics."""
+from unittest.mock import AsyncMock
+
+import pytest
+from custom_components.greeneye_monitor import CONFIG_SCHEMA
+from custom_components.greeneye_monitor.const import DOMAIN
+from custom_components.greeneye_monitor.diagnostics import (
+    async_get_config_entry_diagnostics,
+)
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers import issue_registry as ir
+
+from .common import connect_monitor
+from .common import setup_greeneye_monitor_component_with_config
+from .common import SINGLE_MONITOR_CONFIG_TEMPERATURE_SENSORS
+from .common import SINGLE_MONITOR_SERIAL_NUMBER
+
+
+async def test_diagnostics_do_not_scan_registries(
+    hass: HomeAssistant, monitors: AsyncMock, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that diagnostics find the config entry's entities, deleted entities, devices, and issues without going through the rest of the registries, and without loading the YAML again."""
+    await setup_greeneye_monitor_component_with_config(
+        hass, SINGLE_MONITOR_CONFIG_TEMPERATURE_SENSORS
+    )
+    await connect_monitor(hass, monitors, SINGLE_MONITOR_SERIAL_NUMBER)
+    entity_registry = er.async_get(hass)
+    for i in range(1000):
+        entry = entity_registry.async_get_or_create("sensor", "other", f"unrelated-{i}")
+        if i % 2:
+            entity_registry.async_remove(entry.entity_id)
+    deleted_entity_id = f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_temperature_2"
+    entity_registry.async_remove(deleted_entity_id)
+    ir.async_create_issue(
+        hass,
+        DOMAIN,
+        f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_temperature_1_excluded",
+        is_fixable=False,
+        severity=ir.IssueSeverity.WARNING,
+        translation_key="entity_excluded",
+    )
+    for i in range(1000):
+        ir.async_create_issue(
+            hass,
+            "other",
+            f"unrelated-{i}",
+            is_fixable=False,
+            severity=ir.IssueSeverity.WARNING,
+            translation_key="unrelated",
+        )
+    await hass.async_block_till_done()
+
+    def fail(*args, **kwargs):
+        raise AssertionError("Registry scanned")
+
+    class UnscannableDict(dict):
+        __iter__ = values = items = keys = fail
+
+    for registry_items in [er.EntityRegistryItems, dr.DeviceRegistryItems]:
+        monkeypatch.setattr(registry_items, "__iter__", fail)
+        monkeypatch.setattr(registry_items, "values", fail)
+        monkeypatch.setattr(registry_items, "items", fail)
+    monkeypatch.setattr(
+        entity_registry,
+        "deleted_entities",
+        UnscannableDict(entity_registry.deleted_entities),
+    )
+    issue_registry = ir.async_get(hass)
+    monkeypatch.setattr(
+        issue_registry, "issues", UnscannableDict(issue_registry.issues)
+    )
+    monkeypatch.setattr(
+        "homeassistant.config.async_hass_config_yaml", AsyncMock(side_effect=fail)
+    )
+
+    (config_entry,) = hass.config_entries.async_entries(DOMAIN)
+    diagnostics = await async_get_config_entry_diagnostics(hass, config_entry)
+
+    assert (
+        diagnostics["yaml"]
+        == CONFIG_SCHEMA(SINGLE_MONITOR_CONFIG_TEMPERATURE_SENSORS)[DOMAIN]
+    )
+    assert (
+        f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_temperature_1"
+        in diagnostics["entities"]
+    )
+    assert all(
+        registry_entry["registry"]["platform"] == DOMAIN
+        for registry_entry in diagnostics["entities"].values()
+    )
+    assert {
+        identifier
+        for device in diagnostics["registries"]["devices"].values()
+        for identifier in device["identifiers"]
+    } >= {(DOMAIN, f"{SINGLE_MONITOR_SERIAL_NUMBER}-temperature-1")}
+    assert [
+        deleted["entity_id"]
+        for deleted in diagnostics["registries"]["deleted_entities"]
+    ] == [deleted_entity_id]
+    assert [issue["issue_id"] for issue in diagnostics["issues"]] == [
+        "remove_yaml",
+        f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_temperature_1_excluded",
+    ]
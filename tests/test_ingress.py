@@ -0,0 +1,146 @@
+"""Tests for greeneye_monitor connections."""
+from __future__ import annotations
+
+import asyncio
+import time
+from unittest.mock import MagicMock
+
+from custom_components.greeneye_monitor.ingress import add_packet_listener
+from custom_components.greeneye_monitor.ingress import get_packet_received_at
+from custom_components.greeneye_monitor.ingress import IngressGemProtocol
+from custom_components.greeneye_monitor.ingress import IngressMonitors
+from custom_components.greeneye_monitor.ingress import PacketListener
+from custom_components.greeneye_monitor.ingress import TimedPacketReceivedMessage
+from siobrultech_protocols.gem.protocol import ConnectionMadeMessage
+from siobrultech_protocols.gem.protocol import PacketProtocolMessage
+
+from .simulator import SimulatedMonitor
+from .simulator import Simulator
+from .simulator import unused_port
+
+
+async def test_packets_stamped_with_arrival() -> None:
+    """Test that each packet carries the arrival time of the chunk of data that completed it."""
+    monitor = SimulatedMonitor(1234567)
+    first, second = monitor.next_packet(), monitor.next_packet()
+    queue: asyncio.Queue[PacketProtocolMessage] = asyncio.Queue()
+    protocol = IngressGemProtocol(queue, send_packet_delay=False)
+    protocol.connection_made(MagicMock())
+
+    before = time.monotonic()
+    protocol.data_received(first + second[:10])
+    between = time.monotonic()
+    protocol.data_received(second[10:])
+    after = time.monotonic()
+
+    assert isinstance(queue.get_nowait(), ConnectionMadeMessage)
+    messages = [queue.get_nowait(), queue.get_nowait()]
+    assert all(isinstance(message, TimedPacketReceivedMessage) for message in messages)
+    assert [message.packet.seconds for message in messages] == [1, 2]
+    assert before <= messages[0].received_at <= between
+    assert between <= messages[1].received_at <= after
+
+
+async def test_arrival_recorded_for_monitor(socket_enabled: None) -> None:
+    """Test that the arrival time of a monitor's packets is recorded for it as they are handled."""
+    server = IngressMonitors(send_packet_delay=False)
+    port = unused_port()
+    await server.start_server(port)
+    simulator = Simulator("127.0.0.1", port, [SimulatedMonitor(1234567)], 100)
+    await simulator.connect()
+    start = time.monotonic()
+    await simulator.run(3)
+    for _ in range(50):
+        await asyncio.sleep(0.1)
+        monitor = server.monitors.get(1234567)
+        if monitor is not None and monitor._last_packet_seconds == 3:
+            break
+    else:
+        raise AssertionError("The last packet never reached the monitor")
+
+    received_at = get_packet_received_at(monitor)
+    assert received_at is not None
+    assert start <= received_at <= time.monotonic()
+    await simulator.close()
+    await server.close()
+
+
+async def test_peer_address_of_shared_connection(socket_enabled: None) -> None:
+    """Test that monitors sending packets over the same connection report the same peer address."""
+    server = IngressMonitors(send_packet_delay=False)
+    port = unused_port()
+    await server.start_server(port)
+    shared = Simulator(
+        "127.0.0.1",
+        port,
+        [SimulatedMonitor(1000001), SimulatedMonitor(1000002)],
+        100,
+        one_connection=True,
+    )
+    other = Simulator("127.0.0.1", port, [SimulatedMonitor(1000003)], 100)
+    for simulator in [shared, other]:
+        await simulator.connect()
+        await simulator.run(2)
+    for _ in range(50):
+        await asyncio.sleep(0.1)
+        if len(server.connected_monitors) == 3:
+            break
+    else:
+        raise AssertionError("The monitors never connected")
+
+    address = server.peer_address(1000001)
+    assert address is not None and address.startswith("127.0.0.1:")
+    assert server.peer_address(1000002) == address
+    assert server.peer_address(1000003) not in (None, address)
+    assert server.peer_address(1000004) is None
+    for simulator in [shared, other]:
+        await simulator.close()
+    await server.close()
+
+
+class RecordingPacketListener(PacketListener):
+    def __init__(self) -> None:
+        self.sizes: list[int] = []
+        self.ended = 0
+
+    def packet_started(self, size: int) -> None:
+        self.sizes.append(size)
+
+    def packet_ended(self) -> None:
+        self.ended += 1
+
+
+async def test_packet_listeners(socket_enabled: None) -> None:
+    """Test that packet listeners are told about each packet once, with the bytes it arrived in."""
+    server = IngressMonitors(send_packet_delay=False)
+    port = unused_port()
+    await server.start_server(port)
+    simulator = Simulator("127.0.0.1", port, [SimulatedMonitor(1234567)], 100)
+    await simulator.connect()
+    await simulator.run(1)
+    for _ in range(50):
+        await asyncio.sleep(0.1)
+        monitor = server.monitors.get(1234567)
+        if monitor is not None and monitor._last_packet_seconds == 1:
+            break
+    else:
+        raise AssertionError("The monitor never connected")
+
+    listener = RecordingPacketListener()
+    add_packet_listener(monitor, listener)
+    bytes_sent = simulator.stats.bytes_sent
+    await simulator.run(3)
+    for _ in range(50):
+        await asyncio.sleep(0.1)
+        if listener.ended == 3:
+            break
+    else:
+        raise AssertionError("The packets never reached the monitor")
+
+    packet_size = (simulator.stats.bytes_sent - bytes_sent) // 3
+    assert len(listener.sizes) == 3
+    # The first also carries the settings the monitor was asked for when it connected
+    assert listener.sizes[0] > packet_size
+    assert listener.sizes[1:] == [packet_size] * 2
+    await simulator.close()
+    await server.close()
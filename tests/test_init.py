@@ -9,6 +9,7 @@ from custom_components.greeneye_monitor import DOMAIN as GREENEYE_MONITOR_DOMAIN
 from custom_components.greeneye_monitor.config_flow import CONFIG_ENTRY_DATA_SCHEMA
 from custom_components.greeneye_monitor.config_flow import CONFIG_ENTRY_OPTIONS_SCHEMA
 from custom_components.greeneye_monitor.config_flow import yaml_to_config_entry
+from custom_components.greeneye_monitor.config_index import ConfigIndex
 from custom_components.greeneye_monitor.const import CONF_MONITORS
 from custom_components.greeneye_monitor.const import CONF_SERIAL_NUMBER
 from custom_components.greeneye_monitor.const import DOMAIN
@@ -375,6 +376,40 @@ async def test_multi_monitor_config(hass: HomeAssistant, monitors: AsyncMock) ->
     assert_temperature_sensor_registered(hass, 3, 1, "GEM 3 temperature 1")
 
 
+async def test_config_index_built_once_for_many_monitors(
+    hass: HomeAssistant, monitors: AsyncMock
+) -> None:
+    """Test that setting up a large fleet of monitors builds the config index once and shares it between platforms."""
+    num_monitors = 40
+    data, options = yaml_to_config_entry(
+        CONFIG_SCHEMA(
+            {
+                DOMAIN: {
+                    CONF_PORT: 7513,
+                    CONF_MONITORS: [
+                        {CONF_SERIAL_NUMBER: f"{serial_number:08}"}
+                        for serial_number in range(1, num_monitors + 1)
+                    ],
+                }
+            }
+        )[DOMAIN]
+    )
+    config_entry = MockConfigEntry(domain=DOMAIN, data=data, options=options)
+
+    with patch.object(
+        ConfigIndex, "__init__", autospec=True, side_effect=ConfigIndex.__init__
+    ) as build_index:
+        await hass.config_entries.async_add(config_entry)
+        await hass.async_block_till_done()
+        for serial_number in range(1, num_monitors + 1):
+            await connect_monitor(hass, monitors, serial_number)
+
+    assert build_index.call_count == 1
+    assert_temperature_sensor_registered(
+        hass, num_monitors, 1, f"GEM {num_monitors} temperature 1"
+    )
+
+
 async def test_setup_and_shutdown(hass: HomeAssistant, monitors: AsyncMock) -> None:
     """Test that the component can set up and shut down cleanly, closing the underlying server on shutdown."""
     monitors.start_server = AsyncMock(return_value=None)
@@ -0,0 +1,254 @@
+"""End-to-end load test of the greeneye_monitor integration against simulated monitors.
+
+Skipped unless GREENEYE_LOAD_TEST is set. The defaults are a quick smoke test. To size
+hardware, raise them with environment variables and show the INFO log to see the
+report, e.g.
+
+    GREENEYE_LOAD_TEST=1 GREENEYE_LOAD_MONITORS=20 GREENEYE_LOAD_RATE=1 \
+        GREENEYE_LOAD_PACKETS=120 pytest --log-cli-level=INFO tests/test_load.py
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import statistics
+import time
+from dataclasses import dataclass
+from dataclasses import field
+
+import pytest
+from custom_components.greeneye_monitor.config_flow import CONFIG_ENTRY_DATA_SCHEMA
+from custom_components.greeneye_monitor.config_flow import CONFIG_ENTRY_OPTIONS_SCHEMA
+from custom_components.greeneye_monitor.const import AUX5_TYPE_CT
+from custom_components.greeneye_monitor.const import CONF_AUX5_TYPE
+from custom_components.greeneye_monitor.const import CONF_MONITORS
+from custom_components.greeneye_monitor.const import CONF_PACKET_DECODING
+from custom_components.greeneye_monitor.const import CONF_SEND_PACKET_DELAY
+from custom_components.greeneye_monitor.const import CONF_SERIAL_NUMBER
+from custom_components.greeneye_monitor.const import DEFAULT_PACKET_DECODING
+from custom_components.greeneye_monitor.const import DOMAIN
+from custom_components.greeneye_monitor.const import PACKET_DECODING_OPTIONS
+from homeassistant.const import CONF_PORT
+from homeassistant.const import EVENT_STATE_CHANGED
+from homeassistant.core import callback
+from homeassistant.core import Event
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity_registry import async_get as get_entity_registry
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from .simulator import make_monitors
+from .simulator import PACKET_FORMATS
+from .simulator import SimulatedMonitor
+from .simulator import Simulator
+from .simulator import unused_port
+from .simulator import voltage_tag
+from .simulator import VOLTAGE_TAG_STEPS
+
+pytestmark = pytest.mark.skipif(
+    not os.environ.get("GREENEYE_LOAD_TEST"),
+    reason="Load tests only run when GREENEYE_LOAD_TEST is set",
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+CONNECT_TIMEOUT = 30
+LOOP_LAG_PROBE_INTERVAL = 0.05
+
+
+@dataclass
+class LoadTestResult:
+    packets_sent: int = 0
+    packets_seen: int = 0
+    latencies: list[float] = field(default_factory=list)
+    loop_lags: list[float] = field(default_factory=list)
+    cpu_seconds: float = 0.0
+    wall_seconds: float = 0.0
+
+    @property
+    def cpu_per_packet(self) -> float:
+        return self.cpu_seconds / max(self.packets_seen, 1)
+
+    def report(self) -> str:
+        def ms(values: list[float], quantile: int) -> str:
+            if len(values) < 2:
+                return "n/a"
+            return f"{statistics.quantiles(values, n=100)[quantile - 1] * 1000:.2f} ms"
+
+        return "\n".join(
+            [
+                f"packets sent/seen:       {self.packets_sent}/{self.packets_seen} in {self.wall_seconds:.1f} s",
+                f"packet-to-state latency: p50 {ms(self.latencies, 50)}, p99 {ms(self.latencies, 99)}, max {max(self.latencies, default=0) * 1000:.2f} ms",
+                f"event loop lag:          p50 {ms(self.loop_lags, 50)}, p99 {ms(self.loop_lags, 99)}, max {max(self.loop_lags, default=0) * 1000:.2f} ms",
+                f"CPU per packet:          {self.cpu_per_packet * 1000:.3f} ms",
+            ]
+        )
+
+
+async def async_run_load_test(
+    hass: HomeAssistant,
+    monitors: list[SimulatedMonitor],
+    packets_per_second: float,
+    packets_per_monitor: int,
+    packet_decoding: str = DEFAULT_PACKET_DECODING,
+) -> LoadTestResult:
+    """Set up the integration for the given simulated monitors, run them, and measure the integration's cost.
+
+    The first packet from each monitor is sent before measurement starts. Latency is
+    measured from the write of a packet to the socket to the state change of its
+    monitor's voltage sensor. CPU time is for the whole process (including the recorder)
+    minus what the simulator itself used.
+    """
+    port = unused_port()
+    serial_numbers = [
+        {CONF_SERIAL_NUMBER: monitor.serial_number} for monitor in monitors
+    ]
+    # ECM-1240 monitors need to be told what their fifth aux channel is
+    monitor_configs = [
+        {CONF_SERIAL_NUMBER: monitor.serial_number, CONF_AUX5_TYPE: AUX5_TYPE_CT}
+        for monitor in monitors
+    ]
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        data=CONFIG_ENTRY_DATA_SCHEMA(
+            {CONF_PORT: port, CONF_MONITORS: monitor_configs}
+        ),
+        options=CONFIG_ENTRY_OPTIONS_SCHEMA(
+            {
+                CONF_SEND_PACKET_DELAY: False,
+                CONF_PACKET_DECODING: packet_decoding,
+                CONF_MONITORS: serial_numbers,
+            }
+        ),
+    )
+    await hass.config_entries.async_add(config_entry)
+    await hass.async_block_till_done()
+
+    result = LoadTestResult()
+    sent_at: dict[int, list[float]] = {
+        monitor.serial_number: [0.0] * VOLTAGE_TAG_STEPS for monitor in monitors
+    }
+    voltage_entities: dict[str, int] = {}
+    all_connected = asyncio.Event()
+    measuring = False
+    entity_registry = get_entity_registry(hass)
+
+    @callback
+    def on_packet_sent(monitor: SimulatedMonitor, now: float) -> None:
+        sent_at[monitor.serial_number][monitor.sequence % VOLTAGE_TAG_STEPS] = now
+
+    @callback
+    def on_state_changed(event: Event) -> None:
+        now = time.perf_counter()
+        entity_id = event.data["entity_id"]
+        if entity_id not in voltage_entities:
+            entry = entity_registry.async_get(entity_id)
+            if entry is None or not entry.unique_id.endswith("-volts-1"):
+                return
+            voltage_entities[entity_id] = int(entry.unique_id.split("-")[0])
+            if len(voltage_entities) == len(monitors):
+                all_connected.set()
+
+        if not measuring:
+            return
+        new_state = event.data["new_state"]
+        try:
+            voltage = float(new_state.state)
+        except (AttributeError, ValueError):
+            return
+        packet_sent_at = sent_at[voltage_entities[entity_id]][voltage_tag(voltage)]
+        result.packets_seen += 1
+        result.latencies.append(now - packet_sent_at)
+
+    async def probe_loop_lag() -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + LOOP_LAG_PROBE_INTERVAL
+            await asyncio.sleep(LOOP_LAG_PROBE_INTERVAL)
+            result.loop_lags.append(loop.time() - expected)
+
+    simulator = Simulator(
+        "127.0.0.1", port, monitors, packets_per_second, on_packet_sent
+    )
+    remove_listener = hass.bus.async_listen(EVENT_STATE_CHANGED, on_state_changed)
+    probe: asyncio.Task[None] | None = None
+    try:
+        # Entities are created from the first packet of each monitor, which is not
+        # representative of steady state, so it is left out of the measurements
+        await simulator.connect()
+        await simulator.run(1)
+        await asyncio.wait_for(all_connected.wait(), CONNECT_TIMEOUT)
+        await hass.async_block_till_done()
+
+        measuring = True
+        probe = asyncio.create_task(probe_loop_lag())
+        packets_start = simulator.stats.packets_sent
+        simulator_cpu_start = simulator.stats.cpu_seconds
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        await simulator.run(packets_per_monitor)
+        # Give the integration one more packet interval to drain its queue
+        await asyncio.sleep(1 / packets_per_second)
+        await hass.async_block_till_done()
+        result.cpu_seconds = (
+            time.process_time()
+            - cpu_start
+            - (simulator.stats.cpu_seconds - simulator_cpu_start)
+        )
+        result.wall_seconds = time.perf_counter() - wall_start
+        result.packets_sent = simulator.stats.packets_sent - packets_start
+    finally:
+        if probe is not None:
+            probe.cancel()
+        remove_listener()
+        await simulator.close()
+        await hass.config_entries.async_unload(config_entry.entry_id)
+        await hass.async_block_till_done()
+
+    return result
+
+
+@pytest.mark.parametrize("packet_decoding", PACKET_DECODING_OPTIONS)
+async def test_load_packet_decoding(
+    hass: HomeAssistant, socket_enabled: None, packet_decoding: str
+) -> None:
+    """Report the event loop lag with packets decoded on the event loop and in each kind of worker, for at least 10 monitors."""
+    num_monitors = max(int(os.environ.get("GREENEYE_LOAD_MONITORS", "10")), 10)
+    packets_per_second = float(os.environ.get("GREENEYE_LOAD_RATE", "10"))
+    packets_per_monitor = int(os.environ.get("GREENEYE_LOAD_PACKETS", "10"))
+
+    result = await async_run_load_test(
+        hass,
+        make_monitors(num_monitors),
+        packets_per_second,
+        packets_per_monitor,
+        packet_decoding,
+    )
+    _LOGGER.info(
+        "Load test report\npacket decoding:         %s\n%s",
+        packet_decoding,
+        result.report(),
+    )
+
+    assert result.packets_sent == num_monitors * packets_per_monitor
+    assert result.packets_seen > 0
+
+
+async def test_load(hass: HomeAssistant, socket_enabled: None) -> None:
+    """Test that packets from simulated monitors reach the state machine, and report the cost of processing them."""
+    num_monitors = int(os.environ.get("GREENEYE_LOAD_MONITORS", "2"))
+    packets_per_second = float(os.environ.get("GREENEYE_LOAD_RATE", "10"))
+    packets_per_monitor = int(os.environ.get("GREENEYE_LOAD_PACKETS", "10"))
+    packet_format = PACKET_FORMATS[os.environ.get("GREENEYE_LOAD_FORMAT", "BIN48-NET")]
+
+    result = await async_run_load_test(
+        hass,
+        make_monitors(num_monitors, packet_format),
+        packets_per_second,
+        packets_per_monitor,
+    )
+    _LOGGER.info("Load test report\n%s", result.report())
+
+    assert result.packets_sent == num_monitors * packets_per_monitor
+    assert result.packets_seen > 0
+    assert all(latency >= 0 for latency in result.latencies)
@@ -0,0 +1,106 @@
+"""Tests for greeneye_monitor number entities."""
+from datetime import timedelta
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+
+import pytest
+from custom_components.greeneye_monitor.const import DOMAIN
+from custom_components.greeneye_monitor.number import SETTING_WRITE_DELAY_SECONDS
+from freezegun.api import FrozenDateTimeFactory
+from homeassistant.components.number import ATTR_VALUE
+from homeassistant.components.number import DOMAIN as NUMBER_DOMAIN
+from homeassistant.components.number import NumberEntity
+from homeassistant.components.number import SERVICE_SET_VALUE
+from homeassistant.const import ATTR_ENTITY_ID
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import entity_registry as er
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+
+from .common import mock_monitor
+from .common import setup_greeneye_monitor_component_with_config
+from .common import SINGLE_MONITOR_CONFIG_POWER_SENSORS
+from .common import SINGLE_MONITOR_SERIAL_NUMBER
+
+
+async def connect_monitor_with_settings(
+    hass: HomeAssistant, monitors: AsyncMock
+) -> MagicMock:
+    """Set up the integration and connect a mock monitor whose channels have a CT type and range."""
+    await setup_greeneye_monitor_component_with_config(
+        hass, SINGLE_MONITOR_CONFIG_POWER_SENSORS
+    )
+    monitor = mock_monitor(SINGLE_MONITOR_SERIAL_NUMBER)
+    for channel in monitor.channels:
+        channel.watts = 100.0
+        channel.amps = 1.0
+        channel.ct_type = 1
+        channel.ct_range = 3
+    monitor.packet_send_interval = timedelta(seconds=5)
+    await monitors.add_monitor(monitor)
+    await hass.async_block_till_done()
+    return monitor
+
+
+async def test_settings_written_only_when_changed(
+    hass: HomeAssistant, monitors: AsyncMock, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that setting entities do not write their state for packets that leave the settings unchanged."""
+    monitor = await connect_monitor_with_settings(hass, monitors)
+
+    write = MagicMock()
+    monkeypatch.setattr(NumberEntity, "async_write_ha_state", write)
+    for channel in monitor.channels:
+        await channel.notify_all_listeners()
+    await monitor.notify_all_listeners()
+    assert write.call_count == 0
+
+    monitor.channels[0].ct_type = 2
+    monitor.channels[1].ct_range = 4
+    monitor.packet_send_interval = timedelta(seconds=10)
+    for channel in monitor.channels:
+        await channel.notify_all_listeners()
+    await monitor.notify_all_listeners()
+    assert write.call_count == 3
+
+
+async def test_only_last_setting_of_burst_sent(
+    hass: HomeAssistant, monitors: AsyncMock, freezer: FrozenDateTimeFactory
+) -> None:
+    """Test that only the last of several values set in quick succession is sent to the monitor, and only once they stop."""
+    monitor = await connect_monitor_with_settings(hass, monitors)
+    sent: list[int] = []
+
+    async def set_packet_send_interval(seconds: int) -> None:
+        sent.append(seconds)
+        monitor.packet_send_interval = timedelta(seconds=seconds)
+
+    monitor.set_packet_send_interval = set_packet_send_interval
+    entity_id = er.async_get(hass).async_get_entity_id(
+        NUMBER_DOMAIN, DOMAIN, f"{SINGLE_MONITOR_SERIAL_NUMBER}-packet_send_interval"
+    )
+
+    async def set_value(value: int) -> None:
+        await hass.services.async_call(
+            NUMBER_DOMAIN,
+            SERVICE_SET_VALUE,
+            {ATTR_ENTITY_ID: entity_id, ATTR_VALUE: value},
+            blocking=True,
+        )
+
+    async def wait(seconds: float) -> None:
+        freezer.tick(timedelta(seconds=seconds))
+        async_fire_time_changed(hass)
+        await hass.async_block_till_done()
+
+    for value in [10, 20, 30]:
+        await set_value(value)
+        await wait(SETTING_WRITE_DELAY_SECONDS / 2)
+    assert sent == []
+
+    await wait(SETTING_WRITE_DELAY_SECONDS)
+    assert sent == [30]
+    assert hass.states.get(entity_id).state == "30.0"
+
+    await set_value(40)
+    await wait(SETTING_WRITE_DELAY_SECONDS)
+    assert sent == [30, 40]
@@ -0,0 +1,106 @@
+"""Tests for greeneye_monitor adaptive packet intervals."""
+from datetime import timedelta
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+
+import pytest
+from custom_components.greeneye_monitor.monitor_stats import MonitorStats
+from custom_components.greeneye_monitor.number import PacketIntervalEntity
+from custom_components.greeneye_monitor.number import SETTING_WRITE_DELAY_SECONDS
+from custom_components.greeneye_monitor.packet_interval import PacketIntervalController
+from freezegun.api import FrozenDateTimeFactory
+from homeassistant.core import HomeAssistant
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+
+from .common import end_packet
+from .common import mock_monitor
+from .common import SINGLE_MONITOR_SERIAL_NUMBER
+from .common import start_packet
+
+
+@pytest.mark.parametrize(
+    "queue_milliseconds,dispatch_milliseconds,power_change,expected",
+    [
+        (500, 1, 0.5, 20),
+        (10, 100, 0.5, 20),
+        (10, 1, 0.5, 5),
+        (10, 1, 0.001, 20),
+        (10, 1, 0.05, 10),
+        (None, None, 0.05, 10),
+    ],
+)
+async def test_next_interval(
+    hass: HomeAssistant,
+    queue_milliseconds: float | None,
+    dispatch_milliseconds: float | None,
+    power_change: float,
+    expected: int,
+) -> None:
+    """Test that the interval stretches under load or when idle, and shrinks when power swings."""
+    monitor = mock_monitor(SINGLE_MONITOR_SERIAL_NUMBER)
+    controller = PacketIntervalController(
+        monitor, MonitorStats(monitor), MagicMock(), min_seconds=2, max_seconds=60
+    )
+    assert (
+        controller.next_interval(
+            10, queue_milliseconds, dispatch_milliseconds, power_change
+        )
+        == expected
+    )
+    assert controller.next_interval(40, 500, None, 0.0) == 60
+    assert controller.next_interval(3, None, None, 0.5) == 2
+
+
+async def test_controller_sets_interval(
+    hass: HomeAssistant, freezer: FrozenDateTimeFactory
+) -> None:
+    """Test that the controller shortens the interval of a monitor whose power swings, through the packet interval entity."""
+    monitor = mock_monitor(SINGLE_MONITOR_SERIAL_NUMBER)
+    monitor.packet_send_interval = timedelta(seconds=10)
+    monitor.set_packet_send_interval = AsyncMock()
+    stats = MonitorStats(monitor)
+    entity = PacketIntervalEntity(hass, monitor)
+    controller = PacketIntervalController(
+        monitor, stats, entity.writer.async_set, min_seconds=2, max_seconds=60
+    )
+
+    for watts in [100.0, 1000.0, 100.0]:
+        await start_packet(monitor)
+        monitor.channels[0].watts = watts
+        await end_packet(monitor)
+    stats.packets += 3
+    freezer.tick(timedelta(seconds=30))
+    stats.async_sample()
+    await hass.async_block_till_done()
+    monitor.set_packet_send_interval.assert_not_awaited()
+
+    freezer.tick(timedelta(seconds=SETTING_WRITE_DELAY_SECONDS))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+    monitor.set_packet_send_interval.assert_awaited_once_with(seconds=5)
+    assert monitor.packet_send_interval == timedelta(seconds=5)
+
+    controller.async_close()
+    assert monitor.listeners == []
+
+
+async def test_power_change_sampled_once_per_packet(hass: HomeAssistant) -> None:
+    """Test that the start of each packet does not count as a power sample."""
+    monitor = mock_monitor(SINGLE_MONITOR_SERIAL_NUMBER)
+    monitor.packet_send_interval = timedelta(seconds=10)
+    stats = MonitorStats(monitor)
+    set_interval = MagicMock()
+    controller = PacketIntervalController(
+        monitor, stats, set_interval, min_seconds=2, max_seconds=60
+    )
+
+    # A steady 5% swing from packet to packet neither stretches nor shrinks the interval
+    for watts in [1000.0, 1050.0, 1000.0, 1050.0]:
+        await start_packet(monitor)
+        monitor.channels[0].watts = watts
+        await end_packet(monitor)
+    stats.packets += 4
+    stats.async_sample()
+    set_interval.assert_not_called()
+
+    controller.async_close()
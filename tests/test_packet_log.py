@@ -0,0 +1,149 @@
+"""Tests for greeneye_monitor packet capture and replay."""
+from __future__ import annotations
+
+import asyncio
+import time
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from custom_components.greeneye_monitor.config_flow import CONFIG_ENTRY_DATA_SCHEMA
+from custom_components.greeneye_monitor.config_flow import CONFIG_ENTRY_OPTIONS_SCHEMA
+from custom_components.greeneye_monitor.const import CONF_MONITORS
+from custom_components.greeneye_monitor.const import CONF_PACKET_LOG
+from custom_components.greeneye_monitor.const import CONF_SEND_PACKET_DELAY
+from custom_components.greeneye_monitor.const import CONF_SERIAL_NUMBER
+from custom_components.greeneye_monitor.const import DOMAIN
+from custom_components.greeneye_monitor.ingress import create_gem_protocol
+from custom_components.greeneye_monitor.packet_log import PACKET_LOG_FILENAME
+from custom_components.greeneye_monitor.packet_log import packet_log_paths
+from custom_components.greeneye_monitor.packet_log import PacketLogWriter
+from custom_components.greeneye_monitor.packet_log import read_packet_log
+from custom_components.greeneye_monitor.packet_log import recording
+from homeassistant.const import CONF_PORT
+from homeassistant.core import HomeAssistant
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+from siobrultech_protocols.gem.packets import BIN32_ABS
+from siobrultech_protocols.gem.protocol import PacketProtocolMessage
+
+from .simulator import read_packet_logs
+from .simulator import Replayer
+from .simulator import SimulatedMonitor
+from .simulator import Simulator
+from .simulator import tag_voltage
+from .simulator import unused_port
+
+SERIAL_NUMBER = 1234567
+
+
+async def test_packet_log_rotates(hass: HomeAssistant, tmp_path: Path) -> None:
+    """Test that the packet log keeps every packet in order across rotations, up to its backup count."""
+    monitor = SimulatedMonitor(SERIAL_NUMBER, BIN32_ABS)
+    path = str(tmp_path / PACKET_LOG_FILENAME)
+    writer = PacketLogWriter(hass, path, max_bytes=1000, backup_count=2)
+    packets = []
+    for index in range(10):
+        packets.append(monitor.next_packet())
+        writer.async_record(1, float(index), packets[-1])
+        await writer.async_flush()
+    await writer.async_close()
+
+    paths = packet_log_paths(path, backup_count=2)
+    assert paths == [f"{path}.2", f"{path}.1", path]
+    records = list(read_packet_logs(paths))
+    assert [record.data for record in records] == packets[-len(records) :]
+    assert len(records) < len(packets)
+    assert [record.timestamp for record in records] == [
+        float(index) for index in range(10 - len(records), 10)
+    ]
+    assert all(record.connection == 1 for record in records)
+
+
+async def test_packet_log_records_data_as_received(
+    hass: HomeAssistant, tmp_path: Path
+) -> None:
+    """Test that each connection logs every chunk of data it receives, at its arrival, including data that does not parse."""
+    path = str(tmp_path / PACKET_LOG_FILENAME)
+    writer = PacketLogWriter(hass, path)
+    create_protocol = recording(create_gem_protocol, writer)
+    queue: asyncio.Queue[PacketProtocolMessage] = asyncio.Queue()
+    first = create_protocol(queue, False)
+    second = create_protocol(queue, False)
+    first.connection_made(MagicMock())
+    second.connection_made(MagicMock())
+    packet = SimulatedMonitor(SERIAL_NUMBER).next_packet()
+
+    before = time.time()
+    first.data_received(b"not a packet")
+    second.data_received(packet[:10])
+    second.data_received(packet[10:])
+    after = time.time()
+    await writer.async_close()
+
+    records = list(read_packet_log(path))
+    assert [(record.connection, record.data) for record in records] == [
+        (1, b"not a packet"),
+        (2, packet[:10]),
+        (2, packet[10:]),
+    ]
+    assert all(before <= record.timestamp <= after for record in records)
+
+
+async def test_record_and_replay(
+    hass: HomeAssistant, socket_enabled: None, tmp_path: Path
+) -> None:
+    """Test that packets received with the packet log enabled can be replayed into the integration."""
+    hass.config.config_dir = str(tmp_path)
+    monitor = SimulatedMonitor(SERIAL_NUMBER)
+    port = unused_port()
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        data=CONFIG_ENTRY_DATA_SCHEMA(
+            {CONF_PORT: port, CONF_MONITORS: [{CONF_SERIAL_NUMBER: SERIAL_NUMBER}]}
+        ),
+        options=CONFIG_ENTRY_OPTIONS_SCHEMA(
+            {
+                CONF_SEND_PACKET_DELAY: False,
+                CONF_PACKET_LOG: True,
+                CONF_MONITORS: [{CONF_SERIAL_NUMBER: SERIAL_NUMBER}],
+            }
+        ),
+    )
+    await hass.config_entries.async_add(config_entry)
+    await hass.async_block_till_done()
+
+    simulator = Simulator("127.0.0.1", port, [monitor], packets_per_second=100)
+    await simulator.connect()
+    await simulator.run(5)
+    await asyncio.sleep(0.1)
+    await simulator.close()
+    await hass.config_entries.async_unload(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    records = list(read_packet_log(hass.config.path(PACKET_LOG_FILENAME)))
+    assert all(record.connection == 1 for record in records)
+    data = b"".join(record.data for record in records)
+    replica = SimulatedMonitor(SERIAL_NUMBER)
+    assert all(replica.next_packet() in data for _ in range(5))
+
+    # Replay into the integration with packet capture turned off
+    hass.config_entries.async_update_entry(
+        config_entry, options={**config_entry.options, CONF_PACKET_LOG: False}
+    )
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    replayer = Replayer("127.0.0.1", port, records, speed=100)
+    await replayer.run()
+    assert replayer.stats.bytes_sent == len(data)
+
+    entity_id = f"sensor.gem_{SERIAL_NUMBER}_voltage_1_voltage"
+    for _ in range(50):
+        await asyncio.sleep(0.1)
+        await hass.async_block_till_done()
+        state = hass.states.get(entity_id)
+        if state and float(state.state) == tag_voltage(5):
+            break
+    else:
+        raise AssertionError(f"Last replayed packet never reached {entity_id}")
+    await replayer.close()
+    await hass.config_entries.async_unload(config_entry.entry_id)
+    await hass.async_block_till_done()
@@ -1,16 +1,64 @@
 """Tests for greeneye_monitor sensors."""
+import time
+from datetime import datetime
+from datetime import timedelta
 from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+from unittest.mock import patch
 
+import pytest
+from custom_components.greeneye_monitor import CONFIG_SCHEMA
+from custom_components.greeneye_monitor.config_flow import CONFIG_ENTRY_DATA_SCHEMA
+from custom_components.greeneye_monitor.config_flow import CONFIG_ENTRY_OPTIONS_SCHEMA
+from custom_components.greeneye_monitor.config_flow import SIGNIFICANT_CHANGE_SCHEMA
+from custom_components.greeneye_monitor.config_flow import yaml_to_config_entry
+from custom_components.greeneye_monitor.const import AUX5_TYPE_CT
+from custom_components.greeneye_monitor.const import CONF_ABSOLUTE
+from custom_components.greeneye_monitor.const import CONF_AUX5_TYPE
+from custom_components.greeneye_monitor.const import CONF_ENERGY_STATISTICS
+from custom_components.greeneye_monitor.const import CONF_FLAT_DEVICES
+from custom_components.greeneye_monitor.const import CONF_LAZY_ENTITIES
+from custom_components.greeneye_monitor.const import CONF_MAX_SILENCE
+from custom_components.greeneye_monitor.const import CONF_MONITORS
+from custom_components.greeneye_monitor.const import CONF_POWER_WINDOW_INTERVAL
+from custom_components.greeneye_monitor.const import CONF_SERIAL_NUMBER
+from custom_components.greeneye_monitor.const import CONF_SIGNIFICANT_CHANGE
+from custom_components.greeneye_monitor.const import CONF_TEMPERATURE
+from custom_components.greeneye_monitor.const import DEVICE_TYPE_CURRENT_TRANSFORMER
 from custom_components.greeneye_monitor.const import DOMAIN
+from custom_components.greeneye_monitor.const import make_device_info
+from custom_components.greeneye_monitor.const import make_monitor_device_info
+from custom_components.greeneye_monitor.ingress import set_packet_received_at
+from custom_components.greeneye_monitor.monitor_stats import async_get_monitor_stats
+from custom_components.greeneye_monitor.monitor_stats import LatencyHistogram
+from custom_components.greeneye_monitor.monitor_stats import STATS_SAMPLE_INTERVAL
+from custom_components.greeneye_monitor.power_window import PowerWindow
 from custom_components.greeneye_monitor.sensor import DATA_PULSES
 from custom_components.greeneye_monitor.sensor import DATA_WATT_SECONDS
+from custom_components.greeneye_monitor.sensor import DeferredEntities
+from custom_components.greeneye_monitor.sensor import MonitorStatsSensor
+from custom_components.greeneye_monitor.state_writer import FLUSH_DELAY_SECONDS
+from custom_components.greeneye_monitor.state_writer import (
+    OVERLOAD_FLUSH_DELAY_SECONDS,
+)
+from freezegun.api import FrozenDateTimeFactory
+from greeneye.monitor import Aux
+from greeneye.monitor import Channel
+from greeneye.monitor import MonitorType
+from homeassistant.const import CONF_PORT
 from homeassistant.const import STATE_UNKNOWN
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers import device_registry as dr
 from homeassistant.helpers.entity_registry import async_get as get_entity_registry
 from homeassistant.helpers.entity_registry import RegistryEntryDisabler
+from homeassistant.util import dt as dt_util
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+from siobrultech_protocols.gem.packets import PacketFormatType
 
 from .common import connect_monitor
+from .common import end_packet
+from .common import mock_monitor
 from .common import MULTI_MONITOR_CONFIG
 from .common import setup_greeneye_monitor_component_with_config
 from .common import SINGLE_MONITOR_CONFIG_POWER_SENSORS
@@ -18,6 +66,7 @@ from .common import SINGLE_MONITOR_CONFIG_PULSE_COUNTERS
 from .common import SINGLE_MONITOR_CONFIG_TEMPERATURE_SENSORS
 from .common import SINGLE_MONITOR_CONFIG_VOLTAGE_SENSORS
 from .common import SINGLE_MONITOR_SERIAL_NUMBER
+from .common import start_packet
 from .conftest import assert_sensor_state
 
 
@@ -71,6 +120,22 @@ async def test_gem_device_created(hass: HomeAssistant, monitors: AsyncMock) -> N
     assert gem.name == f"GEM {SINGLE_MONITOR_SERIAL_NUMBER}"
 
 
+def test_device_info_shared() -> None:
+    """Test that the DeviceInfo of each device of a monitor is built once and shared."""
+    monitor = mock_monitor(SINGLE_MONITOR_SERIAL_NUMBER)
+    device_info = make_device_info(monitor, DEVICE_TYPE_CURRENT_TRANSFORMER, 0)
+    assert device_info["name"] == f"GEM {SINGLE_MONITOR_SERIAL_NUMBER} channel 1"
+    assert make_device_info(monitor, DEVICE_TYPE_CURRENT_TRANSFORMER, 0) is device_info
+    other_channel = make_device_info(monitor, DEVICE_TYPE_CURRENT_TRANSFORMER, 1)
+    assert other_channel is not device_info
+    other_monitor = mock_monitor(SINGLE_MONITOR_SERIAL_NUMBER)
+    assert (
+        make_device_info(other_monitor, DEVICE_TYPE_CURRENT_TRANSFORMER, 0)
+        is not device_info
+    )
+    assert make_monitor_device_info(monitor) is make_monitor_device_info(monitor)
+
+
 async def test_sensors_created_during_setup_if_monitor_already_connected(
     hass: HomeAssistant, monitors: AsyncMock
 ) -> None:
@@ -116,11 +181,203 @@ async def test_updates_state_when_sensor_pushes(
 
     monitor.voltage_sensor.voltage = 119.8
     await monitor.voltage_sensor.notify_all_listeners()
+    await monitor.notify_all_listeners()
     assert_sensor_state(
         hass, f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_voltage_1", "119.8"
     )
 
 
+async def test_state_writes_wait_for_end_of_packet(
+    hass: HomeAssistant, monitors: AsyncMock
+) -> None:
+    """Test that state writes from a packet are held until the monitor signals the end of the packet, then written together."""
+    await setup_greeneye_monitor_component_with_config(
+        hass, SINGLE_MONITOR_CONFIG_TEMPERATURE_SENSORS
+    )
+    monitor = await connect_monitor(hass, monitors, SINGLE_MONITOR_SERIAL_NUMBER)
+    for temperature_sensor in monitor.temperature_sensors:
+        temperature_sensor.temperature = 50.0
+        await temperature_sensor.notify_all_listeners()
+
+    assert_sensor_state(
+        hass, f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_temperature_1", "0.0"
+    )
+    assert_sensor_state(
+        hass, f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_temperature_8", "0.0"
+    )
+
+    await monitor.notify_all_listeners()
+    assert_sensor_state(
+        hass, f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_temperature_1", "10.0"
+    )
+    assert_sensor_state(
+        hass, f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_temperature_8", "10.0"
+    )
+
+
+async def test_state_writes_flushed_without_end_of_packet(
+    hass: HomeAssistant, monitors: AsyncMock
+) -> None:
+    """Test that a pending state write is still made if the monitor never signals the end of a packet."""
+    await setup_greeneye_monitor_component_with_config(
+        hass, SINGLE_MONITOR_CONFIG_TEMPERATURE_SENSORS
+    )
+    monitor = await connect_monitor(hass, monitors, SINGLE_MONITOR_SERIAL_NUMBER)
+    monitor.temperature_sensors[0].temperature = 50.0
+    await monitor.temperature_sensors[0].notify_all_listeners()
+    assert_sensor_state(
+        hass, f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_temperature_1", "0.0"
+    )
+
+    async_fire_time_changed(
+        hass, dt_util.utcnow() + timedelta(seconds=FLUSH_DELAY_SECONDS)
+    )
+    await hass.async_block_till_done()
+    assert_sensor_state(
+        hass, f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_temperature_1", "10.0"
+    )
+
+
+async def test_unchanged_states_not_written(
+    hass: HomeAssistant, monitors: AsyncMock
+) -> None:
+    """Test that a packet writes only the entities whose state changed, in one batch, without arming a timer."""
+    await setup_greeneye_monitor_component_with_config(
+        hass, SINGLE_MONITOR_CONFIG_TEMPERATURE_SENSORS
+    )
+    monitor = await connect_monitor(hass, monitors, SINGLE_MONITOR_SERIAL_NUMBER)
+    stats = async_get_monitor_stats(hass, monitor)
+
+    async def receive_packet(temperatures: list[float]) -> None:
+        await start_packet(monitor)
+        for temperature_sensor, temperature in zip(
+            monitor.temperature_sensors, temperatures
+        ):
+            temperature_sensor.temperature = temperature
+            await temperature_sensor.notify_all_listeners()
+        await end_packet(monitor)
+
+    with patch(
+        "custom_components.greeneye_monitor.state_writer.async_call_later"
+    ) as call_later:
+        writes = stats.writes
+        await receive_packet([50.0] * 8)
+        assert stats.writes - writes == 8
+
+        writes = stats.writes
+        await receive_packet([50.0] * 8)
+        assert stats.writes - writes == 0
+        assert stats.filtered_writes == 8
+
+        writes = stats.writes
+        await receive_packet([68.0] + [50.0] * 7)
+        assert stats.writes - writes == 1
+        assert_sensor_state(
+            hass, f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_temperature_1", "20.0"
+        )
+
+    call_later.assert_not_called()
+
+
+async def test_state_writes_merged_under_backlog(
+    hass: HomeAssistant, monitors: AsyncMock, freezer: FrozenDateTimeFactory
+) -> None:
+    """Test that while packets queue for the event loop, instantaneous sensors are written only with their latest value."""
+    await setup_greeneye_monitor_component_with_config(
+        hass, SINGLE_MONITOR_CONFIG_TEMPERATURE_SENSORS
+    )
+    monitor = await connect_monitor(hass, monitors, SINGLE_MONITOR_SERIAL_NUMBER)
+    stats = async_get_monitor_stats(hass, monitor)
+    entity_id = f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_temperature_1"
+
+    async def receive_packet(temperature: float, queued: timedelta) -> None:
+        set_packet_received_at(monitor, time.monotonic() - queued.total_seconds())
+        await start_packet(monitor)
+        monitor.temperature_sensors[0].temperature = temperature
+        await monitor.temperature_sensors[0].notify_all_listeners()
+        await end_packet(monitor)
+
+    for temperature in [50.0, 68.0, 86.0]:
+        await receive_packet(temperature, timedelta(seconds=5))
+    assert_sensor_state(hass, entity_id, "0.0")
+    assert stats.dropped_writes == 2
+
+    freezer.tick(timedelta(seconds=OVERLOAD_FLUSH_DELAY_SECONDS))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+    assert_sensor_state(hass, entity_id, "30.0")
+
+    await receive_packet(104.0, timedelta(milliseconds=10))
+    assert_sensor_state(hass, entity_id, "40.0")
+    assert stats.dropped_writes == 2
+
+
+async def test_idle_channel_does_not_hold_state_writes(
+    hass: HomeAssistant, monitors: AsyncMock
+) -> None:
+    """Test that packets handled promptly are written at the end of each packet, even while channel 1 is idle."""
+    await setup_greeneye_monitor_component_with_config(
+        hass, SINGLE_MONITOR_CONFIG_TEMPERATURE_SENSORS
+    )
+    monitor = await connect_monitor(hass, monitors, SINGLE_MONITOR_SERIAL_NUMBER)
+    # Channel 1 has not changed for an hour, so its timestamp says nothing about the
+    # queue
+    monitor.channels[0].timestamp = datetime.now() - timedelta(hours=1)
+    stats = async_get_monitor_stats(hass, monitor)
+    entity_id = f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_temperature_1"
+
+    for temperature in [50.0, 68.0, 86.0]:
+        set_packet_received_at(monitor, time.monotonic() - 0.01)
+        await start_packet(monitor)
+        monitor.temperature_sensors[0].temperature = temperature
+        await monitor.temperature_sensors[0].notify_all_listeners()
+        await end_packet(monitor)
+        assert_sensor_state(hass, entity_id, f"{(temperature - 32) * 5 / 9:.1f}")
+
+    assert stats.dropped_writes == 0
+
+
+async def test_significant_change_filter(
+    hass: HomeAssistant, monitors: AsyncMock, freezer: FrozenDateTimeFactory
+) -> None:
+    """Test that changes smaller than the configured significant change are not written until the max silence time has passed."""
+    data, options = yaml_to_config_entry(
+        CONFIG_SCHEMA(SINGLE_MONITOR_CONFIG_TEMPERATURE_SENSORS)[DOMAIN]
+    )
+    options[CONF_SIGNIFICANT_CHANGE] = SIGNIFICANT_CHANGE_SCHEMA(
+        {CONF_TEMPERATURE: {CONF_ABSOLUTE: 10.0}, CONF_MAX_SILENCE: 60}
+    )
+    config_entry = MockConfigEntry(domain=DOMAIN, data=data, options=options)
+    await hass.config_entries.async_add(config_entry)
+    await hass.async_block_till_done()
+    monitor = await connect_monitor(hass, monitors, SINGLE_MONITOR_SERIAL_NUMBER)
+    temperature_sensor = monitor.temperature_sensors[0]
+
+    # 32F -> 50F is significant
+    temperature_sensor.temperature = 50.0
+    await temperature_sensor.notify_all_listeners()
+    await monitor.notify_all_listeners()
+    assert_sensor_state(
+        hass, f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_temperature_1", "10.0"
+    )
+
+    # 50F -> 59F is not
+    temperature_sensor.temperature = 59.0
+    await temperature_sensor.notify_all_listeners()
+    await monitor.notify_all_listeners()
+    assert_sensor_state(
+        hass, f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_temperature_1", "10.0"
+    )
+
+    # Unless it has been quiet for too long
+    freezer.tick(timedelta(seconds=60))
+    await temperature_sensor.notify_all_listeners()
+    await monitor.notify_all_listeners()
+    assert_sensor_state(
+        hass, f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_temperature_1", "15.0"
+    )
+
+
 async def test_power_sensor_initially_unknown(
     hass: HomeAssistant, monitors: AsyncMock
 ) -> None:
@@ -155,6 +412,7 @@ async def test_power_sensor(hass: HomeAssistant, monitors: AsyncMock) -> None:
     monitor.channels[1].watts = 120.0
     await monitor.channels[0].notify_all_listeners()
     await monitor.channels[1].notify_all_listeners()
+    await monitor.notify_all_listeners()
     assert_sensor_state(
         hass,
         f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_channel_1",
@@ -171,6 +429,66 @@ async def test_power_sensor(hass: HomeAssistant, monitors: AsyncMock) -> None:
     )
 
 
+async def test_power_window_sensors(
+    hass: HomeAssistant, monitors: AsyncMock, freezer: FrozenDateTimeFactory
+) -> None:
+    """Test that the power window sensors report the minimum, maximum, and time-weighted mean power at the end of each window."""
+    freezer.move_to("2023-08-01 10:00:00+00:00")
+    data, options = yaml_to_config_entry(
+        CONFIG_SCHEMA(SINGLE_MONITOR_CONFIG_POWER_SENSORS)[DOMAIN]
+    )
+    options[CONF_POWER_WINDOW_INTERVAL] = 1
+    config_entry = MockConfigEntry(domain=DOMAIN, data=data, options=options)
+    await hass.config_entries.async_add(config_entry)
+    await hass.async_block_till_done()
+    monitor = await connect_monitor(hass, monitors, SINGLE_MONITOR_SERIAL_NUMBER)
+    assert_sensor_state(
+        hass,
+        f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_channel_1_mean_power",
+        STATE_UNKNOWN,
+    )
+
+    channel = monitor.channels[0]
+    for watts in [100.0, 400.0, 100.0]:
+        channel.watts = watts
+        await channel.notify_all_listeners()
+        await monitor.notify_all_listeners()
+        freezer.tick(timedelta(seconds=15))
+
+    freezer.move_to("2023-08-01 10:01:00+00:00")
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+    assert_sensor_state(
+        hass,
+        f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_channel_1_minimum_power",
+        "100.0",
+    )
+    assert_sensor_state(
+        hass,
+        f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_channel_1_maximum_power",
+        "400.0",
+    )
+    assert_sensor_state(
+        hass, f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_channel_1_mean_power", "175.0"
+    )
+
+    # A window is let go once all of its sensors are removed
+    listeners = len(channel.listeners)
+    for statistic in ["minimum", "maximum", "mean"]:
+        await disable_entity(
+            hass,
+            f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_channel_1_{statistic}_power",
+        )
+    assert len(channel.listeners) == listeners - 1
+    with patch.object(PowerWindow, "async_end_window", autospec=True) as end_window:
+        freezer.move_to("2023-08-01 10:02:00+00:00")
+        async_fire_time_changed(hass)
+        await hass.async_block_till_done()
+    ended = [call.args[0]._channel for call in end_window.call_args_list]
+    assert channel not in ended
+    assert monitor.channels[1] in ended
+
+
 async def test_energy_sensor(hass: HomeAssistant, monitors: AsyncMock) -> None:
     """Test that an energy sensor reports its values correctly, including handling net metering."""
     await setup_greeneye_monitor_component_with_config(
@@ -181,6 +499,7 @@ async def test_energy_sensor(hass: HomeAssistant, monitors: AsyncMock) -> None:
     monitor.channels[1].watts = 120.0
     await monitor.channels[0].notify_all_listeners()
     await monitor.channels[1].notify_all_listeners()
+    await monitor.notify_all_listeners()
     assert_sensor_state(
         hass, f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_channel_1_energy", "42"
     )
@@ -191,6 +510,114 @@ async def test_energy_sensor(hass: HomeAssistant, monitors: AsyncMock) -> None:
     )
 
 
+async def test_energy_statistics(
+    hass: HomeAssistant, monitors: AsyncMock, freezer: FrozenDateTimeFactory
+) -> None:
+    """Test that hourly energy statistics are imported from counter deltas, resuming from the last imported row."""
+    freezer.move_to("2023-08-01 10:30:00+00:00")
+    data, options = yaml_to_config_entry(
+        CONFIG_SCHEMA(SINGLE_MONITOR_CONFIG_POWER_SENSORS)[DOMAIN]
+    )
+    options[CONF_ENERGY_STATISTICS] = True
+    config_entry = MockConfigEntry(domain=DOMAIN, data=data, options=options)
+    await hass.config_entries.async_add(config_entry)
+    await hass.async_block_till_done()
+
+    monitor = mock_monitor(SINGLE_MONITOR_SERIAL_NUMBER)
+    for channel in monitor.channels:
+        channel.absolute_watt_seconds = None
+    set_kilowatt_hours(monitor.channels[0], 10, 0)
+    # Channel 2 is net metered, and already has statistics
+    set_kilowatt_hours(monitor.channels[1], 10, 31)
+    channel_2_id = f"{DOMAIN}:{SINGLE_MONITOR_SERIAL_NUMBER}_channel_2_energy"
+    with patch(
+        "custom_components.greeneye_monitor.energy_statistics.get_last_statistics",
+        side_effect=lambda hass, number, statistic_id, convert_units, types: {
+            channel_2_id: [{"state": -50.0, "sum": 100.0}]
+        }
+        if statistic_id == channel_2_id
+        else {},
+    ):
+        await monitors.add_monitor(monitor)
+        await hass.async_block_till_done()
+
+    set_kilowatt_hours(monitor.channels[0], 12, 0)
+    set_kilowatt_hours(monitor.channels[1], 11, 33)
+    with patch(
+        "custom_components.greeneye_monitor.energy_statistics.async_add_external_statistics"
+    ) as add_statistics:
+        freezer.move_to("2023-08-01 11:00:00+00:00")
+        async_fire_time_changed(hass)
+        await hass.async_block_till_done()
+
+    rows = {
+        call.args[1]["statistic_id"]: call.args[2]
+        for call in add_statistics.call_args_list
+    }
+    hour_start = dt_util.parse_datetime("2023-08-01 10:00:00+00:00")
+    assert rows == {
+        f"{DOMAIN}:{SINGLE_MONITOR_SERIAL_NUMBER}_channel_1_energy": [
+            {"start": hour_start, "state": 12.0, "sum": 2.0}
+        ],
+        channel_2_id: [{"start": hour_start, "state": -55.0, "sum": 95.0}],
+    }
+
+
+async def test_energy_statistics_net_metered(
+    hass: HomeAssistant, monitors: AsyncMock, freezer: FrozenDateTimeFactory
+) -> None:
+    """Test that the energy sum of a net metered channel falls while it produces, and that only the absolute counter resets."""
+    freezer.move_to("2023-08-01 10:30:00+00:00")
+    data, options = yaml_to_config_entry(
+        CONFIG_SCHEMA(SINGLE_MONITOR_CONFIG_POWER_SENSORS)[DOMAIN]
+    )
+    options[CONF_ENERGY_STATISTICS] = True
+    config_entry = MockConfigEntry(domain=DOMAIN, data=data, options=options)
+    await hass.config_entries.async_add(config_entry)
+    await hass.async_block_till_done()
+
+    monitor = mock_monitor(SINGLE_MONITOR_SERIAL_NUMBER)
+    monitor.packet_format = PacketFormatType.BIN48_NET
+    for channel in monitor.channels:
+        channel.absolute_watt_seconds = None
+    channel = monitor.channels[1]
+    set_kilowatt_hours(channel, 2, 0)
+    with patch(
+        "custom_components.greeneye_monitor.energy_statistics.get_last_statistics",
+        return_value={},
+    ):
+        await monitors.add_monitor(monitor)
+        await hass.async_block_till_done()
+
+    counter_max = 2**40 - 1
+    hours = [
+        # Producing 3 kWh takes the net counter from 2 below zero
+        (5 * 3600000, 3 * 3600000),
+        # Consuming 4 kWh takes it back above zero
+        (9 * 3600000, 3 * 3600000),
+        # The absolute counter wraps while consuming 1.5 kWh
+        (counter_max + 1 - 3600000, 3 * 3600000),
+        (1800000, 3 * 3600000),
+        # A reset of both counters, then 0.25 kWh consumed
+        (900000, 0),
+    ]
+    sums = []
+    with patch(
+        "custom_components.greeneye_monitor.energy_statistics.async_add_external_statistics"
+    ) as add_statistics:
+        for hour, (absolute, polarized) in enumerate(hours):
+            channel.absolute_watt_seconds = absolute
+            channel.polarized_watt_seconds = polarized
+            freezer.move_to(f"2023-08-01 {11 + hour}:00:00+00:00")
+            async_fire_time_changed(hass)
+            await hass.async_block_till_done()
+            (row,) = add_statistics.call_args.args[2]
+            sums.append(row["sum"])
+
+    used = [-3, 4, (counter_max + 1) / 3600000 - 10, 1.5, 0.25]
+    assert sums == pytest.approx([sum(used[: index + 1]) for index in range(len(used))])
+
+
 async def test_pulse_counter_initially_unknown(
     hass: HomeAssistant, monitors: AsyncMock
 ) -> None:
@@ -205,6 +632,7 @@ async def test_pulse_counter_initially_unknown(
     await monitor.pulse_counters[0].notify_all_listeners()
     await monitor.pulse_counters[1].notify_all_listeners()
     await monitor.pulse_counters[2].notify_all_listeners()
+    await monitor.notify_all_listeners()
     assert_sensor_state(
         hass,
         f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_pulse_counter_1_rate",
@@ -259,6 +687,70 @@ async def test_pulse_counter(hass: HomeAssistant, monitors: AsyncMock) -> None:
     )
 
 
+async def test_pulse_count_sensor_updates_at_aligned_times(
+    hass: HomeAssistant, monitors: AsyncMock, freezer: FrozenDateTimeFactory
+) -> None:
+    """Test that cumulative sensors only write their state at clock-aligned flush times."""
+    freezer.move_to("2023-08-01 10:02:00+00:00")
+    await setup_greeneye_monitor_component_with_config(
+        hass, SINGLE_MONITOR_CONFIG_PULSE_COUNTERS
+    )
+    monitor = await connect_monitor(hass, monitors, SINGLE_MONITOR_SERIAL_NUMBER)
+    assert_sensor_state(
+        hass, f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_pulse_counter_1", "1000.0"
+    )
+
+    monitor.pulse_counters[0].pulses = 1500
+    await monitor.pulse_counters[0].notify_all_listeners()
+    await monitor.notify_all_listeners()
+    assert_sensor_state(
+        hass, f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_pulse_counter_1", "1000.0"
+    )
+
+    freezer.move_to("2023-08-01 10:04:59+00:00")
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+    assert_sensor_state(
+        hass, f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_pulse_counter_1", "1500.0"
+    )
+    state = hass.states.get(
+        f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_pulse_counter_1"
+    )
+    assert state is not None
+    assert state.last_updated < dt_util.parse_datetime("2023-08-01 10:05:00+00:00")
+
+
+async def test_cumulative_sensor_first_value_written_immediately(
+    hass: HomeAssistant, monitors: AsyncMock, freezer: FrozenDateTimeFactory
+) -> None:
+    """Test that a cumulative sensor added without a value writes its first one straight away, and only unchanged values are skipped at flush times."""
+    freezer.move_to("2023-08-01 10:02:00+00:00")
+    await setup_greeneye_monitor_component_with_config(
+        hass, SINGLE_MONITOR_CONFIG_PULSE_COUNTERS
+    )
+    monitor = mock_monitor(SINGLE_MONITOR_SERIAL_NUMBER)
+    monitor.pulse_counters[0].pulses = None
+    await monitors.add_monitor(monitor)
+    await hass.async_block_till_done()
+    entity_id = f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_pulse_counter_1"
+    assert_sensor_state(hass, entity_id, STATE_UNKNOWN)
+
+    monitor.pulse_counters[0].pulses = 1500
+    await monitor.pulse_counters[0].notify_all_listeners()
+    await hass.async_block_till_done()
+    assert_sensor_state(hass, entity_id, "1500.0")
+    state = hass.states.get(entity_id)
+    assert state is not None
+
+    await monitor.pulse_counters[0].notify_all_listeners()
+    freezer.move_to("2023-08-01 10:04:59+00:00")
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+    unchanged_state = hass.states.get(entity_id)
+    assert unchanged_state is not None
+    assert unchanged_state.last_updated == state.last_updated
+
+
 async def test_temperature_sensor(hass: HomeAssistant, monitors: AsyncMock) -> None:
     """Test that a temperature sensor reports its values properly, including proper handling of when its native unit is different from that configured in hass."""
     await setup_greeneye_monitor_component_with_config(
@@ -272,6 +764,154 @@ async def test_temperature_sensor(hass: HomeAssistant, monitors: AsyncMock) -> N
     )
 
 
+async def test_lazy_entities(hass: HomeAssistant, monitors: AsyncMock) -> None:
+    """Test that the entities of channels and temperature sensors are only added once they report data, unless they were added before."""
+    data, options = yaml_to_config_entry(
+        CONFIG_SCHEMA(SINGLE_MONITOR_CONFIG_TEMPERATURE_SENSORS)[DOMAIN]
+    )
+    options[CONF_LAZY_ENTITIES] = True
+    config_entry = MockConfigEntry(domain=DOMAIN, data=data, options=options)
+    await hass.config_entries.async_add(config_entry)
+    await hass.async_block_till_done()
+    entity_registry = get_entity_registry(hass)
+    entity_registry.async_get_or_create(
+        "sensor", DOMAIN, f"{SINGLE_MONITOR_SERIAL_NUMBER}-current-3"
+    )
+
+    def is_waiting(sensor: MagicMock) -> bool:
+        return any(
+            isinstance(getattr(listener, "__self__", None), DeferredEntities)
+            for listener in sensor.listeners
+        )
+
+    def has_entity(unique_id: str) -> bool:
+        return (
+            entity_registry.async_get_entity_id(
+                "sensor", DOMAIN, f"{SINGLE_MONITOR_SERIAL_NUMBER}-{unique_id}"
+            )
+            is not None
+        )
+
+    monitor = mock_monitor(SINGLE_MONITOR_SERIAL_NUMBER)
+    for channel in monitor.channels:
+        channel.amps = None
+    monitor.channels[1].watts = 5.0
+    for temperature_sensor in monitor.temperature_sensors[1:]:
+        temperature_sensor.temperature = None
+    # A probe reading exactly 0 is connected
+    monitor.temperature_sensors[2].temperature = 0.0
+    await monitors.add_monitor(monitor)
+    await hass.async_block_till_done()
+
+    assert not has_entity("current-1")
+    assert has_entity("current-2")
+    assert has_entity("current-3")
+    assert has_entity("temp-1")
+    assert not has_entity("temp-2")
+    assert has_entity("temp-3")
+    assert is_waiting(monitor.temperature_sensors[1])
+
+    channel = monitor.channels[0]
+    await channel.notify_all_listeners()
+    await hass.async_block_till_done()
+    assert not has_entity("current-1")
+
+    channel.watts = 100.0
+    await channel.notify_all_listeners()
+    await hass.async_block_till_done()
+    assert has_entity("current-1")
+    assert has_entity("amps-1")
+    assert has_entity("energy-1")
+    assert not is_waiting(channel)
+
+    temperature_sensor = monitor.temperature_sensors[1]
+    temperature_sensor.temperature = 70.0
+    await temperature_sensor.notify_all_listeners()
+    await hass.async_block_till_done()
+    assert has_entity("temp-2")
+    assert not is_waiting(temperature_sensor)
+
+
+async def test_flat_devices(hass: HomeAssistant, monitors: AsyncMock) -> None:
+    """Test that with flat devices every entity belongs to the monitor's device, keeping its entity ID, and that devices from before are removed."""
+    data, options = yaml_to_config_entry(
+        CONFIG_SCHEMA(SINGLE_MONITOR_CONFIG_TEMPERATURE_SENSORS)[DOMAIN]
+    )
+    options[CONF_FLAT_DEVICES] = True
+    config_entry = MockConfigEntry(domain=DOMAIN, data=data, options=options)
+    config_entry.add_to_hass(hass)
+    device_registry = dr.async_get(hass)
+    monitor_device = device_registry.async_get_or_create(
+        config_entry_id=config_entry.entry_id,
+        identifiers={(DOMAIN, f"{SINGLE_MONITOR_SERIAL_NUMBER}")},
+    )
+    channel_device = device_registry.async_get_or_create(
+        config_entry_id=config_entry.entry_id,
+        identifiers={(DOMAIN, f"{SINGLE_MONITOR_SERIAL_NUMBER}-channel-1")},
+        via_device=(DOMAIN, f"{SINGLE_MONITOR_SERIAL_NUMBER}"),
+    )
+    entity_registry = get_entity_registry(hass)
+    entry = entity_registry.async_get_or_create(
+        "sensor",
+        DOMAIN,
+        f"{SINGLE_MONITOR_SERIAL_NUMBER}-current-1",
+        device_id=channel_device.id,
+    )
+
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    await connect_monitor(hass, monitors, SINGLE_MONITOR_SERIAL_NUMBER)
+
+    assert [
+        device.id
+        for device in dr.async_entries_for_config_entry(
+            device_registry, config_entry.entry_id
+        )
+    ] == [monitor_device.id]
+    assert entity_registry.async_get(entry.entity_id).device_id == monitor_device.id
+    assert_sensor_state(
+        hass, f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_temperature_1", "0.0"
+    )
+
+
+async def test_ecm_aux_sensors(hass: HomeAssistant, monitors: AsyncMock) -> None:
+    """Test that ECMs get sensors for their channels and aux channels."""
+    monitor_configs = [
+        {CONF_SERIAL_NUMBER: SINGLE_MONITOR_SERIAL_NUMBER, CONF_AUX5_TYPE: AUX5_TYPE_CT}
+    ]
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        data=CONFIG_ENTRY_DATA_SCHEMA(
+            {CONF_PORT: 7513, CONF_MONITORS: monitor_configs}
+        ),
+        options=CONFIG_ENTRY_OPTIONS_SCHEMA(
+            {
+                CONF_MONITORS: [{CONF_SERIAL_NUMBER: SINGLE_MONITOR_SERIAL_NUMBER}],
+            }
+        ),
+    )
+    await hass.config_entries.async_add(config_entry)
+    await hass.async_block_till_done()
+
+    monitor = mock_monitor(SINGLE_MONITOR_SERIAL_NUMBER)
+    monitor.type = MonitorType.ECM_1240
+    monitor.channels = monitor.channels[:2]
+    monitor.temperature_sensors = []
+    monitor.aux = [
+        *(Channel(monitor, i, net_metering=False, is_aux=True) for i in range(0, 4)),
+        Aux(monitor, 4),
+    ]
+    await monitors.add_monitor(monitor)
+    await hass.async_block_till_done()
+
+    unique_ids = {
+        entry.unique_id.removeprefix(f"{SINGLE_MONITOR_SERIAL_NUMBER}-")
+        for entry in get_entity_registry(hass).entities.values()
+    }
+    assert {"current-1", "current-2", "aux_current-1", "aux_energy-5"} <= unique_ids
+    assert "current-3" not in unique_ids
+
+
 async def test_voltage_sensor(hass: HomeAssistant, monitors: AsyncMock) -> None:
     """Test that a voltage sensor reports its values properly."""
     await setup_greeneye_monitor_component_with_config(
@@ -294,6 +934,107 @@ async def test_multi_monitor_sensors(hass: HomeAssistant, monitors: AsyncMock) -
     assert_sensor_state(hass, "sensor.gem_3_temperature_1", "32.0")
 
 
+async def test_monitor_stats_sensors(
+    hass: HomeAssistant,
+    monitors: AsyncMock,
+    freezer: FrozenDateTimeFactory,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that the diagnostic sensors of a monitor report packet and write rates once per sample interval."""
+    monkeypatch.setattr(
+        MonitorStatsSensor, "_attr_entity_registry_enabled_default", True
+    )
+    await setup_greeneye_monitor_component_with_config(
+        hass, SINGLE_MONITOR_CONFIG_VOLTAGE_SENSORS
+    )
+    monitor = await connect_monitor(hass, monitors, SINGLE_MONITOR_SERIAL_NUMBER)
+    assert_sensor_state(
+        hass, f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_packets_received", "unknown"
+    )
+
+    # Leave the initial writes of every entity out of the next sample
+    freezer.tick(STATS_SAMPLE_INTERVAL)
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+
+    for seconds in range(1, 7):
+        await start_packet(monitor)
+        monitor.voltage_sensor.voltage = 120.0 + seconds
+        await monitor.voltage_sensor.notify_all_listeners()
+        await end_packet(monitor)
+
+    freezer.tick(STATS_SAMPLE_INTERVAL)
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+    assert_sensor_state(
+        hass, f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_packets_received", "0.1"
+    )
+    assert_sensor_state(
+        hass, f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_state_writes", "6.0"
+    )
+    assert_sensor_state(
+        hass,
+        f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_time_since_last_packet",
+        "60.0",
+    )
+    assert_sensor_state(
+        hass,
+        f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_packet_dispatch_time_p99",
+        "0.0",
+    )
+
+
+def test_latency_histogram() -> None:
+    """Test that latency percentiles are reported as the upper bound of their bucket, overall or since given counts."""
+    histogram = LatencyHistogram()
+    assert histogram.percentile_milliseconds(0.5) is None
+    for seconds in [0.0005] * 90 + [0.15] * 9 + [60.0]:
+        histogram.add(seconds)
+    assert histogram.percentile_milliseconds(0.50) == 1
+    assert histogram.percentile_milliseconds(0.95) == 200
+    assert histogram.percentile_milliseconds(1.0) == 30000
+
+    since = list(histogram.counts)
+    histogram.add(0.015)
+    assert histogram.percentile_milliseconds(0.99, since) == 20
+
+
+async def test_latency_sensors(
+    hass: HomeAssistant,
+    monitors: AsyncMock,
+    freezer: FrozenDateTimeFactory,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that the latency from a packet's arrival to its state writes is reported for the packets that caused writes, even while channel 1 is idle."""
+    monkeypatch.setattr(
+        MonitorStatsSensor, "_attr_entity_registry_enabled_default", True
+    )
+    await setup_greeneye_monitor_component_with_config(
+        hass, SINGLE_MONITOR_CONFIG_VOLTAGE_SENSORS
+    )
+    monitor = await connect_monitor(hass, monitors, SINGLE_MONITOR_SERIAL_NUMBER)
+    # greeneye leaves the timestamp of a channel alone for packets in which it is idle
+    monitor.channels[0].timestamp = datetime.now() - timedelta(hours=1)
+
+    for seconds in range(1, 4):
+        set_packet_received_at(monitor, time.monotonic() - 0.03)
+        await start_packet(monitor)
+        monitor.voltage_sensor.voltage = 120.0 + seconds
+        await monitor.voltage_sensor.notify_all_listeners()
+        await end_packet(monitor)
+
+    freezer.tick(STATS_SAMPLE_INTERVAL)
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+    for key in ["packet_queue_latency", "packet_to_state_latency"]:
+        for percentile in ["p50", "p95", "p99"]:
+            assert_sensor_state(
+                hass,
+                f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_{key}_{percentile}",
+                "50",
+            )
+
+
 async def disable_entity(hass: HomeAssistant, entity_id: str) -> None:
     """Disable the given entity."""
     entity_registry = get_entity_registry(hass)
@@ -301,3 +1042,10 @@ async def disable_entity(hass: HomeAssistant, entity_id: str) -> None:
         entity_id, disabled_by=RegistryEntryDisabler.USER
     )
     await hass.async_block_till_done()
+
+
+def set_kilowatt_hours(
+    channel: MagicMock, absolute_kilowatt_hours: float, polarized_kilowatt_hours: float
+) -> None:
+    channel.absolute_watt_seconds = round(absolute_kilowatt_hours * 3600000)
+    channel.polarized_watt_seconds = round(polarized_kilowatt_hours * 3600000)
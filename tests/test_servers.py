@@ -0,0 +1,152 @@
+"""Tests for greeneye_monitor listening on several ports."""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+import voluptuous as vol
+from custom_components.greeneye_monitor import config_validation as gem_cv
+from custom_components.greeneye_monitor.config_flow import CONFIG_ENTRY_DATA_SCHEMA
+from custom_components.greeneye_monitor.config_flow import CONFIG_ENTRY_OPTIONS_SCHEMA
+from custom_components.greeneye_monitor.const import CONF_ADDITIONAL_PORTS
+from custom_components.greeneye_monitor.const import CONF_MONITORS
+from custom_components.greeneye_monitor.const import CONF_SEND_PACKET_DELAY
+from custom_components.greeneye_monitor.const import CONF_SERIAL_NUMBER
+from custom_components.greeneye_monitor.const import DOMAIN
+from custom_components.greeneye_monitor.ingress import IngressMonitors
+from custom_components.greeneye_monitor.servers import MonitorServers
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.const import CONF_PORT
+from homeassistant.core import HomeAssistant
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from .simulator import SimulatedMonitor
+from .simulator import Simulator
+from .simulator import tag_voltage
+from .simulator import unused_port
+
+
+def test_port_list() -> None:
+    """Test that port lists can be given as ports and ranges, and are formatted back the same way."""
+    assert gem_cv.portList("") == []
+    assert gem_cv.portList("8003, 8000-8001,8001") == [8000, 8001, 8003]
+    assert gem_cv.portList([8001, 8000]) == [8000, 8001]
+    assert gem_cv.formatPortList([8003, 8000, 8001, 8002, 8005]) == "8000-8003, 8005"
+    for invalid in ["80a", "8001-8000", "0", "8000-70000"]:
+        with pytest.raises(vol.Invalid):
+            gem_cv.portList(invalid)
+
+
+async def wait_for_voltage(hass: HomeAssistant, serial_number: int, sequence: int):
+    entity_id = f"sensor.gem_{serial_number}_voltage_1_voltage"
+    for _ in range(50):
+        await asyncio.sleep(0.1)
+        await hass.async_block_till_done()
+        state = hass.states.get(entity_id)
+        if state and float(state.state) == tag_voltage(sequence):
+            return
+    raise AssertionError(f"Packet {sequence} never reached {entity_id}")
+
+
+async def test_monitors_on_several_ports(
+    hass: HomeAssistant, socket_enabled: None
+) -> None:
+    """Test that monitors can connect to any of the ports, and that removing a port leaves the others running."""
+    port = unused_port()
+    additional_port = unused_port()
+    monitors = [SimulatedMonitor(1000001), SimulatedMonitor(1000002)]
+    monitor_configs = [
+        {CONF_SERIAL_NUMBER: monitor.serial_number} for monitor in monitors
+    ]
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        data=CONFIG_ENTRY_DATA_SCHEMA(
+            {CONF_PORT: port, CONF_MONITORS: monitor_configs}
+        ),
+        options=CONFIG_ENTRY_OPTIONS_SCHEMA(
+            {
+                CONF_SEND_PACKET_DELAY: False,
+                CONF_ADDITIONAL_PORTS: str(additional_port),
+                CONF_MONITORS: monitor_configs,
+            }
+        ),
+    )
+    await hass.config_entries.async_add(config_entry)
+    await hass.async_block_till_done()
+    servers: MonitorServers = hass.data[DOMAIN]
+    assert servers.ports == sorted([port, additional_port])
+
+    simulators = [
+        Simulator("127.0.0.1", port, monitors[:1], packets_per_second=100),
+        Simulator("127.0.0.1", additional_port, monitors[1:], packets_per_second=100),
+    ]
+    for simulator in simulators:
+        await simulator.connect()
+        await simulator.run(5)
+    for monitor in monitors:
+        await wait_for_voltage(hass, monitor.serial_number, 5)
+    assert servers.monitors_on_port(port) == [servers.monitors[1000001]]
+    assert servers.monitors_on_port(additional_port) == [servers.monitors[1000002]]
+
+    hass.config_entries.async_update_entry(
+        config_entry, options={**config_entry.options, CONF_ADDITIONAL_PORTS: ""}
+    )
+    await hass.async_block_till_done()
+    assert hass.data[DOMAIN] is servers
+    assert config_entry.state is ConfigEntryState.LOADED
+    assert servers.ports == [port]
+
+    # The first monitor's connection survived the change
+    await simulators[0].run(5)
+    await wait_for_voltage(hass, 1000001, 10)
+
+    for simulator in simulators:
+        await simulator.close()
+    await hass.config_entries.async_unload(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+
+async def test_monitor_keeps_its_object_across_ports(socket_enabled: None) -> None:
+    """Test that a monitor that moves to another port keeps its Monitor object, and is only listed as connected on the port it is on."""
+    servers = MonitorServers(lambda: IngressMonitors(send_packet_delay=False))
+    new_monitors: list[int] = []
+
+    async def on_new_monitor(monitor) -> None:
+        new_monitors.append(monitor.serial_number)
+
+    servers.add_listener(on_new_monitor)
+    port = unused_port()
+    other_port = unused_port()
+    await servers.async_start_server(port)
+    await servers.async_start_server(other_port)
+    simulated_monitor = SimulatedMonitor(1000001)
+
+    async def connect(port: int) -> Simulator:
+        simulator = Simulator("127.0.0.1", port, [simulated_monitor], 100)
+        await simulator.connect()
+        await simulator.run(3)
+        for _ in range(50):
+            await asyncio.sleep(0.1)
+            monitor = servers.monitors.get(simulated_monitor.serial_number)
+            if monitor and monitor._last_packet_seconds == simulated_monitor.sequence:
+                return simulator
+        raise AssertionError(f"Packets sent to port {port} never reached the monitor")
+
+    simulator = await connect(port)
+    monitor = servers.monitors[simulated_monitor.serial_number]
+    assert servers.monitors_on_port(port) == [monitor]
+    await simulator.close()
+    await asyncio.sleep(0.1)
+    assert servers.monitors_on_port(port) == []
+
+    simulator = await connect(other_port)
+    assert servers.monitors == {simulated_monitor.serial_number: monitor}
+    assert servers.monitors_on_port(other_port) == [monitor]
+    assert servers.monitors_on_port(port) == []
+    assert new_monitors == [simulated_monitor.serial_number]
+    assert all(
+        server.monitors is not servers.monitors for server in servers.servers.values()
+    )
+
+    await simulator.close()
+    await servers.close()
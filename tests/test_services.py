@@ -0,0 +1,107 @@
+"""Tests for greeneye_monitor services."""
+import asyncio
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+
+from custom_components.greeneye_monitor.const import DOMAIN
+from custom_components.greeneye_monitor.services import SERVICE_CONFIGURE_CHANNELS
+from homeassistant.core import HomeAssistant
+from siobrultech_protocols.gem.protocol import ApiType
+
+from .common import connect_monitor
+from .common import MULTI_MONITOR_CONFIG
+from .common import setup_greeneye_monitor_component_with_config
+
+
+async def test_configure_channels(hass: HomeAssistant, monitors: AsyncMock) -> None:
+    """Test that configure_channels sets every channel it can and reports how each one went."""
+    await setup_greeneye_monitor_component_with_config(hass, MULTI_MONITOR_CONFIG)
+    gem = await connect_monitor(hass, monitors, 1)
+    gem.control = MagicMock(api_type=ApiType.GEM)
+    ecm = await connect_monitor(hass, monitors, 2)
+    ecm.control = MagicMock(api_type=ApiType.ECM)
+    ecm.control.set_ct_type_and_range = AsyncMock()
+    for channel in [*gem.channels, *ecm.channels]:
+        channel.ct_type = 1
+        channel.ct_range = 3
+        channel.set_ct_type = AsyncMock()
+        channel.set_ct_range = AsyncMock()
+    gem.channels[1].set_ct_range.side_effect = asyncio.TimeoutError
+
+    response = await hass.services.async_call(
+        DOMAIN,
+        SERVICE_CONFIGURE_CHANNELS,
+        {
+            "channels": [
+                {"serial_number": 1, "channel": 1, "ct_type": 2, "ct_range": 4},
+                {"serial_number": 1, "channel": 2, "ct_range": 5},
+                {"serial_number": 2, "channel": 1, "ct_type": 2, "ct_range": 4},
+                {"serial_number": 2, "channel": 99, "ct_type": 2},
+                {"serial_number": 5, "channel": 1, "ct_type": 2},
+            ]
+        },
+        blocking=True,
+        return_response=True,
+    )
+
+    assert response is not None
+    assert [
+        (result["serial_number"], result["channel"], result["success"])
+        for result in response["channels"]
+    ] == [(1, 1, True), (1, 2, False), (2, 1, True), (2, 99, False), (5, 1, False)]
+    assert response["channels"][1]["error"] == "TimeoutError"
+    assert response["elapsed_seconds"] >= 0
+    gem.channels[0].set_ct_type.assert_awaited_once_with(2)
+    gem.channels[0].set_ct_range.assert_awaited_once_with(4)
+    ecm.control.set_ct_type_and_range.assert_awaited_once_with(
+        channel=1, type=2, range=4
+    )
+    ecm.channels[0].set_ct_type.assert_not_awaited()
+    assert (ecm.channels[0].ct_type, ecm.channels[0].ct_range) == (2, 4)
+
+
+async def test_configure_channels_one_connection_at_a_time(
+    hass: HomeAssistant, monitors: AsyncMock
+) -> None:
+    """Test that the monitors on one connection are configured one after another."""
+    await setup_greeneye_monitor_component_with_config(hass, MULTI_MONITOR_CONFIG)
+    first = await connect_monitor(hass, monitors, 1)
+    second = await connect_monitor(hass, monitors, 2)
+    monitors.peer_address.return_value = "192.168.1.10:40000"
+    configuring: list[int] = []
+    overlapped = False
+
+    def set_ct_type(serial_number: int):
+        async def set_ct_type(ct_type: int) -> None:
+            nonlocal overlapped
+            overlapped = overlapped or bool(configuring)
+            configuring.append(serial_number)
+            await asyncio.sleep(0)
+            configuring.remove(serial_number)
+
+        return set_ct_type
+
+    for monitor in [first, second]:
+        monitor.control = MagicMock(api_type=ApiType.GEM)
+        monitor.channels[0].set_ct_type = AsyncMock(
+            side_effect=set_ct_type(monitor.serial_number)
+        )
+
+    response = await hass.services.async_call(
+        DOMAIN,
+        SERVICE_CONFIGURE_CHANNELS,
+        {
+            "channels": [
+                {"serial_number": 1, "channel": 1, "ct_type": 2},
+                {"serial_number": 2, "channel": 1, "ct_type": 2},
+            ]
+        },
+        blocking=True,
+        return_response=True,
+    )
+
+    assert response is not None
+    assert [result["success"] for result in response["channels"]] == [True, True]
+    assert not overlapped
+    monitors.peer_address.assert_any_call(1)
+    monitors.peer_address.assert_any_call(2)
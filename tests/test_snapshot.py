@@ -0,0 +1,159 @@
+"""Tests for greeneye_monitor warm starts from monitor snapshots."""
+from __future__ import annotations
+
+from typing import Any
+from unittest.mock import AsyncMock
+
+from custom_components.greeneye_monitor.config_flow import CONFIG_ENTRY_DATA_SCHEMA
+from custom_components.greeneye_monitor.config_flow import CONFIG_ENTRY_OPTIONS_SCHEMA
+from custom_components.greeneye_monitor.const import CONF_MONITORS
+from custom_components.greeneye_monitor.const import CONF_SEND_PACKET_DELAY
+from custom_components.greeneye_monitor.const import CONF_SERIAL_NUMBER
+from custom_components.greeneye_monitor.const import DOMAIN
+from custom_components.greeneye_monitor.servers import MonitorServers
+from custom_components.greeneye_monitor.snapshot import restore_monitor
+from custom_components.greeneye_monitor.snapshot import snapshot_monitor
+from custom_components.greeneye_monitor.snapshot import SNAPSHOT_STORAGE_KEY
+from custom_components.greeneye_monitor.snapshot import SNAPSHOT_STORAGE_VERSION
+from homeassistant.const import CONF_PORT
+from homeassistant.core import HomeAssistant
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from .common import setup_greeneye_monitor_component_with_config
+from .common import SINGLE_MONITOR_CONFIG_POWER_SENSORS
+from .common import SINGLE_MONITOR_SERIAL_NUMBER
+from .conftest import assert_sensor_state
+from .simulator import SimulatedMonitor
+from .simulator import Simulator
+from .simulator import unused_port
+from .test_servers import wait_for_voltage
+
+
+def make_snapshot(serial_number: int, num_channels: int = 32) -> dict[str, Any]:
+    channel = {
+        "net_metering": False,
+        "absolute_watt_seconds": 3600000,
+        "polarized_watt_seconds": None,
+    }
+    return {
+        "serial_number": serial_number,
+        "packet_format": 5,
+        "channels": [channel] * num_channels,
+        "temperature_sensors": [{"unit": "F"}] * 8,
+        "pulse_counters": [{"pulses": 1000}] * 4,
+        "aux": [],
+    }
+
+
+def make_ecm_snapshot(serial_number: int) -> dict[str, Any]:
+    channel = {
+        "net_metering": None,
+        "absolute_watt_seconds": 1000,
+        "polarized_watt_seconds": 400,
+    }
+    return {
+        "serial_number": serial_number,
+        "packet_format": 3,
+        "channels": [channel] * 2,
+        "temperature_sensors": [],
+        "pulse_counters": [],
+        "aux": [
+            *[{**channel, "net_metering": False}] * 4,
+            {
+                "channel": {**channel, "net_metering": False},
+                "pulse_counter": {"pulses": 5},
+            },
+        ],
+    }
+
+
+def test_snapshot_round_trip() -> None:
+    """Test that a restored monitor snapshots back to the snapshot it was restored from."""
+    for snapshot in [make_snapshot(1), make_ecm_snapshot(2)]:
+        assert snapshot_monitor(restore_monitor(snapshot)) == snapshot
+
+
+async def test_entities_restored_before_monitor_connects(
+    hass: HomeAssistant, hass_storage: dict[str, Any], monitors: AsyncMock
+) -> None:
+    """Test that the entities of a monitor in the snapshot exist before it connects, with its counters, and that the snapshot is saved again on unload."""
+    hass_storage[SNAPSHOT_STORAGE_KEY] = {
+        "version": SNAPSHOT_STORAGE_VERSION,
+        "minor_version": 1,
+        "key": SNAPSHOT_STORAGE_KEY,
+        "data": {
+            "monitors": [
+                make_snapshot(SINGLE_MONITOR_SERIAL_NUMBER),
+                make_snapshot(1234567),
+            ]
+        },
+    }
+    await setup_greeneye_monitor_component_with_config(
+        hass, SINGLE_MONITOR_CONFIG_POWER_SENSORS
+    )
+
+    servers: MonitorServers = hass.data[DOMAIN]
+    assert list(servers.monitors) == [SINGLE_MONITOR_SERIAL_NUMBER]
+    assert_sensor_state(
+        hass, f"sensor.gem_{SINGLE_MONITOR_SERIAL_NUMBER}_channel_1_energy", "1.0"
+    )
+
+    servers.monitors[SINGLE_MONITOR_SERIAL_NUMBER].channels[0].absolute_watt_seconds = 0
+    (config_entry,) = hass.config_entries.async_entries(DOMAIN)
+    await hass.config_entries.async_unload(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    saved = hass_storage[SNAPSHOT_STORAGE_KEY]["data"]["monitors"]
+    assert [monitor["serial_number"] for monitor in saved] == [
+        SINGLE_MONITOR_SERIAL_NUMBER,
+        1234567,
+    ]
+    assert saved[0]["channels"][0]["absolute_watt_seconds"] == 0
+    assert saved[1] == make_snapshot(1234567)
+
+
+async def test_restored_monitor_updated_when_it_connects(
+    hass: HomeAssistant, hass_storage: dict[str, Any], socket_enabled: None
+) -> None:
+    """Test that a monitor restored from the snapshot is the one that the library updates once the monitor connects."""
+    port = unused_port()
+    monitor = SimulatedMonitor(1000001)
+    hass_storage[SNAPSHOT_STORAGE_KEY] = {
+        "version": SNAPSHOT_STORAGE_VERSION,
+        "minor_version": 1,
+        "key": SNAPSHOT_STORAGE_KEY,
+        "data": {
+            "monitors": [
+                make_snapshot(monitor.serial_number, monitor.packet_format.num_channels)
+            ]
+        },
+    }
+    monitor_configs = [{CONF_SERIAL_NUMBER: monitor.serial_number}]
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        data=CONFIG_ENTRY_DATA_SCHEMA(
+            {CONF_PORT: port, CONF_MONITORS: monitor_configs}
+        ),
+        options=CONFIG_ENTRY_OPTIONS_SCHEMA(
+            {CONF_SEND_PACKET_DELAY: False, CONF_MONITORS: monitor_configs}
+        ),
+    )
+    await hass.config_entries.async_add(config_entry)
+    await hass.async_block_till_done()
+    servers: MonitorServers = hass.data[DOMAIN]
+    restored = servers.monitors[monitor.serial_number]
+    assert (
+        hass.states.get(f"sensor.gem_{monitor.serial_number}_voltage_1_voltage")
+        is not None
+    )
+
+    simulator = Simulator("127.0.0.1", port, [monitor], packets_per_second=100)
+    await simulator.connect()
+    await simulator.run(5)
+    await wait_for_voltage(hass, monitor.serial_number, 5)
+    assert servers.monitors[monitor.serial_number] is restored
+    assert restored.control is not None
+
+    await simulator.close()
+    await hass.config_entries.async_unload(config_entry.entry_id)
+    await hass.async_block_till_done()